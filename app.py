@@ -2,6 +2,7 @@ from flask import Flask, render_template
 from flask_login import LoginManager
 from config import Config
 from models import db, User
+from jobs import start_job_recovery
 
 # Import blueprints
 from blueprints.home import home_bp
@@ -9,6 +10,7 @@ from blueprints.auth import auth_bp
 from blueprints.data_breach import data_breach_bp
 from blueprints.username_search import username_search_bp
 from blueprints.ai_analysis import ai_analysis_bp
+from blueprints.jobs import jobs_bp
 
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
@@ -35,6 +37,7 @@ def create_app(config_class=Config):
     app.register_blueprint(data_breach_bp, url_prefix='/data-breach')
     app.register_blueprint(username_search_bp, url_prefix='/username-search')
     app.register_blueprint(ai_analysis_bp, url_prefix='/ai-analysis')
+    app.register_blueprint(jobs_bp, url_prefix='/jobs')
     
     # Error handlers
     @app.errorhandler(404)
@@ -45,6 +48,13 @@ def create_app(config_class=Config):
     def internal_error(error):
         return render_template('error.html', error_code=500, error_message="Internal server error"), 500
     
+    # In thread mode the web process also runs jobs a previous process left
+    # behind. Started by the first request, so tasks.py processes don't.
+    if Config.JOB_BACKEND == 'thread':
+        @app.before_request
+        def recover_jobs():
+            start_job_recovery(app)
+    
     # Set up jinja global functions and variables
     @app.context_processor
     def inject_globals():
@@ -0,0 +1,141 @@
+# benchmark.py
+"""
+Benchmark username searches against the offline site simulator.
+
+Starts simulator.py in a separate process, points the search engine at its
+catalogs and runs the same number of searches at each concurrency level,
+reporting throughput, p50/p99 search time and peak Python memory
+(tracemalloc) for each. The verdict cache is off unless --cache is given,
+so every search really checks every site. Client settings such as
+HOST_RATE_LIMIT or WMN_MAX_CONCURRENCY are read from the environment as
+usual, so they can be compared between runs.
+
+    python benchmark.py [--sites 300] [--searches 20] [--concurrency 1,4,16]
+                        [--engine async|threads] [--profiles profiles.json]
+                        [--ports 8900-8909] [--host-rate 0] [--cache]
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+
+from simulator import Simulator, build_sites, load_profiles, parse_ports, write_catalogs
+
+def _serve(sites, ports, host_rate, seed, ready):
+    """Child process entry point running the simulator until it is terminated"""
+    simulator = Simulator(sites, ports, host_rate=host_rate, seed=seed)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(simulator.start())
+    ready.set()
+    loop.run_forever()
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(len(ordered) * percent / 100.0)) - 1))
+    return ordered[index]
+
+def run_level(search_username, concurrency, usernames):
+    """Run the searches at one concurrency level and return its measurements"""
+    durations = []
+    partial = 0
+    found = 0
+
+    def timed_search(username):
+        start = time.perf_counter()
+        result = search_username(username, fresh=True)
+        return time.perf_counter() - start, result
+
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for duration, result in executor.map(timed_search, usernames):
+            durations.append(duration)
+            partial += 1 if result.get('partial') else 0
+            found += len(result['sherlock']) + len(result['whatsmyname'])
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+
+    return {
+        'concurrency': concurrency,
+        'searches': len(usernames),
+        'elapsed': elapsed,
+        'throughput': len(usernames) / elapsed if elapsed else 0,
+        'p50': percentile(durations, 50),
+        'p99': percentile(durations, 99),
+        'peak_mb': peak / (1024 * 1024),
+        'partial': partial,
+        'found': found,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark username searches against simulated sites')
+    parser.add_argument('--sites', type=int, default=300)
+    parser.add_argument('--searches', type=int, default=20)
+    parser.add_argument('--concurrency', default='1,4,16')
+    parser.add_argument('--engine', choices=('async', 'threads'), default='async')
+    parser.add_argument('--ports', default='8900-8909')
+    parser.add_argument('--profiles', help='JSON file with site profiles')
+    parser.add_argument('--host-rate', type=int, default=0, help='requests per second per port before 429')
+    parser.add_argument('--cache', action='store_true', help='use a fresh verdict cache instead of checking every site')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    ports = parse_ports(args.ports)
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+    sites = build_sites(args.sites, ports, load_profiles(args.profiles), args.seed)
+    work_dir = tempfile.mkdtemp(prefix='osint-benchmark-')
+    wmn_path, sherlock_path = write_catalogs(sites, work_dir)
+
+    # Config is read on import, so the environment has to be set up first
+    os.environ.update({
+        'WMN_CATALOG_PINNED': wmn_path,
+        'SHERLOCK_DATA_PATH': sherlock_path,
+        'SHERLOCK_MODE': 'inprocess',
+        'WMN_ENGINE': args.engine,
+        'USERNAME_CACHE_DB': os.path.join(work_dir, 'username-cache.db'),
+    })
+    if not args.cache:
+        os.environ['USERNAME_CACHE_FOUND_TTL'] = '0'
+        os.environ['USERNAME_CACHE_NOT_FOUND_TTL'] = '0'
+
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=_serve, args=(sites, ports, args.host_rate, args.seed, ready), daemon=True)
+    server.start()
+    if not ready.wait(30):
+        server.terminate()
+        raise SystemExit("Simulator did not start")
+
+    from blueprints.username_search.utils import search_username
+    from blueprints.username_search.http_pool import get_pool_stats
+    from blueprints.username_search.site_health import get_health_stats
+
+    print(f"Benchmarking {args.searches} searches over {len(sites)} simulated sites "
+          f"on {len(ports)} hosts ({args.engine} engine)")
+    tracemalloc.start()
+    try:
+        # Warm up catalogs, the engine loop and connection pools
+        search_username('benchmark-warmup', fresh=True)
+
+        print(f"{'concurrency':>11} {'searches/s':>10} {'p50 s':>8} {'p99 s':>8} {'peak MB':>8} {'partial':>7} {'found':>6}")
+        for level in levels:
+            usernames = [f"bench{level}-{index}" for index in range(args.searches)]
+            row = run_level(search_username, level, usernames)
+            print(f"{row['concurrency']:>11} {row['throughput']:>10.2f} {row['p50']:>8.2f} {row['p99']:>8.2f} "
+                  f"{row['peak_mb']:>8.1f} {row['partial']:>7} {row['found']:>6}")
+    finally:
+        tracemalloc.stop()
+        server.terminate()
+        server.join()
+
+    print(f"Connection pool: {get_pool_stats()}")
+    print(f"Site health: {get_health_stats()}")
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,11 @@
 from flask import render_template, request, jsonify, current_app, session, flash, redirect, url_for
 from flask_login import current_user, login_required
 from blueprints.ai_analysis import ai_analysis_bp
-from blueprints.ai_analysis.utils import generate_osint_analysis, generate_security_recommendations
+from jobs import submit_job
 from datetime import datetime
 import json
 import traceback
-from models import db, Scan
+from models import Scan
 
 @ai_analysis_bp.route('/')
 def index():
@@ -22,103 +22,11 @@ def analyze():
             flash('Analysis type and target are required', 'error')
             return redirect(url_for('ai_analysis.index'))
         
-        # Create results dictionary
-        results = {
-            'target': target,
-            'analysis_type': analysis_type,
-            'scan_date': datetime.now(),
-            'insights': [],
-            'recommendations': [],
-            'risk_score': 0
-        }
+        # Run the analysis as a background job and show its results when done
+        user_id = current_user.id if current_user.is_authenticated else None
+        job = submit_job('ai_analysis', target, {'analysis_type': analysis_type}, user_id)
         
-        # Generate analysis based on type
-        if analysis_type == 'username':
-            # Simulate results from previous username search
-            mock_accounts = [
-                {'site_name': 'Twitter', 'category': 'Social Media'},
-                {'site_name': 'LinkedIn', 'category': 'Professional'},
-                {'site_name': 'GitHub', 'category': 'Professional'},
-                {'site_name': 'Reddit', 'category': 'Forums'}
-            ]
-            
-            insights = generate_osint_analysis(target, 'username', mock_accounts)
-            recommendations = generate_security_recommendations('username', insights)
-            
-            results['insights'] = insights
-            results['recommendations'] = recommendations
-            results['risk_score'] = 45  # Example score
-            
-        elif analysis_type == 'email':
-            # Simulate results from previous data breach search
-            mock_breaches = [
-                {'name': 'LinkedIn', 'date': '2012-05-05', 'data_types': ['Email', 'Password']},
-                {'name': 'Adobe', 'date': '2013-10-04', 'data_types': ['Email', 'Password', 'Address']}
-            ]
-            
-            insights = generate_osint_analysis(target, 'email', mock_breaches)
-            recommendations = generate_security_recommendations('email', insights)
-            
-            results['insights'] = insights
-            results['recommendations'] = recommendations
-            results['risk_score'] = 65  # Example score
-            
-        elif analysis_type == 'domain':
-            # Simulate domain analysis results
-            mock_domain_data = {
-                'registrar': 'GoDaddy',
-                'creation_date': '2010-01-15',
-                'expiration_date': '2025-01-15',
-                'nameservers': ['ns1.example.com', 'ns2.example.com']
-            }
-            
-            insights = generate_osint_analysis(target, 'domain', mock_domain_data)
-            recommendations = generate_security_recommendations('domain', insights)
-            
-            results['insights'] = insights
-            results['recommendations'] = recommendations
-            results['risk_score'] = 30  # Example score
-            
-        elif analysis_type == 'combined':
-            # Combine multiple data sources for a comprehensive analysis
-            mock_combined_data = {
-                'username_findings': [{'site_name': 'Twitter'}, {'site_name': 'LinkedIn'}],
-                'email_findings': [{'name': 'Adobe', 'data_types': ['Email', 'Password']}],
-                'domain_findings': {'registrar': 'GoDaddy', 'creation_date': '2015-05-10'}
-            }
-            
-            insights = generate_osint_analysis(target, 'combined', mock_combined_data)
-            recommendations = generate_security_recommendations('combined', insights)
-            
-            results['insights'] = insights
-            results['recommendations'] = recommendations
-            results['risk_score'] = 75  # Example score
-        
-        # Save results to database if user is logged in
-        if current_user.is_authenticated:
-            try:
-                # Convert the results to JSON for storage
-                results_json = json.dumps(results, default=str)
-                
-                # Create a new scan record
-                new_scan = Scan(
-                    user_id=current_user.id,
-                    scan_type='ai_analysis',
-                    target=target,
-                    scan_date=datetime.now(),
-                    status='completed',
-                    findings=len(results['insights']),
-                    results_json=results_json,
-                    risk_score=results['risk_score']
-                )
-                
-                db.session.add(new_scan)
-                db.session.commit()
-            except Exception as e:
-                print(f"Error saving scan to database: {e}")
-                # Continue without saving to database
-        
-        return render_template('ai_analysis/results.html', results=results, now=datetime.now())
+        return redirect(url_for('jobs.view', job_id=job.id))
     
     except Exception as e:
         print(f"Error in AI analysis: {e}")
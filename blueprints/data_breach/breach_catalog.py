@@ -0,0 +1,153 @@
+# blueprints/data_breach/breach_catalog.py
+"""
+Local cache of XposedOrNot's breach catalog.
+
+The details of a breach (description, exposed data, record count, password
+risk) are the same for every address found in it, so they're kept on disk
+instead of being fetched with breach-analytics for each address. Checks
+then only need the check-email call for the breach names and join them to
+the catalog locally.
+
+`python tasks.py refresh_breach_catalog` downloads the catalog and should
+be scheduled to run daily. A process whose copy is older than
+BREACH_CATALOG_TTL first picks up a newer file written by the task, and
+otherwise downloads it in the background; checks never wait for the
+download. Until a catalog is available, checks use breach-analytics.
+"""
+import json
+import os
+import threading
+import time
+
+from config import Config
+from blueprints.data_breach.providers import breach_key
+from blueprints.data_breach.xposedornot import xon_get, XposedOrNotUnavailable
+
+# A stale catalog is looked at again at most this often
+_RECHECK_INTERVAL = 300
+
+_lock = threading.Lock()
+_catalog = None          # Breaches by breach_key() of their name
+_loaded_at = 0           # When the catalog in use was downloaded
+_checked_at = 0          # When a missing or stale catalog was last looked at
+_refreshing = False      # A background download is in progress
+
+def get_breach_catalog():
+    """
+    Return the catalog as {breach_key(name): breach}, or None if there is
+    none yet. Schedules a background download when it is missing or stale.
+    """
+    global _catalog, _loaded_at, _checked_at
+
+    now = time.time()
+    with _lock:
+        catalog, loaded_at = _catalog, _loaded_at
+        if catalog is not None and now - loaded_at <= Config.BREACH_CATALOG_TTL:
+            return catalog
+        if now - _checked_at < _RECHECK_INTERVAL:
+            return catalog
+        _checked_at = now
+
+    # The scheduled task may have written a newer copy
+    raw, meta = _read_cached_catalog()
+    if raw is not None and (catalog is None or meta.get('fetched_at', 0) > loaded_at):
+        compiled = compile_catalog(raw)
+        if compiled:
+            catalog = compiled
+            loaded_at = meta.get('fetched_at', 0)
+            with _lock:
+                _catalog = catalog
+                _loaded_at = loaded_at
+        else:
+            # A damaged file counts as missing and is downloaded again
+            print("Cached breach catalog lists no breaches, ignoring it")
+
+    if now - loaded_at > Config.BREACH_CATALOG_TTL:
+        _schedule_refresh()
+    return catalog
+
+def _meta_path():
+    return f"{Config.BREACH_CATALOG_PATH}.meta"
+
+def _read_cached_catalog():
+    """Read the catalog and its fetch metadata from disk"""
+    try:
+        with open(Config.BREACH_CATALOG_PATH, 'r', encoding='utf-8') as f:
+            raw = json.load(f)
+    except FileNotFoundError:
+        return None, {}
+    except Exception as e:
+        print(f"Error reading cached breach catalog: {e}")
+        return None, {}
+
+    try:
+        with open(_meta_path(), 'r') as f:
+            meta = json.load(f)
+    except Exception:
+        meta = {}
+    return raw, meta
+
+def _write_atomic(path, data):
+    """Write bytes to a file without ever leaving a partial file behind"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _schedule_refresh():
+    """Start a background download unless one is already running"""
+    global _refreshing
+    with _lock:
+        if _refreshing:
+            return
+        _refreshing = True
+    threading.Thread(target=refresh_catalog, name='breach-catalog-refresh', daemon=True).start()
+
+def refresh_catalog():
+    """
+    Download the breach catalog, store it and swap it in.
+    Returns the number of breaches, or None if the download failed.
+    """
+    global _catalog, _loaded_at, _refreshing
+    try:
+        try:
+            response = xon_get('breaches')
+        except XposedOrNotUnavailable as e:
+            print(f"Error fetching breach catalog: {e}")
+            return None
+        if response.status_code != 200:
+            print(f"Error fetching breach catalog: {response.status_code}")
+            return None
+
+        try:
+            raw = response.json()
+            catalog = compile_catalog(raw)
+            if not catalog:
+                print("Error fetching breach catalog: no breaches listed")
+                return None
+            meta = {'fetched_at': time.time()}
+            _write_atomic(Config.BREACH_CATALOG_PATH, response.content)
+            _write_atomic(_meta_path(), json.dumps(meta).encode())
+        except Exception as e:
+            print(f"Error caching breach catalog: {e}")
+            return None
+
+        with _lock:
+            _catalog = catalog
+            _loaded_at = meta['fetched_at']
+        return len(catalog)
+    finally:
+        with _lock:
+            _refreshing = False
+
+def compile_catalog(raw):
+    """Index the breaches of a raw catalog document by breach_key() of their name"""
+    catalog = {}
+    breaches = raw.get('exposedBreaches') if isinstance(raw, dict) else None
+    if not isinstance(breaches, list):
+        return catalog
+    for breach in breaches:
+        if isinstance(breach, dict) and breach.get('breachID'):
+            catalog[breach_key(breach['breachID'])] = breach
+    return catalog
@@ -0,0 +1,155 @@
+# blueprints/data_breach/providers.py
+"""
+Breach source providers.
+
+A provider is a function that takes an email address and returns
+{'breaches': [...], 'risk_score': n or None} for it, or raises when it
+can't check the address. Breaches carry the fields of the results page:
+source, breach_date, description, exposed_data, risk_level and
+breach_size. Providers are listed in PROVIDERS (add more with
+register_provider()) and BREACH_PROVIDERS selects the enabled ones.
+
+run_providers() runs every enabled provider at once on a shared thread
+pool and waits for each up to its own timeout, so a response takes as long
+as the slowest provider rather than all of them added up. A provider that
+fails or runs out of time is reported as failed and the other providers'
+results are still used. merge_breaches() combines their breach lists into
+one, keyed by breach name and date.
+"""
+import concurrent.futures
+import re
+import threading
+import time
+
+from config import Config
+
+class ProviderError(Exception):
+    """A provider couldn't check an address"""
+
+def _check_xposedornot(email):
+    from blueprints.data_breach.utils import check_xposedornot
+    result = check_xposedornot(email)
+    if result is None:
+        raise ProviderError("XposedOrNot check failed")
+    return {
+        'breaches': result.get('breaches', []) if result.get('found') else [],
+        'risk_score': result.get('risk_score')
+    }
+
+# Providers by key. timeout is in seconds, None for BREACH_PROVIDER_TIMEOUT.
+PROVIDERS = {
+    'xposedornot': {'name': 'XposedOrNot', 'check': _check_xposedornot, 'timeout': None},
+}
+
+def register_provider(key, name, check, timeout=None):
+    """Add a provider, enabled by listing its key in BREACH_PROVIDERS"""
+    PROVIDERS[key] = {'name': name, 'check': check, 'timeout': timeout}
+
+def enabled_providers():
+    """Keys of the providers BREACH_PROVIDERS turns on, in its order"""
+    keys = []
+    for key in Config.BREACH_PROVIDERS.split(','):
+        key = key.strip().lower()
+        if not key:
+            continue
+        if key not in PROVIDERS:
+            print(f"Unknown breach provider: {key}")
+            continue
+        keys.append(key)
+    return keys
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(max_workers=Config.BREACH_PROVIDER_WORKERS,
+                                                              thread_name_prefix='breach-provider')
+    return _executor
+
+def run_providers(email, keys=None):
+    """
+    Run the enabled providers (or the given keys) for an address at once.
+    Returns (results, failed): a list of (provider name, result) for the
+    providers that answered in time and the names of those that didn't,
+    both in provider order.
+    """
+    providers = [PROVIDERS[key] for key in (keys if keys is not None else enabled_providers())]
+    start = time.monotonic()
+    futures = {}
+    deadlines = {}
+    for provider in providers:
+        future = _get_executor().submit(provider['check'], email)
+        futures[future] = provider
+        deadlines[future] = start + (provider['timeout'] or Config.BREACH_PROVIDER_TIMEOUT)
+
+    answered = {}
+    failed = set()
+    pending = set(futures)
+    while pending:
+        now = time.monotonic()
+        for future in [future for future in pending if deadlines[future] <= now and not future.done()]:
+            # Left to finish in the background, its result is no longer wanted
+            pending.discard(future)
+            failed.add(futures[future]['name'])
+            print(f"Breach provider {futures[future]['name']} timed out checking {email}")
+        if not pending:
+            break
+
+        done, pending = concurrent.futures.wait(pending, timeout=min(deadlines[future] for future in pending) - now,
+                                                return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            name = futures[future]['name']
+            try:
+                answered[name] = future.result()
+            except Exception as e:
+                print(f"Breach provider {name} failed checking {email}: {e}")
+                failed.add(name)
+
+    results = [(provider['name'], answered[provider['name']]) for provider in providers if provider['name'] in answered]
+    return results, [provider['name'] for provider in providers if provider['name'] in failed]
+
+_UNKNOWN = (None, '', 'Unknown', 'No details available', 'Details not available')
+
+def _known(value):
+    return None if value in _UNKNOWN else value
+
+def _same_date(a, b):
+    # Sources give dates as a year or a full date, or not at all
+    a, b = _known(a), _known(b)
+    if a is None or b is None:
+        return True
+    a, b = str(a), str(b)
+    return a.startswith(b) or b.startswith(a)
+
+def breach_key(name):
+    """Match key for a breach name, ignoring case, spaces and punctuation"""
+    return re.sub(r'[^a-z0-9]', '', str(name).casefold())
+
+def merge_breaches(sources):
+    """
+    Combine the breach lists of several sources into one list, keyed by
+    breach name and date. Breaches with no date merge into one with the
+    same name. Fields a source leaves unknown are filled in from the others,
+    and each breach lists the providers that reported it.
+    """
+    merged = []
+    by_name = {}
+    for source in sources:
+        for breach in source['breaches']:
+            entries = by_name.setdefault(breach_key(breach.get('source', '')), [])
+            entry = next((entry for entry in entries
+                          if _same_date(entry.get('breach_date'), breach.get('breach_date'))), None)
+            if entry is None:
+                entry = dict(breach, providers=[])
+                entries.append(entry)
+                merged.append(entry)
+            else:
+                for field, value in breach.items():
+                    if _known(entry.get(field)) is None and _known(value) is not None:
+                        entry[field] = value
+            if source['name'] not in entry['providers']:
+                entry['providers'].append(source['name'])
+    return merged
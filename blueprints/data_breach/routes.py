@@ -1,12 +1,14 @@
 # blueprints/data_breach/routes.py
-from flask import render_template, request, flash, redirect, url_for
+from flask import render_template, request, flash, redirect, url_for, jsonify, Response, stream_with_context
 from flask_login import current_user, login_required
 from blueprints.data_breach import data_breach_bp
-from blueprints.data_breach.utils import check_xposedornot
+from blueprints.data_breach.utils import parse_emails, check_emails_bulk, format_bulk_csv_row, BULK_CSV_FIELDS
+from config import Config
+from jobs import submit_job
 from datetime import datetime
 import json
 import traceback
-from models import db, Scan
+from models import Scan
 
 @data_breach_bp.route('/')
 def index():
@@ -20,82 +22,11 @@ def check_email():
             flash('Email address is required', 'error')
             return redirect(url_for('data_breach.index'))
         
-        # Collect results from XposedOrNot API
-        results = {
-            'email': email,
-            'scan_date': datetime.now(),
-            'sources': [],
-            'total_breaches': 0
-        }
+        # Run the check as a background job and show its results when done
+        user_id = current_user.id if current_user.is_authenticated else None
+        job = submit_job('email', email, user_id=user_id)
         
-        # Check XposedOrNot API (no API key required)
-        xposedornot_result = check_xposedornot(email)
-        if xposedornot_result and xposedornot_result.get('found', False):
-            formatted_breaches = []
-            for breach in xposedornot_result.get('breaches', []):
-                formatted_breaches.append({
-                    'source': breach.get('source', 'Unknown'),
-                    'breach_date': breach.get('breach_date', 'Unknown'),
-                    'description': breach.get('description', 'No details available'),
-                    'exposed_data': breach.get('exposed_data', 'Unknown'),
-                    'risk_level': breach.get('risk_level', 'Unknown'),
-                    'breach_size': breach.get('breach_size', 'Unknown')
-                })
-            
-            if formatted_breaches:
-                results['sources'].append({
-                    'name': 'XposedOrNot',
-                    'breaches': formatted_breaches
-                })
-        
-        # Count total breaches
-        total_breaches = sum(len(source['breaches']) for source in results['sources'])
-        results['total_breaches'] = total_breaches
-        
-        # Calculate risk score
-        # Use XposedOrNot's risk score if available
-        if xposedornot_result and 'risk_score' in xposedornot_result:
-            risk_score = xposedornot_result['risk_score']
-        else:
-            # Fallback calculation based on number of breaches
-            if total_breaches == 0:
-                risk_score = 0
-            elif total_breaches <= 2:
-                risk_score = 25
-            elif total_breaches <= 5:
-                risk_score = 50
-            elif total_breaches <= 10:
-                risk_score = 75
-            else:
-                risk_score = 100
-        
-        results['risk_score'] = risk_score
-        
-        # Save results to database if user is logged in
-        if current_user.is_authenticated:
-            try:
-                # Convert the results to JSON for storage
-                results_json = json.dumps(results, default=str)
-                
-                # Create a new scan record
-                new_scan = Scan(
-                    user_id=current_user.id,
-                    scan_type='email',
-                    target=email,
-                    scan_date=datetime.now(),
-                    status='completed',
-                    findings=total_breaches,
-                    results_json=results_json,
-                    risk_score=risk_score
-                )
-                
-                db.session.add(new_scan)
-                db.session.commit()
-            except Exception as e:
-                print(f"Error saving scan to database: {e}")
-                # Continue without saving to database
-        
-        return render_template('data_breach/results.html', results=results, now=datetime.now())
+        return redirect(url_for('jobs.view', job_id=job.id))
     
     except Exception as e:
         print(f"Error checking data breaches: {e}")
@@ -103,6 +34,47 @@ def check_email():
         flash("An error occurred while checking data breaches. Please try again later.", "error")
         return redirect(url_for('data_breach.index'))
 
+@data_breach_bp.route('/bulk', methods=['POST'])
+def bulk_check():
+    """
+    Check a list of email addresses and stream each result as it finishes.
+    Accepts an uploaded CSV or text file ('file'), JSON {"emails": [...]}
+    or a form field with one address per line. Results are NDJSON, or CSV
+    with format=csv. Logged in users get a saved scan per address.
+    """
+    upload = request.files.get('file')
+    if upload is not None:
+        emails = parse_emails(upload.read().decode('utf-8-sig', 'replace'))
+    else:
+        data = request.get_json(silent=True) or request.form
+        emails = parse_emails(data.get('emails', ''))
+    
+    if not emails:
+        return jsonify({'success': False, 'error': 'At least one email address is required'}), 400
+    if len(emails) > Config.BREACH_BULK_MAX_EMAILS:
+        return jsonify({'success': False, 'error': f'At most {Config.BREACH_BULK_MAX_EMAILS} email addresses per check'}), 400
+    
+    user_id = current_user.id if current_user.is_authenticated else None
+    as_csv = (request.args.get('format') or request.form.get('format')) == 'csv'
+    
+    def generate():
+        if as_csv:
+            yield format_bulk_csv_row({field: field for field in BULK_CSV_FIELDS})
+        try:
+            for summary in check_emails_bulk(emails, user_id):
+                yield format_bulk_csv_row(summary) if as_csv else json.dumps(summary) + '\n'
+        except Exception as e:
+            print(f"Error in bulk breach check: {e}")
+            print(traceback.format_exc())
+            if not as_csv:
+                yield json.dumps({'error': 'The bulk check stopped early'}) + '\n'
+    
+    headers = {'X-Email-Count': str(len(emails)), 'X-Accel-Buffering': 'no'}
+    if as_csv:
+        headers['Content-Disposition'] = 'attachment; filename=breach-check.csv'
+    return Response(stream_with_context(generate()), mimetype='text/csv' if as_csv else 'application/x-ndjson',
+                    headers=headers)
+
 @data_breach_bp.route('/show_saved_results/<int:scan_id>')
 @login_required
 def show_saved_results(scan_id):
@@ -1,9 +1,18 @@
 # blueprints/data_breach/utils.py
-import requests
+import csv
+import io
 import json
+import re
 import time
 from datetime import datetime
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
+
+from config import Config
+from models import db, Scan
+from blueprints.data_breach.xposedornot import check_email, breach_analytics, submit, XposedOrNotUnavailable
+from blueprints.data_breach.providers import PROVIDERS, breach_key, enabled_providers, run_providers, merge_breaches
+from blueprints.data_breach.breach_catalog import get_breach_catalog
 
 def check_xposedornot(email):
     """
@@ -13,6 +22,12 @@ def check_xposedornot(email):
     1. Simple check to see if email is in any breaches
     2. Detailed breach analytics if a breach is found
     
+    When the local breach catalog is available the breach names from the
+    simple check are joined to it and the analytics call is skipped.
+    Otherwise both calls are sent at once and share one XON_CHECK_DEADLINE;
+    the analytics are used when they arrive in time, otherwise the breach
+    names from the simple check.
+    
     Based on XposedOrNot API documentation: https://xposedornot.com/api_doc
     """
     # For demo/development, return mock data if running in development mode with mock data enabled
@@ -49,25 +64,29 @@ def check_xposedornot(email):
             ]
         }
     
-    # Step 1: Simple breach check
-    # Use the "Check for Email Address Data Breaches" API endpoint
-    email_check_url = f"https://api.xposedornot.com/v1/check-email/{email}"
+    deadline = time.monotonic() + Config.XON_CHECK_DEADLINE
+    catalog = get_breach_catalog()
+    
+    # Use the "Check for Email Address Data Breaches" and, without a local
+    # catalog, "Data Breach Analytics for Email Addresses" API endpoints in parallel
+    check_future = submit(check_email, email, deadline)
+    analytics_future = submit(breach_analytics, email, deadline) if catalog is None else None
     
     try:
-        # Make the first API call
-        response = requests.get(email_check_url)
-        
-        # Check for rate limiting
-        if response.status_code == 429:
-            print("Rate limited by XposedOrNot API. Waiting 2 seconds...")
-            time.sleep(2)
-            return check_xposedornot(email)
+        # Step 1: Simple breach check
+        try:
+            response = check_future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            raise XposedOrNotUnavailable("check-email: out of time")
         
-        # If response is not successful, return not found
+        # A 404 means the address isn't in any breach, any other error means
+        # it couldn't be checked
+        if response.status_code == 404:
+            return {'found': False, 'total_breaches': 0, 'breaches': []}
         if response.status_code != 200:
             print(f"Error checking XposedOrNot (status code {response.status_code}): {response.text}")
-            return {'found': False, 'total_breaches': 0, 'breaches': []}
-        
+            return None
+
         # Parse the response
         breach_check_data = response.json()
         
@@ -80,23 +99,31 @@ def check_xposedornot(email):
         if "breaches" in breach_check_data and len(breach_check_data["breaches"]) > 0:
             breach_names = breach_check_data["breaches"][0]
         
-        # Step 2: Get detailed breach analytics
-        # Use the "Data Breach Analytics for Email Addresses" API endpoint
-        analytics_url = f"https://api.xposedornot.com/v1/breach-analytics?email={email}"
-        
-        analytics_response = requests.get(analytics_url)
-        
-        # Check for rate limiting
-        if analytics_response.status_code == 429:
-            print("Rate limited by XposedOrNot API. Waiting 2 seconds...")
-            time.sleep(2)
-            # Try just the analytics part again
-            analytics_response = requests.get(analytics_url)
+        if catalog is not None:
+            # Breach details come from the local catalog
+            breaches = [_catalog_breach(catalog[breach_key(name)]) if breach_key(name) in catalog
+                        else _unknown_breach(name) for name in breach_names]
+            return {
+                'found': True,
+                'total_breaches': len(breaches),
+                'breaches': breaches,
+                'risk_score': _breach_risk_score(breaches)
+            }
         
+        # Step 2: Get detailed breach analytics, if they arrive in time. The
+        # breach names are already known, so any failure here falls back to them
+        analytics_data = None
+        try:
+            analytics_response = analytics_future.result(timeout=max(0, deadline - time.monotonic()))
+            if analytics_response.status_code == 200:
+                analytics_data = analytics_response.json()
+            else:
+                print(f"XposedOrNot breach analytics failed (status code {analytics_response.status_code})")
+        except Exception as e:
+            print(f"XposedOrNot breach analytics unavailable: {str(e) or 'out of time'}")
+
         # If analytics response is successful, parse the detailed breach data
-        if analytics_response.status_code == 200:
-            analytics_data = analytics_response.json()
-            
+        if isinstance(analytics_data, dict):
             # Format the detailed breach information
             breaches = []
             
@@ -114,32 +141,16 @@ def check_xposedornot(email):
                         'breach_size': f"{breach.get('xposed_records', 0):,} records"
                     })
             
-            # Calculate risk score from metrics if available
-            risk_score = 0
-            if "BreachMetrics" in analytics_data:
-                metrics = analytics_data["BreachMetrics"]
-                if "risk" in metrics and len(metrics["risk"]) > 0:
-                    risk_data = metrics["risk"][0]
-                    risk_score = risk_data.get("risk_score", 0)
-            
+            # Scored from the breach details like catalog results, so both agree
             return {
                 'found': True,
                 'total_breaches': len(breaches),
                 'breaches': breaches,
-                'risk_score': risk_score
+                'risk_score': _breach_risk_score(breaches)
             }
         else:
             # Fallback to basic breach information if analytics fails
-            breaches = []
-            for breach_name in breach_names:
-                breaches.append({
-                    'source': breach_name,
-                    'breach_date': 'Unknown',
-                    'description': 'Details not available',
-                    'exposed_data': 'Unknown',
-                    'risk_level': 'Unknown',
-                    'breach_size': 'Unknown'
-                })
+            breaches = [_unknown_breach(breach_name) for breach_name in breach_names]
             
             return {
                 'found': True,
@@ -151,6 +162,228 @@ def check_xposedornot(email):
         print(f"Exception checking XposedOrNot: {e}")
         return None
 
+def _catalog_breach(entry):
+    """Format a breach from the local catalog like the analytics breach details"""
+    records = entry.get('exposedRecords')
+    return {
+        'source': entry.get('breachID', 'Unknown'),
+        'breach_date': (entry.get('breachedDate') or 'Unknown')[:10],
+        'description': entry.get('exposureDescription') or 'No details available',
+        'exposed_data': ', '.join(entry.get('exposedData') or []) or 'Unknown',
+        'risk_level': _get_risk_level(entry.get('passwordRisk') or 'unknown'),
+        'breach_size': f"{records:,} records" if isinstance(records, int) else 'Unknown'
+    }
+
+def _unknown_breach(name):
+    """A breach known only by name"""
+    return {
+        'source': name,
+        'breach_date': 'Unknown',
+        'description': 'Details not available',
+        'exposed_data': 'Unknown',
+        'risk_level': 'Unknown',
+        'breach_size': 'Unknown'
+    }
+
+def build_breach_results(email):
+    """
+    Check an email address against every enabled breach provider at once
+    and build the results object shown on the results page and stored with
+    the scan. Providers that fail or time out are listed in failed_sources.
+    """
+    results = {
+        'email': email,
+        'scan_date': datetime.now(),
+        'sources': [],
+        'failed_sources': [],
+        'breaches': [],
+        'total_breaches': 0
+    }
+    
+    provider_results, results['failed_sources'] = run_providers(email)
+    for name, found in provider_results:
+        formatted_breaches = []
+        for breach in found.get('breaches', []):
+            formatted_breaches.append({
+                'source': breach.get('source', 'Unknown'),
+                'breach_date': breach.get('breach_date', 'Unknown'),
+                'description': breach.get('description', 'No details available'),
+                'exposed_data': breach.get('exposed_data', 'Unknown'),
+                'risk_level': breach.get('risk_level', 'Unknown'),
+                'breach_size': breach.get('breach_size', 'Unknown')
+            })
+        
+        if formatted_breaches:
+            results['sources'].append({
+                'name': name,
+                'breaches': formatted_breaches
+            })
+    
+    # The same breach reported by several providers counts once
+    results['breaches'] = merge_breaches(results['sources'])
+    total_breaches = len(results['breaches'])
+    results['total_breaches'] = total_breaches
+    
+    # Calculate risk score
+    # Use the highest risk score a provider gave, if any did
+    provider_scores = [found['risk_score'] for _, found in provider_results if found.get('risk_score') is not None]
+    if provider_scores:
+        risk_score = max(provider_scores)
+    else:
+        # Fallback calculation based on number of breaches
+        if total_breaches == 0:
+            risk_score = 0
+        elif total_breaches <= 2:
+            risk_score = 25
+        elif total_breaches <= 5:
+            risk_score = 50
+        elif total_breaches <= 10:
+            risk_score = 75
+        else:
+            risk_score = 100
+    
+    results['risk_score'] = risk_score
+    
+    return results
+
+_EMAIL = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+def normalize_email(value):
+    """
+    Clean up an email address as found in a directory export (quotes, angle
+    brackets, mailto:, mixed case). Returns None if it isn't an address.
+    """
+    email = str(value).strip().strip('"\'<>').strip()
+    if email.lower().startswith('mailto:'):
+        email = email[7:]
+    # Breach sources match addresses case-insensitively
+    email = email.lower()
+    return email if _EMAIL.match(email) else None
+
+def parse_emails(value):
+    """
+    Turn a list, an uploaded CSV or a block of text (one address per line)
+    into a clean list of unique email addresses, keeping order. Cells that
+    aren't addresses, like names or a header row, are skipped.
+    """
+    if isinstance(value, str):
+        cells = [cell for row in csv.reader(io.StringIO(value)) for cell in row]
+        value = [part for cell in cells for part in re.split(r'[\s;]+', cell)]
+    
+    emails = []
+    seen = set()
+    for cell in value or []:
+        email = normalize_email(cell)
+        if email and email not in seen:
+            seen.add(email)
+            emails.append(email)
+    return emails
+
+def iter_breach_results(emails):
+    """
+    Check many email addresses, BREACH_BULK_PARALLEL at a time, and yield
+    (email, results) as each one finishes. The XposedOrNot client's rate
+    limit is shared by every check, so more parallel checks only help
+    until that limit is reached.
+    """
+    parallel = max(1, min(Config.BREACH_BULK_PARALLEL, len(emails)))
+    executor = ThreadPoolExecutor(max_workers=parallel, thread_name_prefix='breach-bulk')
+    try:
+        futures = {executor.submit(build_breach_results, email): email for email in emails}
+        for future in as_completed(futures):
+            email = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                print(f"Error checking {email} for breaches: {e}")
+                results = {'email': email, 'scan_date': datetime.now(), 'sources': [], 'breaches': [],
+                           'failed_sources': [PROVIDERS[key]['name'] for key in enabled_providers()],
+                           'total_breaches': 0, 'risk_score': 0}
+            yield email, results
+    finally:
+        # A client that stops reading shouldn't leave the rest queued
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def check_emails_bulk(emails, user_id=None):
+    """
+    Check many email addresses and yield a summary of each as it finishes.
+    For a user, every address gets an 'email' Scan, committed
+    BREACH_BULK_COMMIT_SIZE at a time. Must be called inside an app context.
+    """
+    pending = []
+    
+    def flush():
+        if pending:
+            db.session.add_all(pending)
+            db.session.commit()
+            pending.clear()
+    
+    try:
+        for email, results in iter_breach_results(emails):
+            # Checks where every source failed found nothing, they didn't clear the address
+            failed = bool(results['failed_sources']) and not results['sources']
+            status = 'failed' if failed else 'completed'
+            if user_id is not None:
+                pending.append(Scan(
+                    user_id=user_id,
+                    scan_type='email',
+                    target=email,
+                    scan_date=results['scan_date'],
+                    status=status,
+                    findings=results['total_breaches'],
+                    results_json=json.dumps(results, default=str),
+                    risk_score=results['risk_score']
+                ))
+                if len(pending) >= Config.BREACH_BULK_COMMIT_SIZE:
+                    flush()
+            
+            yield {
+                'email': email,
+                'status': status,
+                'total_breaches': results['total_breaches'],
+                'risk_score': results['risk_score'],
+                'breaches': [breach['source'] for breach in results['breaches']],
+                'failed_sources': results['failed_sources']
+            }
+    finally:
+        flush()
+
+BULK_CSV_FIELDS = ('email', 'status', 'total_breaches', 'risk_score', 'breaches', 'failed_sources')
+
+def format_bulk_csv_row(summary):
+    """One line of CSV for a check_emails_bulk summary, lists joined with ';'"""
+    row = io.StringIO()
+    csv.writer(row).writerow([
+        ';'.join(summary[field]) if isinstance(summary[field], list) else summary[field]
+        for field in BULK_CSV_FIELDS
+    ])
+    return row.getvalue()
+
+# Points a breach adds to the risk score by how its passwords were stored
+_RISK_LEVEL_POINTS = {'Critical': 40, 'High': 30, 'Low': 15, 'Unknown': 10}
+
+# Exposed data, besides passwords, that makes a breach more serious
+_SENSITIVE_DATA = ('phone', 'physical address', 'birth', 'credit card', 'bank',
+                   'social security', 'government', 'passport')
+
+def _breach_risk_score(breaches):
+    """
+    Risk score (0-100) for a list of formatted breaches. Each breach scores
+    up to 60 from its password risk, sensitive exposed data and size, and
+    the scores add up with diminishing returns.
+    """
+    safe = 1.0
+    for breach in breaches:
+        points = _RISK_LEVEL_POINTS.get(breach.get('risk_level'), 10)
+        exposed = str(breach.get('exposed_data', '')).lower()
+        if any(data in exposed for data in _SENSITIVE_DATA):
+            points += 10
+        records = re.sub(r'\D', '', str(breach.get('breach_size', '')))
+        if records and int(records) >= 1000000:
+            points += 10
+        safe *= 1 - points / 100
+    return round(100 * (1 - safe))
+
 def _get_risk_level(password_risk):
     """Convert password_risk from XposedOrNot to risk level"""
     risk_map = {
@@ -0,0 +1,127 @@
+# blueprints/data_breach/xposedornot.py
+"""
+Client for the XposedOrNot breach API.
+
+Every call goes through one pooled requests session, so checks reuse
+keep-alive connections to api.xposedornot.com, and through a token bucket
+shared by every thread in the process (XON_RATE_LIMIT requests per second,
+bursts of XON_RATE_BURST), so concurrent checks stay under the API's limit
+instead of tripping it. Requests have explicit connect and read timeouts.
+
+Throttled responses (429, or 503 with Retry-After) pause the bucket for the
+Retry-After time, or back off exponentially with jitter, and connection
+errors are retried the same way, up to XON_MAX_RETRIES times. After that,
+or when the API wants us to wait longer than XON_RETRY_AFTER_MAX, the call
+raises XposedOrNotUnavailable. Calls given a deadline also give up once it
+passes, and never wait or time out past it.
+
+submit() runs a call on a small thread pool, so the check-email and
+breach-analytics calls for an address can be in flight at the same time.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+from ratelimit import get_bucket, parse_retry_after, backoff_delay
+
+class XposedOrNotUnavailable(Exception):
+    """XposedOrNot couldn't be reached or kept throttling us"""
+
+_session = None
+_session_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_session():
+    """Return the pooled session shared by every XposedOrNot call"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=Config.XON_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+    return _session
+
+def get_api_bucket():
+    """The rate limiter shared by every XposedOrNot call in the process"""
+    return get_bucket('xposedornot', Config.XON_RATE_LIMIT, Config.XON_RATE_BURST)
+
+def _retry_delay(response, attempt):
+    """Seconds to wait before retrying a response, or None if it isn't throttled"""
+    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+    if response.status_code != 429 and not (response.status_code == 503 and retry_after is not None):
+        return None
+    if retry_after is None:
+        return backoff_delay(attempt, Config.XON_BACKOFF_BASE, Config.XON_BACKOFF_MAX)
+    # Hold back every check in the process, not just this one
+    get_api_bucket().pause(retry_after)
+    return retry_after
+
+def _remaining(deadline):
+    return None if deadline is None else deadline - time.monotonic()
+
+def xon_get(path, params=None, deadline=None):
+    """
+    GET an XposedOrNot endpoint and return the response, whatever its
+    status once it isn't throttled. deadline is a time.monotonic() value
+    to give up at. Raises XposedOrNotUnavailable when the retries or the
+    time run out.
+    """
+    url = f"{Config.XON_API_URL.rstrip('/')}/{path.lstrip('/')}"
+    bucket = get_api_bucket()
+    attempt = 0
+    while True:
+        # Giving up leaves the token for the next call
+        wait = bucket.reserve(_remaining(deadline))
+        if wait is None:
+            raise XposedOrNotUnavailable(f"{path}: out of time")
+        if wait > 0:
+            time.sleep(wait)
+
+        connect_timeout, read_timeout = Config.XON_CONNECT_TIMEOUT, Config.XON_READ_TIMEOUT
+        remaining = _remaining(deadline)
+        if remaining is not None:
+            connect_timeout = max(0.1, min(connect_timeout, remaining))
+            read_timeout = max(0.1, min(read_timeout, remaining))
+        try:
+            response = get_session().get(url, params=params, timeout=(connect_timeout, read_timeout))
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= Config.XON_MAX_RETRIES:
+                raise XposedOrNotUnavailable(f"{path}: {e}") from e
+            delay = backoff_delay(attempt, Config.XON_BACKOFF_BASE, Config.XON_BACKOFF_MAX)
+        else:
+            delay = _retry_delay(response, attempt)
+            if delay is None:
+                return response
+            response.close()
+            if attempt >= Config.XON_MAX_RETRIES or delay > Config.XON_RETRY_AFTER_MAX:
+                raise XposedOrNotUnavailable(f"{path}: throttled (status code {response.status_code})")
+            print(f"Rate limited by XposedOrNot API. Retrying in {delay:.1f} seconds...")
+
+        remaining = _remaining(deadline)
+        if remaining is not None and delay >= remaining:
+            raise XposedOrNotUnavailable(f"{path}: out of time")
+        time.sleep(delay)
+        attempt += 1
+
+def check_email(email, deadline=None):
+    """The check-email endpoint: which breaches an address appears in"""
+    return xon_get(f"check-email/{requests.utils.quote(email, safe='@')}", deadline=deadline)
+
+def breach_analytics(email, deadline=None):
+    """The breach-analytics endpoint: breach details and risk metrics for an address"""
+    return xon_get('breach-analytics', params={'email': email}, deadline=deadline)
+
+def submit(fn, *args, **kwargs):
+    """Run an API call on the client's thread pool, returns its future"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=Config.XON_POOL_SIZE, thread_name_prefix='xposedornot')
+    return _executor.submit(fn, *args, **kwargs)
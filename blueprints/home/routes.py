@@ -3,7 +3,7 @@ from flask import render_template, current_app, redirect, url_for
 from flask_login import current_user, login_required
 from datetime import datetime
 from blueprints.home import home_bp
-from models import db, Scan
+from models import db, Scan, Job
 
 @home_bp.route('/')
 def index():
@@ -90,6 +90,12 @@ def view_scan(scan_id):
     # Get the specific scan
     scan = Scan.query.filter_by(id=scan_id, user_id=current_user.id).first_or_404()
     
+    # Scans that are still running are shown through their job
+    if scan.status == 'in_progress':
+        job = Job.query.filter_by(scan_id=scan.id).first()
+        if job:
+            return redirect(url_for('jobs.view', job_id=job.id))
+    
     # Redirect to the appropriate results page based on scan type
     if scan.scan_type == 'username':
         return redirect(url_for('username_search.show_saved_results', scan_id=scan.id))
@@ -0,0 +1,6 @@
+# blueprints/jobs/__init__.py
+from flask import Blueprint
+
+jobs_bp = Blueprint('jobs', __name__, template_folder='templates')
+
+from blueprints.jobs import routes
@@ -0,0 +1,129 @@
+# blueprints/jobs/routes.py
+from flask import render_template, request, jsonify, redirect, url_for, flash, abort
+from flask_login import current_user
+from blueprints.jobs import jobs_bp
+from jobs import submit_job, JOB_TYPES
+from datetime import datetime
+import json
+import traceback
+from models import db, Job
+
+# Where to show the results of each job type and where to go when one fails
+RESULT_TEMPLATES = {
+    'username': 'username_search/results.html',
+    'username_batch': 'username_search/batch_results.html',
+    'email': 'data_breach/results.html',
+    'ai_analysis': 'ai_analysis/results.html',
+}
+
+INDEX_ENDPOINTS = {
+    'username': 'username_search.index',
+    'username_batch': 'username_search.index',
+    'email': 'data_breach.index',
+    'ai_analysis': 'ai_analysis.index',
+}
+
+def _get_job_or_404(job_id):
+    """Load a job, hiding other users' jobs"""
+    job = db.session.get(Job, job_id)
+    if job is None:
+        abort(404)
+    if job.user_id is not None and (not current_user.is_authenticated or current_user.id != job.user_id):
+        abort(404)
+    return job
+
+def _job_status(job):
+    return {
+        'job_id': job.id,
+        'job_type': job.job_type,
+        'target': job.target,
+        'status': job.status,
+        'scan_id': job.scan_id,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'error': job.error,
+        'status_url': url_for('jobs.status', job_id=job.id),
+        'result_url': url_for('jobs.result', job_id=job.id),
+        'view_url': url_for('jobs.view', job_id=job.id)
+    }
+
+@jobs_bp.route('/', methods=['POST'])
+def submit():
+    """
+    Submit a scan job and return its ID straight away
+    """
+    data = request.get_json(silent=True) or request.form
+    job_type = data.get('job_type', '')
+    target = data.get('target', '')
+    
+    if job_type not in JOB_TYPES:
+        return jsonify({'success': False, 'error': 'Unknown job type'}), 400
+    if job_type == 'username_batch':
+        # Batches need their username list checked and capped
+        return jsonify({'success': False, 'error': 'Submit username batches to the batch search API',
+                        'batch_url': url_for('username_search.batch_search')}), 400
+    if not target:
+        return jsonify({'success': False, 'error': 'Target is required'}), 400
+    
+    # Optional parameters used by some job types
+    params = {key: data.get(key) for key in ('analysis_type', 'search_id', 'fresh') if data.get(key)}
+    
+    try:
+        user_id = current_user.id if current_user.is_authenticated else None
+        job = submit_job(job_type, target, params, user_id)
+    except Exception as e:
+        print(f"Error submitting job: {e}")
+        print(traceback.format_exc())
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    return jsonify(dict(_job_status(job), success=True)), 202
+
+@jobs_bp.route('/<job_id>')
+def status(job_id):
+    """
+    Report the status of a job
+    """
+    return jsonify(_job_status(_get_job_or_404(job_id)))
+
+@jobs_bp.route('/<job_id>/result')
+def result(job_id):
+    """
+    Return the results of a finished job
+    """
+    job = _get_job_or_404(job_id)
+    
+    if job.status == 'completed':
+        return jsonify({'success': True, 'status': job.status, 'results': json.loads(job.results_json)})
+    if job.status == 'failed':
+        return jsonify({'success': False, 'status': job.status, 'error': job.error}), 500
+    
+    # Still running
+    return jsonify({'success': False, 'status': job.status}), 202
+
+@jobs_bp.route('/<job_id>/view')
+def view(job_id):
+    """
+    Show the results page for a job, or a waiting page while it runs
+    """
+    job = _get_job_or_404(job_id)
+    
+    if job.status == 'in_progress':
+        return render_template('jobs/waiting.html', job=job, now=datetime.now())
+    
+    if job.status == 'failed':
+        flash("An error occurred while running the scan. Please try again later.", "error")
+        return redirect(url_for(INDEX_ENDPOINTS[job.job_type]))
+    
+    try:
+        results = json.loads(job.results_json)
+        
+        # Convert date strings back to datetime objects if needed
+        if isinstance(results.get('scan_date'), str):
+            results['scan_date'] = datetime.fromisoformat(results['scan_date'].replace('Z', '+00:00'))
+        
+        return render_template(RESULT_TEMPLATES[job.job_type], results=results, now=datetime.now(), scan_id=job.scan_id)
+    except Exception as e:
+        print(f"Error displaying job results: {e}")
+        flash('Error loading scan results', 'error')
+        return redirect(url_for(INDEX_ENDPOINTS[job.job_type]))
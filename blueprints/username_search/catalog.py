@@ -0,0 +1,243 @@
+# blueprints/username_search/catalog.py
+"""
+Local cache of the WhatsMyName site catalog.
+
+The catalog is kept on disk next to the app and revalidated against GitHub in
+the background (ETag + TTL), so searches never wait on the download. Once
+loaded it is compiled into an in-memory index of validated site rules with the
+URL template split and regex patterns compiled, and that index is reused by
+every search until a newer catalog arrives.
+
+Setting WMN_CATALOG_PINNED to a file path runs fully offline from that file.
+"""
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from config import Config
+from blueprints.username_search.site_index import canonical_site_key
+
+# Keys used by the current WhatsMyName schema mapped to the names the checks use
+_WMN_KEY_MAP = {
+    'e_code': 'account_existence_code',
+    'e_string': 'account_existence_string',
+    'm_code': 'account_missing_code',
+    'm_string': 'account_missing_string',
+    'cat': 'category',
+}
+
+_REQUIRED_KEYS = ('name', 'uri_check', 'category')
+
+_lock = threading.Lock()
+_catalog = None          # Compiled index currently in use
+_loaded_at = 0           # When the compiled index was last (re)validated
+_refreshing = False      # A background revalidation is in progress
+
+def get_wmn_sites():
+    """
+    Return the compiled list of WhatsMyName site rules.
+    Returns None if no catalog is available at all.
+    """
+    catalog = get_wmn_catalog()
+    return catalog['sites'] if catalog else None
+
+def get_wmn_catalog():
+    """
+    Return the compiled catalog, loading it from disk (or GitHub on first run)
+    if needed and scheduling a background revalidation when it is stale
+    """
+    global _catalog, _loaded_at
+
+    with _lock:
+        catalog = _catalog
+        stale = time.time() - _loaded_at > Config.WMN_CATALOG_TTL
+
+    if catalog is None:
+        raw, meta = _read_cached_catalog()
+        if raw is None and not Config.WMN_CATALOG_PINNED:
+            # Nothing on disk yet, so the very first search has to wait for a download
+            raw, meta = _download_catalog()
+        if raw is None:
+            return None
+
+        catalog = compile_catalog(raw)
+        with _lock:
+            _catalog = catalog
+            _loaded_at = meta.get('fetched_at', 0)
+            stale = time.time() - _loaded_at > Config.WMN_CATALOG_TTL
+
+    if stale and not Config.WMN_CATALOG_PINNED:
+        _schedule_refresh()
+
+    return catalog
+
+def _catalog_path():
+    return Config.WMN_CATALOG_PINNED or Config.WMN_CATALOG_PATH
+
+def _meta_path():
+    return f"{Config.WMN_CATALOG_PATH}.meta"
+
+def _read_cached_catalog():
+    """Read the catalog and its ETag/fetch metadata from disk"""
+    try:
+        with open(_catalog_path(), 'r', encoding='utf-8') as f:
+            raw = json.load(f)
+    except FileNotFoundError:
+        return None, {}
+    except Exception as e:
+        print(f"Error reading cached WhatsMyName data: {e}")
+        return None, {}
+
+    if Config.WMN_CATALOG_PINNED:
+        # A pinned catalog never goes stale
+        return raw, {'fetched_at': time.time()}
+
+    try:
+        with open(_meta_path(), 'r') as f:
+            meta = json.load(f)
+    except Exception:
+        meta = {}
+    return raw, meta
+
+def _write_atomic(path, data):
+    """Write bytes to a file without ever leaving a partial file behind"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _write_cached_catalog(content, meta):
+    """Write the catalog and its metadata to disk"""
+    _write_atomic(Config.WMN_CATALOG_PATH, content)
+    _write_atomic(_meta_path(), json.dumps(meta).encode())
+
+def _download_catalog(etag=None):
+    """
+    Fetch the catalog from GitHub.
+    Returns (raw, meta); raw is None when the download failed or nothing changed.
+    """
+    headers = {'If-None-Match': etag} if etag else {}
+    try:
+        response = requests.get(Config.WMN_CATALOG_URL, headers=headers, timeout=10)
+    except requests.RequestException as e:
+        print(f"Error fetching WhatsMyName data: {e}")
+        return None, {}
+
+    meta = {'etag': response.headers.get('ETag', etag), 'fetched_at': time.time()}
+
+    if response.status_code == 304:
+        # Unchanged upstream, just record that we checked
+        return None, meta
+
+    if response.status_code != 200:
+        print(f"Error fetching WhatsMyName data: {response.status_code}")
+        return None, {}
+
+    try:
+        raw = response.json()
+        _write_cached_catalog(response.content, meta)
+    except Exception as e:
+        print(f"Error caching WhatsMyName data: {e}")
+        return None, {}
+    return raw, meta
+
+def _schedule_refresh():
+    """Start a background revalidation unless one is already running"""
+    global _refreshing
+    with _lock:
+        if _refreshing:
+            return
+        _refreshing = True
+    threading.Thread(target=refresh_catalog, name='wmn-catalog-refresh', daemon=True).start()
+
+def refresh_catalog():
+    """Revalidate the cached catalog against GitHub and swap in any update"""
+    global _catalog, _loaded_at, _refreshing
+    try:
+        _, meta = _read_cached_catalog()
+        raw, new_meta = _download_catalog(etag=meta.get('etag'))
+
+        if raw is not None:
+            catalog = compile_catalog(raw)
+            with _lock:
+                _catalog = catalog
+                _loaded_at = new_meta['fetched_at']
+            print(f"WhatsMyName catalog updated: {len(catalog['sites'])} sites")
+        elif new_meta:
+            # 304 Not Modified: keep the current index and restart the TTL
+            try:
+                _write_atomic(_meta_path(), json.dumps(new_meta).encode())
+            except Exception as e:
+                print(f"Error updating WhatsMyName metadata: {e}")
+            with _lock:
+                _loaded_at = new_meta['fetched_at']
+    finally:
+        with _lock:
+            _refreshing = False
+
+def compile_site(site):
+    """
+    Validate a single catalog entry and precompute what the checks need.
+    Returns None if the entry can't be used.
+    """
+    rule = dict(site)
+    for short_key, long_key in _WMN_KEY_MAP.items():
+        if short_key in rule and long_key not in rule:
+            rule[long_key] = rule.pop(short_key)
+
+    if not all(rule.get(k) for k in _REQUIRED_KEYS):
+        return None
+    if rule.get('valid') is False:
+        return None
+
+    uri_check = rule['uri_check']
+    if '{account}' not in uri_check:
+        return None
+
+    # Split the template once so building a URL is a single join
+    rule['uri_parts'] = tuple(uri_check.split('{account}'))
+    rule['host'] = urlsplit(uri_check).netloc.lower()
+    # Sites are matched across catalogs by their profile URL
+    rule['site_key'] = canonical_site_key(rule.get('uri_pretty') or uri_check, '{account}')
+
+    pattern = rule.get('username_claimed_pattern')
+    if pattern:
+        try:
+            rule['claimed_regex'] = re.compile(pattern)
+        except re.error:
+            return None
+
+    return rule
+
+def compile_catalog(raw):
+    """Compile a raw wmn-data.json document into an index of site rules"""
+    sites = []
+    skipped = 0
+    for site in raw.get('sites', []):
+        rule = compile_site(site)
+        if rule is None:
+            skipped += 1
+            continue
+        sites.append(rule)
+
+    if skipped:
+        print(f"Skipped {skipped} invalid WhatsMyName site entries")
+
+    return {
+        'sites': sites,
+        'by_name': {rule['name']: rule for rule in sites},
+        'skipped': skipped,
+    }
+
+def build_check_url(site, username):
+    """Build the URL to check for a username from a compiled site rule"""
+    parts = site.get('uri_parts')
+    if parts is None:
+        return site['uri_check'].replace('{account}', username)
+    return username.join(parts)
@@ -0,0 +1,104 @@
+# blueprints/username_search/control.py
+"""
+Deadlines and cancellation for running username searches.
+
+Each search gets a SearchControl with a time budget (USERNAME_SEARCH_DEADLINE
+seconds, 0 for none). The check loops ask it whether to stop; when the budget
+runs out or the search is cancelled they stop scheduling checks, cancel the
+requests in flight and report the sites they never got to, so the search
+returns partial results instead of running on.
+
+Cancelling goes through the progress store, so a cancel request reaches a
+search running in another worker process when progress is shared via Redis.
+"""
+import threading
+import time
+
+from config import Config
+from blueprints.username_search.progress import request_cancel, is_cancel_requested
+
+# How often a control looks at the shared store for cancel requests
+_CANCEL_POLL_INTERVAL = 1.0
+
+class SearchControl:
+    """Deadline and cancel flag of one search"""
+
+    def __init__(self, search_id, budget=None):
+        self.search_id = search_id
+        budget = Config.USERNAME_SEARCH_DEADLINE if budget is None else budget
+        self.deadline = time.monotonic() + budget if budget > 0 else None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._skipped = {}
+        self._last_poll = 0
+
+    @property
+    def cancelled(self):
+        if self._cancelled.is_set():
+            return True
+        now = time.monotonic()
+        if now - self._last_poll >= _CANCEL_POLL_INTERVAL:
+            self._last_poll = now
+            if is_cancel_requested(self.search_id):
+                self.cancel()
+        return self._cancelled.is_set()
+
+    @property
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def should_stop(self):
+        """Check whether the search should stop scheduling more work"""
+        return self.expired or self.cancelled
+
+    def remaining(self, default=None):
+        """Seconds left in the budget, or default when there is no deadline"""
+        if self.deadline is None:
+            return default
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self):
+        """Stop the search from this process"""
+        self._cancelled.set()
+
+    def add_skipped(self, source, site_names):
+        """Record sites a source never checked"""
+        with self._lock:
+            self._skipped.setdefault(source, []).extend(site_names)
+
+    @property
+    def skipped(self):
+        with self._lock:
+            return {source: list(names) for source, names in self._skipped.items()}
+
+    def close(self):
+        """Unregister the control once the search is over"""
+        with _controls_lock:
+            if _controls.get(self.search_id) is self:
+                del _controls[self.search_id]
+
+_controls = {}
+_controls_lock = threading.Lock()
+
+def start_search_control(search_id, budget=None):
+    """Create and register the control for a new search"""
+    control = SearchControl(search_id, budget)
+    with _controls_lock:
+        _controls[search_id] = control
+    return control
+
+def get_search_control(search_id):
+    with _controls_lock:
+        return _controls.get(search_id)
+
+def cancel_search(search_id):
+    """
+    Cancel a search wherever it runs. Returns True if it was running in
+    this process, the shared flag covers other processes.
+    """
+    request_cancel(search_id)
+    control = get_search_control(search_id)
+    if control is None:
+        return False
+    control.cancel()
+    return True
@@ -0,0 +1,281 @@
+# blueprints/username_search/engine.py
+"""
+Event loop based check engine for username searches.
+
+All site checks run as coroutines on one background event loop that is shared
+by every search in the process. A global semaphore caps the number of requests
+in flight and a semaphore per host keeps us from hammering a single site.
+Every request goes through site_request, which adds the per-host rate limit,
+retries, adaptive timeout and circuit breaker from site_health.
+Results are streamed back to the calling thread as each check finishes.
+"""
+import asyncio
+import contextlib
+import queue
+import threading
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from config import Config
+from blueprints.username_search.catalog import build_check_url
+from blueprints.username_search.http_pool import get_async_session, is_cheap_to_drain
+from blueprints.username_search.matcher import needs_body, StreamedBody
+from blueprints.username_search.site_health import (allow_request, get_timeout, record_success,
+                                                     record_failure, is_server_error, get_host_bucket,
+                                                     throttle_delay, SiteUnavailable)
+from blueprints.username_search.verify_pool import is_verify_offloaded, verify_body_async
+from blueprints.username_search.fingerprints import get_fingerprint
+from blueprints.username_search.utils import evaluate_wmn_response, wmn_result
+
+_loop = None
+_loop_lock = threading.Lock()
+
+# Concurrency limits shared by every search running on the engine loop.
+# They are created lazily on the loop itself.
+_global_semaphore = None
+_host_semaphores = {}
+
+# How often a waiting stream checks whether its search should stop
+_STOP_POLL_INTERVAL = 0.2
+
+def get_engine_loop():
+    """Return the shared engine event loop, starting its thread on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name='username-search-engine', daemon=True)
+            thread.start()
+            _loop = loop
+    return _loop
+
+def _host_key(url):
+    """Key used for per-host concurrency limits"""
+    return urlsplit(url).netloc.lower()
+
+def _get_global_semaphore():
+    global _global_semaphore
+    if _global_semaphore is None:
+        _global_semaphore = asyncio.Semaphore(Config.WMN_MAX_CONCURRENCY)
+    return _global_semaphore
+
+def _get_host_semaphore(host):
+    semaphore = _host_semaphores.get(host)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(Config.WMN_PER_HOST_CONCURRENCY)
+        _host_semaphores[host] = semaphore
+    return semaphore
+
+@contextlib.asynccontextmanager
+async def request_slot(host):
+    """Hold a global and a per-host concurrency slot for one request"""
+    async with _get_global_semaphore(), _get_host_semaphore(host):
+        yield
+
+@contextlib.asynccontextmanager
+async def site_request(session, host, method, url, verdict_statuses=(), **kwargs):
+    """
+    Send a request to a site and yield the response, holding the host's
+    concurrency slot until the caller is done with it. Applies the circuit
+    breaker, the host's rate limit and adaptive timeout, and retries
+    throttled responses. Raises SiteUnavailable when the site can't be
+    checked. verdict_statuses are 5xx statuses the site uses as an answer.
+    """
+    if not allow_request(host):
+        # Circuit is open, the site has been failing
+        raise SiteUnavailable(host)
+
+    loop = asyncio.get_running_loop()
+    bucket = get_host_bucket(host)
+    attempt = 0
+    while True:
+        await bucket.acquire_async()
+
+        # The timeout only starts once we hold both slots, so queued checks
+        # are not cut off while they wait for their turn
+        async with request_slot(host):
+            timeout = aiohttp.ClientTimeout(total=get_timeout(host))
+            started = loop.time()
+            try:
+                response = await session.request(method, url, timeout=timeout, **kwargs)
+            except asyncio.TimeoutError:
+                # Timed out, which also tells us the host needs more time
+                record_failure(host, loop.time() - started)
+                raise
+            except aiohttp.ClientError:
+                record_failure(host)
+                raise
+
+            try:
+                delay = throttle_delay(host, response.status, response.headers, attempt)
+            except SiteUnavailable:
+                response.release()
+                raise
+
+            if delay is None:
+                if is_server_error(response.status) and response.status not in verdict_statuses:
+                    # The host is failing rather than answering
+                    response.release()
+                    record_failure(host)
+                    raise SiteUnavailable(host)
+
+                record_success(host, loop.time() - started)
+                try:
+                    yield response
+                except asyncio.TimeoutError:
+                    # Ran out of time reading the body
+                    record_failure(host, loop.time() - started)
+                    raise
+                finally:
+                    response.release()
+                return
+
+            response.release()
+
+        # Throttled, wait without holding a slot and try again
+        await asyncio.sleep(delay)
+        attempt += 1
+
+async def _check_site(session, username, site):
+    """
+    Check a single WhatsMyName site.
+    Returns a (site, result) tuple where result is None if no account was found
+    and False if the check itself failed.
+    """
+    check_url = build_check_url(site, username)
+    host = site.get('host') or _host_key(check_url)
+    fingerprint = get_fingerprint(site['name'])
+
+    try:
+        async with site_request(session, host, 'GET', check_url,
+                                verdict_statuses=(site.get('account_missing_code'),),
+                                allow_redirects=True) as response:
+            status_code = response.status
+
+            # Status-only verdict, the body can't turn this into a match
+            if not needs_body(site, status_code):
+                if is_cheap_to_drain(response.headers):
+                    # Drain a small body so the connection stays in the pool
+                    await response.read()
+                return site, None
+
+            offload = is_verify_offloaded()
+            if offload:
+                # Verified in a worker process, just collect the bytes here
+                data = await _read_raw(response)
+                charset = response.charset
+            else:
+                # Fingerprinted sites are judged on the whole page, not the first phrase
+                body = await _read_body(response, scan=fingerprint is None)
+
+        if offload:
+            found = await verify_body_async(site, status_code, data, charset, fingerprint, username)
+            return site, wmn_result(site, check_url) if found else None
+
+        # Stopped early on a not-found page
+        if body.not_found:
+            return site, None
+
+        return site, evaluate_wmn_response(site, username, check_url, status_code,
+                                           body.text, body.text_lower, fingerprint)
+
+    except (SiteUnavailable, aiohttp.ClientError, asyncio.TimeoutError):
+        # Skip this site if it can't be checked right now
+        return site, False
+    except Exception as e:
+        print(f"Error checking {site.get('name', 'unknown site')}: {e}")
+        return site, False
+
+async def probe_site(session, username, site):
+    """
+    Fetch a WhatsMyName site's profile page, for calibrating fingerprints.
+    Returns (site, (status_code, lowercased page)), or (site, False) if the
+    request failed.
+    """
+    check_url = build_check_url(site, username)
+    host = site.get('host') or _host_key(check_url)
+
+    try:
+        async with site_request(session, host, 'GET', check_url,
+                                verdict_statuses=(site.get('account_missing_code'),),
+                                allow_redirects=True) as response:
+            status_code = response.status
+            body = await _read_body(response, scan=False)
+        return site, (status_code, body.text_lower)
+
+    except (SiteUnavailable, aiohttp.ClientError, asyncio.TimeoutError):
+        return site, False
+    except Exception as e:
+        print(f"Error probing {site.get('name', 'unknown site')}: {e}")
+        return site, False
+
+async def _read_body(response, scan=True):
+    """Stream the body until the verdict is certain or the byte cap is hit"""
+    body = StreamedBody(response.charset, Config.WMN_MAX_BODY_BYTES, scan)
+    async for chunk in response.content.iter_chunked(Config.WMN_READ_CHUNK_BYTES):
+        if body.feed(chunk):
+            break
+    body.finish()
+    return body
+
+async def _read_raw(response):
+    """Read the raw body up to the byte cap"""
+    data = bytearray()
+    async for chunk in response.content.iter_chunked(Config.WMN_READ_CHUNK_BYTES):
+        data += chunk
+        if len(data) >= Config.WMN_MAX_BODY_BYTES:
+            break
+    return bytes(data[:Config.WMN_MAX_BODY_BYTES])
+
+async def iter_site_checks(username, sites, check=None):
+    """
+    Check every site concurrently, yielding (site, result) tuples in the
+    order the checks finish.
+    check is the coroutine used per site, WhatsMyName rules by default.
+    """
+    check = check or _check_site
+    # The pooled session is shared by every search so connections are reused
+    session = get_async_session()
+    tasks = [asyncio.ensure_future(check(session, username, site)) for site in sites]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Make sure nothing keeps running if the consumer stops early
+        for task in tasks:
+            task.cancel()
+
+def stream_site_checks(username, sites, check=None, control=None):
+    """
+    Run the site checks on the engine loop from a regular thread.
+    Yields (site, result) tuples as soon as each check finishes.
+    Once the search's control says to stop, the checks still queued or in
+    flight are cancelled and the stream ends.
+    """
+    results = queue.Queue()
+    done = object()
+
+    async def runner():
+        try:
+            async for item in iter_site_checks(username, sites, check):
+                results.put(item)
+        finally:
+            results.put(done)
+
+    future = asyncio.run_coroutine_threadsafe(runner(), get_engine_loop())
+    try:
+        while True:
+            if control is not None and control.should_stop():
+                return
+            try:
+                item = results.get(timeout=_STOP_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if item is done:
+                break
+            yield item
+        # Surface any error raised inside the engine
+        future.result()
+    finally:
+        future.cancel()
@@ -0,0 +1,278 @@
+# blueprints/username_search/fingerprints.py
+"""
+Learned fingerprints of each site's not-found page.
+
+A calibration pass (`python tasks.py calibrate`) requests every WhatsMyName
+site's profile URL for a few random usernames that can't exist and stores
+what the not-found response looks like: its status, the range of lengths
+seen and a 64-bit simhash of the words on the page, with the username
+masked out. Live responses with the same status, a similar length and a
+simhash within FINGERPRINT_MAX_DISTANCE bits are not-found pages.
+
+For sites with a fingerprint this replaces the generic not-found phrase
+scan, which misreads real profiles that happen to mention words like
+"deleted" or "inactive". Sites whose not-found page changes too much
+between probes, or looks like the page of a known account, get no
+fingerprint and keep the phrase scan.
+
+Fingerprints live in the username cache database and are reloaded in the
+background by each process every _RELOAD_INTERVAL seconds.
+"""
+import functools
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import string
+import threading
+import time
+from contextlib import closing
+
+from config import Config
+
+# Only the start of a page is fingerprinted, that's where pages differ
+_MAX_CHARS = 64 * 1024
+# Lengths within this fraction (plus _LENGTH_PAD chars) of the calibrated range match
+_LENGTH_SLACK = 0.1
+_LENGTH_PAD = 64
+# Not-found pages that vary more than this between probes are too dynamic to fingerprint
+_MAX_SPREAD = 10
+_RELOAD_INTERVAL = 300
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+# Spreads the 8 bits of a byte into 16-bit lanes so the bit counts of many
+# hashes can be summed with plain integer additions
+_BYTE_LANES = tuple(sum(1 << (16 * bit) for bit in range(8) if value >> bit & 1) for value in range(256))
+
+@functools.lru_cache(maxsize=65536)
+def _token_lanes(token):
+    h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), 'big')
+    return sum(_BYTE_LANES[(h >> (8 * index)) & 0xFF] << (128 * index) for index in range(8))
+
+def simhash(text_lower):
+    """64-bit simhash of the distinct words in already lowercased text"""
+    tokens = set(_TOKEN.findall(text_lower[:_MAX_CHARS]))
+    if not tokens:
+        return 0
+    # Lanes are 16 bits wide, so at most 65535 words can be counted
+    tokens = list(tokens)[:0xFFFF]
+    total = 0
+    for token in tokens:
+        total += _token_lanes(token)
+    half = len(tokens) / 2
+    value = 0
+    for bit in range(64):
+        if (total >> (16 * bit)) & 0xFFFF > half:
+            value |= 1 << bit
+    return value
+
+def _mask(text_lower, username):
+    # The username is echoed on many not-found pages, take it out so pages
+    # for different usernames look the same
+    return text_lower.replace(username.lower(), ' ') if username else text_lower
+
+def page_fingerprint(status_code, text_lower, username):
+    """Return (status, length, simhash) of a page"""
+    masked = _mask(text_lower, username)
+    return status_code, len(masked), simhash(masked)
+
+def matches_fingerprint(fingerprint, status_code, text_lower, username):
+    """Check whether a page is the site's not-found page"""
+    if status_code != fingerprint['status']:
+        return False
+    masked = _mask(text_lower, username)
+    length = len(masked)
+    if length < fingerprint['min_length'] * (1 - _LENGTH_SLACK) - _LENGTH_PAD:
+        return False
+    if length > fingerprint['max_length'] * (1 + _LENGTH_SLACK) + _LENGTH_PAD:
+        return False
+    distance = bin(simhash(masked) ^ fingerprint['simhash']).count('1')
+    return distance <= fingerprint['spread'] + Config.FINGERPRINT_MAX_DISTANCE
+
+def random_username():
+    """A username no real site has"""
+    return 'zq' + ''.join(random.choice(string.ascii_lowercase) for _ in range(14))
+
+def build_fingerprint(probes):
+    """
+    Combine the (status, length, simhash) of several not-found probes into
+    a fingerprint, or None if they disagree too much to be useful
+    """
+    statuses = {status for status, _, _ in probes}
+    if len(statuses) != 1:
+        return None
+    hashes = [value for _, _, value in probes]
+    spread = max(bin(a ^ b).count('1') for a in hashes for b in hashes)
+    if spread > _MAX_SPREAD:
+        return None
+    lengths = [length for _, length, _ in probes]
+    return {
+        'status': probes[0][0],
+        'min_length': min(lengths),
+        'max_length': max(lengths),
+        'simhash': hashes[0],
+        'spread': spread,
+    }
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+def _connect():
+    path = Config.USERNAME_CACHE_DB
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    with _schema_lock:
+        if path not in _schema_ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    site TEXT PRIMARY KEY,
+                    status INTEGER NOT NULL,
+                    min_length INTEGER NOT NULL,
+                    max_length INTEGER NOT NULL,
+                    simhash TEXT NOT NULL,
+                    spread INTEGER NOT NULL,
+                    calibrated_at REAL NOT NULL
+                )
+            """)
+            conn.commit()
+            _schema_ready.add(path)
+    return conn
+
+_lock = threading.Lock()
+_load_lock = threading.Lock()
+_fingerprints = None
+_loaded_at = 0
+_reloading = False
+
+def get_fingerprint(site_name):
+    """
+    The not-found fingerprint of a WhatsMyName site, or None. Only the first
+    call in a process reads the database; later reloads run in the
+    background while the fingerprints already loaded keep being used.
+    """
+    global _reloading
+
+    with _lock:
+        fingerprints = _fingerprints
+        stale = time.monotonic() - _loaded_at >= _RELOAD_INTERVAL
+        if fingerprints is not None and stale and not _reloading:
+            _reloading = True
+            threading.Thread(target=_reload, name='fingerprint-reload', daemon=True).start()
+
+    if fingerprints is None:
+        # Threads arriving together wait for one load instead of each running it
+        with _load_lock:
+            with _lock:
+                fingerprints = _fingerprints
+            if fingerprints is None:
+                fingerprints = _reload()
+    return fingerprints.get(site_name)
+
+def _reload():
+    global _fingerprints, _loaded_at, _reloading
+    try:
+        fingerprints = load_fingerprints()
+        with _lock:
+            _fingerprints = fingerprints
+            _loaded_at = time.monotonic()
+        return fingerprints
+    finally:
+        with _lock:
+            _reloading = False
+
+def load_fingerprints():
+    """Read every stored fingerprint, keyed by site name"""
+    try:
+        with closing(_connect()) as conn:
+            rows = conn.execute(
+                "SELECT site, status, min_length, max_length, simhash, spread FROM fingerprints"
+            ).fetchall()
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error reading page fingerprints: {e}")
+        return {}
+
+    return {
+        site: {'status': status, 'min_length': min_length, 'max_length': max_length,
+               'simhash': int(value, 16), 'spread': spread}
+        for site, status, min_length, max_length, value, spread in rows
+    }
+
+def save_fingerprints(fingerprints, checked_sites):
+    """
+    Store new fingerprints and drop the old ones of the other sites that
+    were calibrated, so sites that stopped fingerprinting cleanly fall back
+    """
+    global _fingerprints
+
+    now = time.time()
+    rows = [(site, fp['status'], fp['min_length'], fp['max_length'], format(fp['simhash'], '016x'),
+             fp['spread'], now) for site, fp in fingerprints.items()]
+    stale = [(site,) for site in checked_sites if site not in fingerprints]
+    try:
+        with closing(_connect()) as conn:
+            with conn:
+                conn.executemany("DELETE FROM fingerprints WHERE site = ?", stale)
+                conn.executemany("INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error writing page fingerprints: {e}")
+        return
+
+    # Make this process pick the new fingerprints up straight away
+    with _lock:
+        _fingerprints = None
+
+def calibrate_sites(sites, probes=None):
+    """
+    Learn the not-found page of each WhatsMyName site from probes with
+    random usernames, checked against one of the site's known accounts
+    when the catalog lists any. Returns {'calibrated', 'skipped', 'failed'}.
+    """
+    from blueprints.username_search.engine import stream_site_checks, probe_site
+    from blueprints.username_search.matcher import needs_body
+
+    probes = probes or Config.FINGERPRINT_PROBES
+    pages = {site['name']: [] for site in sites}
+    failed = set()
+
+    for _ in range(probes):
+        username = random_username()
+        for site, page in stream_site_checks(username, sites, probe_site):
+            if page is False:
+                failed.add(site['name'])
+                continue
+            status_code, text_lower = page
+            pages[site['name']].append(page_fingerprint(status_code, text_lower, username))
+
+    fingerprints = {}
+    skipped = 0
+    candidates = []
+    for site in sites:
+        name = site['name']
+        if name in failed or not pages[name]:
+            continue
+        status_code = pages[name][0][0]
+        if not needs_body(site, status_code):
+            # The status code alone already says not found, nothing to learn
+            skipped += 1
+            continue
+        fingerprint = build_fingerprint(pages[name])
+        if fingerprint is None:
+            skipped += 1
+            continue
+        fingerprints[name] = fingerprint
+        if site.get('known'):
+            candidates.append(site)
+
+    # A fingerprint that also matches a real account's page would hide accounts
+    for known in {site['known'][0] for site in candidates}:
+        group = [site for site in candidates if site['known'][0] == known]
+        for site, page in stream_site_checks(known, group, probe_site):
+            if page is not False and matches_fingerprint(fingerprints[site['name']], page[0], page[1], known):
+                del fingerprints[site['name']]
+                skipped += 1
+
+    save_fingerprints(fingerprints, [site['name'] for site in sites if site['name'] not in failed])
+    return {'calibrated': len(fingerprints), 'skipped': skipped, 'failed': len(failed)}
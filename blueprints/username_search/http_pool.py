@@ -0,0 +1,162 @@
+# blueprints/username_search/http_pool.py
+"""
+Shared pooled HTTP sessions for username search site checks.
+
+Threaded code uses one requests.Session and the event loop engine uses one
+aiohttp.ClientSession. Both keep connections alive per host and share a
+single SSL context. A check that goes out on a kept-alive connection skips
+the TCP and TLS handshakes; a new connection does both in full, as TLS
+session resumption is not attempted. Neither keeps cookies, so no state
+carries over from one check, search or user to the next. Every request is
+counted as a pool hit when it goes out on an existing connection and as a
+miss when a new one is opened.
+"""
+import ssl
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from config import Config
+
+# Browser-like headers sent with every site check
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+_stats_lock = threading.Lock()
+_stats = {
+    # Sync hits are derived as requests minus new connections
+    'sync': {'requests': 0, 'hits': 0, 'misses': 0},
+    'async': {'requests': 0, 'hits': 0, 'misses': 0},
+}
+
+_ssl_context = None
+_session = None
+# Reentrant: get_session() holds it while the adapter asks for the SSL context
+_session_lock = threading.RLock()
+_async_session = None
+
+def _count(pool, key):
+    with _stats_lock:
+        _stats[pool][key] += 1
+
+def get_pool_stats():
+    """Return a snapshot of the connection pool hit/miss counters"""
+    with _stats_lock:
+        snapshot = {pool: dict(counters) for pool, counters in _stats.items()}
+    sync = snapshot['sync']
+    sync['hits'] = max(sync['requests'] - sync['misses'], 0)
+    for counters in snapshot.values():
+        total = counters['hits'] + counters['misses']
+        counters['hit_rate'] = round(counters['hits'] / total, 3) if total else 0.0
+    return snapshot
+
+def is_cheap_to_drain(headers):
+    """
+    Check whether an unneeded response body is small enough that reading it
+    is cheaper than dropping the keep-alive connection
+    """
+    try:
+        return int(headers.get('Content-Length', '')) <= Config.WMN_READ_CHUNK_BYTES
+    except ValueError:
+        return False
+
+def get_ssl_context():
+    """Return the SSL context shared by every pooled connection"""
+    global _ssl_context
+    with _session_lock:
+        if _ssl_context is None:
+            _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+# --- Threaded (requests) session ---
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        _count('sync', 'misses')
+        super().connect()
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        _count('sync', 'misses')
+        super().connect()
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter that shares one SSL context and counts pool hits"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = get_ssl_context()
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        _count('sync', 'requests')
+        return super().send(request, **kwargs)
+
+def get_session():
+    """Return the shared requests session used by threaded site checks"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+            # Cookies from one site's answer must not follow later checks
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            adapter = _PooledAdapter(pool_connections=Config.HTTP_POOL_HOSTS,
+                                     pool_maxsize=Config.HTTP_POOL_SIZE_PER_HOST)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+    return _session
+
+# --- Event loop (aiohttp) session ---
+
+async def _on_request_start(session, context, params):
+    _count('async', 'requests')
+
+async def _on_connection_create_end(session, context, params):
+    _count('async', 'misses')
+
+async def _on_connection_reuseconn(session, context, params):
+    _count('async', 'hits')
+
+def get_async_session():
+    """
+    Return the shared aiohttp session.
+    Must be called from the engine event loop, which owns the session.
+    """
+    global _async_session
+    if _async_session is None or _async_session.closed:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(_on_request_start)
+        trace_config.on_connection_create_end.append(_on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(_on_connection_reuseconn)
+
+        connector = aiohttp.TCPConnector(
+            limit=0,  # The engine enforces the global limit itself
+            limit_per_host=Config.HTTP_POOL_SIZE_PER_HOST,
+            keepalive_timeout=Config.HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300,
+            ssl=get_ssl_context()
+        )
+        _async_session = aiohttp.ClientSession(
+            connector=connector,
+            headers=DEFAULT_HEADERS,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            trace_configs=[trace_config]
+        )
+    return _async_session
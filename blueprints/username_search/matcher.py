@@ -0,0 +1,201 @@
+# blueprints/username_search/matcher.py
+"""
+Compiled detection rules for deciding whether a profile page is real.
+
+Each response body is lowercased once and every check runs against that one
+copy. Indicators that contain a shorter indicator are dropped up front since
+they can never change the verdict, and site patterns are compiled once and
+cached instead of being recompiled for every response.
+
+CPython's substring search runs in C with a skip table, and on real pages it
+beats both a combined alternation regex and a pure Python Aho-Corasick
+automaton, so the indicator scan stays a loop of `in` checks over the
+minimal set.
+"""
+import codecs
+import functools
+import re
+
+from blueprints.username_search.fingerprints import matches_fingerprint
+
+# Common not-found indicators in page content
+NOT_FOUND_INDICATORS = [
+    "not found", "doesn't exist", "does not exist", "no such user",
+    "no such account", "page not found", "profile not found", "account not found",
+    "couldn't find", "couldn't be found", "cannot be found", "not be found",
+    "deleted", "disabled", "suspended", "removed", "inactive", "deactivated"
+]
+
+# Common error indicators checked by verify_account_exists
+ERROR_PATTERNS = [
+    r"(user not found|account not found|page not found|profile not found|404)",
+    r"(doesn't exist|does not exist|not available|no user|isn't here)",
+    r"(no profile|user doesn't exist|profile doesn't exist|account doesn't exist)",
+    r"(couldn't find|couldn't be found|cannot be found|not be found)",
+    r"(deleted|disabled|suspended|removed|inactive|deactivated)"
+]
+
+# Extra not-found strings for sites whose error pages are known
+SITE_ERROR_STRINGS = [
+    ('twitter.com', ("this account doesn't exist", "does not exist")),
+    ('instagram.com', ("sorry, this page isn't available",)),
+    ('facebook.com', ("page not found", "isn't available")),
+    ('github.com', ("not found", "404")),
+]
+
+def _minimal_indicators(indicators):
+    """Drop indicators that contain another indicator, they can never match alone"""
+    lowered = sorted({i.lower() for i in indicators}, key=len)
+    minimal = []
+    for indicator in lowered:
+        if not any(shorter in indicator for shorter in minimal):
+            minimal.append(indicator)
+    return tuple(minimal)
+
+_NOT_FOUND_SCAN = _minimal_indicators(NOT_FOUND_INDICATORS)
+_MAX_INDICATOR_LEN = max(len(i) for i in _NOT_FOUND_SCAN)
+_ERROR_REGEX = re.compile('|'.join(ERROR_PATTERNS))
+
+@functools.lru_cache(maxsize=2048)
+def _compile_pattern(pattern):
+    return re.compile(pattern)
+
+def _claimed_regex(site):
+    """Return the compiled username_claimed_pattern for a site, if it has one"""
+    regex = site.get('claimed_regex')
+    if regex is None and site.get('username_claimed_pattern'):
+        regex = _compile_pattern(site['username_claimed_pattern'])
+    return regex
+
+def has_not_found_indicator(content_lower):
+    """Check already lowercased page content for any not-found indicator"""
+    for indicator in _NOT_FOUND_SCAN:
+        if indicator in content_lower:
+            return True
+    return False
+
+def needs_body(site, status_code):
+    """
+    Check whether a site's verdict depends on the response body.
+    When it doesn't, the status code alone already means no account.
+    """
+    if 'account_existence_code' in site and status_code == site['account_existence_code']:
+        return True
+    return 'account_existence_string' in site
+
+class StreamedBody:
+    """
+    Incrementally decodes a response body and watches for not-found
+    indicators as chunks arrive, so reading can stop as soon as the page is
+    known to be a not-found page or the byte cap is reached.
+    Pass scan=False to read the page without watching for indicators.
+    """
+
+    def __init__(self, encoding, max_bytes, scan=True):
+        try:
+            self._decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+        except LookupError:
+            self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.max_bytes = max_bytes
+        self.scan = scan
+        self.received = 0
+        self.not_found = False
+        self._parts = []
+        self._lower_parts = []
+        self._tail = ''
+
+    def feed(self, chunk):
+        """Add a chunk of raw bytes, returns True once no more data is needed"""
+        remaining = self.max_bytes - self.received
+        if len(chunk) > remaining:
+            chunk = chunk[:remaining]
+        self.received += len(chunk)
+
+        self._add_text(self._decoder.decode(chunk))
+        return self.not_found or self.received >= self.max_bytes
+
+    def finish(self):
+        """Flush the decoder once the last chunk has been fed"""
+        self._add_text(self._decoder.decode(b'', final=True))
+
+    def _add_text(self, text):
+        if not text or self.not_found:
+            return
+        lowered = text.lower()
+        self._parts.append(text)
+        self._lower_parts.append(lowered)
+        if not self.scan:
+            return
+
+        # Keep the end of the previous chunk so indicators split across
+        # chunk boundaries are still found
+        window = self._tail + lowered
+        if has_not_found_indicator(window):
+            self.not_found = True
+        self._tail = window[-(_MAX_INDICATOR_LEN - 1):]
+
+    @property
+    def text(self):
+        return ''.join(self._parts)
+
+    @property
+    def text_lower(self):
+        return ''.join(self._lower_parts)
+
+def verify_content(content, site, content_lower=None, scan_indicators=True):
+    """
+    Verify that page content indicates a real account for a site.
+    Pass content_lower if the caller already has a lowercased copy, and
+    scan_indicators=False when the page has already been checked against
+    the site's learned not-found fingerprint.
+    """
+    if scan_indicators:
+        if content_lower is None:
+            content_lower = content.lower()
+        if has_not_found_indicator(content_lower):
+            return False
+
+    # For more reliable validation, check for expected username appearance
+    regex = _claimed_regex(site)
+    if regex is not None and not regex.search(content):
+        return False
+
+    # If we have a positive match pattern defined for the site, use it
+    positive_pattern = site.get('account_existence_string')
+    if positive_pattern and positive_pattern not in content:
+        return False
+
+    return True
+
+def content_shows_account(site, status_code, content, content_lower=None, fingerprint=None, username=None):
+    """
+    Decide from a WhatsMyName site response whether the account exists:
+    the existence code or string has to match and the content has to verify.
+    With the site's not-found fingerprint (and the username searched for),
+    pages are compared against it instead of scanned for not-found phrases.
+    """
+    scan_indicators = fingerprint is None
+    if not scan_indicators:
+        if content_lower is None:
+            content_lower = content.lower()
+        if matches_fingerprint(fingerprint, status_code, content_lower, username):
+            return False
+
+    if 'account_existence_code' in site and status_code == site['account_existence_code']:
+        return verify_content(content, site, content_lower, scan_indicators)
+    if 'account_existence_string' in site and site['account_existence_string'] in content:
+        return verify_content(content, site, content_lower, scan_indicators)
+    return False
+
+def page_shows_error(url, content):
+    """Check a fetched profile page for generic and site-specific error text"""
+    content_lower = content.lower()
+
+    if _ERROR_REGEX.search(content_lower):
+        return True
+
+    for domain, error_strings in SITE_ERROR_STRINGS:
+        if domain in url:
+            return any(s in content_lower for s in error_strings)
+
+    return False
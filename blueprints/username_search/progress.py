@@ -0,0 +1,371 @@
+# blueprints/username_search/progress.py
+"""
+Progress tracking for running username searches.
+
+Progress lives in a thread-safe registry keyed by search ID. Updates and
+counter increments are atomic, finished searches expire after PROGRESS_TTL
+seconds, and reading progress is a dictionary lookup. Each search also keeps
+an ordered log of the accounts found so far, numbered from 1, which the live
+results stream replays from any point. Every change bumps a version number
+that stream readers can wait on.
+
+By default the registry is in memory, which only works when the search and
+the progress polling run in the same process. Set PROGRESS_REDIS_URL to share
+progress between processes through Redis (requires the redis package).
+"""
+import json
+import threading
+import time
+
+from config import Config
+
+SOURCES = ('sherlock', 'whatsmyname')
+
+# Statuses that mean a source has stopped working
+FINAL_STATUSES = ('completed', 'error', 'cancelled')
+
+def _initial_progress():
+    return {
+        'sherlock': {
+            'status': 'starting',
+            'message': 'Starting Sherlock search...',
+            'found': 0,
+            'total_checked': 0,
+            'total_sites': 0
+        },
+        'whatsmyname': {
+            'status': 'starting',
+            'message': 'Starting WhatsMyName search...',
+            'found': 0,
+            'total_checked': 0,
+            'total_sites': 0
+        }
+    }
+
+def _is_finished(progress):
+    return all(progress[source]['status'] in FINAL_STATUSES for source in SOURCES)
+
+class MemoryProgressStore:
+    """Progress registry for a single process"""
+
+    def __init__(self, ttl, max_age):
+        self.ttl = ttl
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._entries = {}
+
+    def create(self, search_id, username):
+        with self._lock:
+            self._expire()
+            self._entries[search_id] = {
+                'username': username,
+                'created_at': time.time(),
+                'finished_at': None,
+                'progress': _initial_progress(),
+                'accounts': [],
+                'cancelled': False,
+                'version': 0
+            }
+
+    def update(self, search_id, source, fields):
+        with self._lock:
+            entry = self._entries.get(search_id)
+            if entry is None:
+                return
+            entry['progress'][source].update(fields)
+            self._mark_finished(entry)
+            self._bump(entry)
+
+    def increment(self, search_id, source, counters):
+        with self._lock:
+            entry = self._entries.get(search_id)
+            if entry is None:
+                return
+            source_progress = entry['progress'][source]
+            for field, amount in counters.items():
+                source_progress[field] = source_progress.get(field, 0) + amount
+            self._bump(entry)
+
+    def add_account(self, search_id, account):
+        with self._lock:
+            entry = self._entries.get(search_id)
+            if entry is None:
+                return
+            entry['accounts'].append(account)
+            self._bump(entry)
+
+    def get_accounts(self, search_id, after=0):
+        with self._lock:
+            entry = self._entries.get(search_id)
+            if entry is None:
+                return []
+            return list(enumerate(entry['accounts'][after:], start=after + 1))
+
+    def cancel(self, search_id):
+        with self._lock:
+            entry = self._entries.get(search_id)
+            if entry is None:
+                return
+            entry['cancelled'] = True
+            self._bump(entry)
+
+    def is_cancelled(self, search_id):
+        with self._lock:
+            entry = self._entries.get(search_id)
+            return bool(entry and entry['cancelled'])
+
+    def get_version(self, search_id):
+        with self._lock:
+            entry = self._entries.get(search_id)
+            return entry['version'] if entry else None
+
+    def wait_for_change(self, search_id, version, timeout):
+        with self._lock:
+            self._changed.wait_for(
+                lambda: self._entries.get(search_id, {}).get('version') != version,
+                timeout=timeout
+            )
+
+    def get(self, search_id):
+        with self._lock:
+            entry = self._entries.get(search_id)
+            if entry is None or self._is_expired(entry, time.time()):
+                return None
+            return {source: dict(values) for source, values in entry['progress'].items()}
+
+    def latest_for(self, username):
+        now = time.time()
+        with self._lock:
+            candidates = [(entry['created_at'], search_id)
+                          for search_id, entry in self._entries.items()
+                          if entry['username'] == username and not self._is_expired(entry, now)]
+        return max(candidates)[1] if candidates else None
+
+    def _bump(self, entry):
+        entry['version'] += 1
+        self._changed.notify_all()
+
+    def _mark_finished(self, entry):
+        if entry['finished_at'] is None and _is_finished(entry['progress']):
+            entry['finished_at'] = time.time()
+
+    def _is_expired(self, entry, now):
+        if entry['finished_at'] is not None:
+            return now - entry['finished_at'] > self.ttl
+        # Searches that never finish (crashed workers) are dropped eventually
+        return now - entry['created_at'] > self.max_age
+
+    def _expire(self):
+        now = time.time()
+        expired = [search_id for search_id, entry in self._entries.items() if self._is_expired(entry, now)]
+        for search_id in expired:
+            del self._entries[search_id]
+
+class RedisProgressStore:
+    """Progress registry shared between processes through Redis"""
+
+    def __init__(self, url, ttl, max_age):
+        import redis
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.ttl = ttl
+        self.max_age = max_age
+
+    # How often stream readers poll Redis for changes
+    poll_interval = 0.25
+
+    def _key(self, search_id):
+        return f"osint:search_progress:{search_id}"
+
+    def _accounts_key(self, search_id):
+        return f"osint:search_accounts:{search_id}"
+
+    def create(self, search_id, username):
+        fields = {'username': username, 'version': 0}
+        for source, values in _initial_progress().items():
+            for field, value in values.items():
+                fields[f"{source}:{field}"] = json.dumps(value)
+
+        pipe = self.client.pipeline()
+        pipe.delete(self._key(search_id), self._accounts_key(search_id))
+        pipe.hset(self._key(search_id), mapping=fields)
+        pipe.expire(self._key(search_id), self.max_age)
+        pipe.set(f"osint:search_progress_latest:{username}", search_id, ex=self.max_age)
+        pipe.execute()
+
+    def update(self, search_id, source, fields):
+        key = self._key(search_id)
+        if not self.client.exists(key):
+            return
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={f"{source}:{field}": json.dumps(value) for field, value in fields.items()})
+        pipe.hincrby(key, 'version', 1)
+        pipe.execute()
+
+        # Once every source is done, keep the entry only for the TTL
+        if fields.get('status') in FINAL_STATUSES:
+            progress = self.get(search_id)
+            if progress and _is_finished(progress):
+                self.client.expire(key, self.ttl)
+                self.client.expire(self._accounts_key(search_id), self.ttl)
+
+    def increment(self, search_id, source, counters):
+        key = self._key(search_id)
+        if not self.client.exists(key):
+            return
+        pipe = self.client.pipeline()
+        for field, amount in counters.items():
+            # Counters are stored as JSON numbers, which HINCRBY reads as integers
+            pipe.hincrby(key, f"{source}:{field}", amount)
+        pipe.hincrby(key, 'version', 1)
+        pipe.execute()
+
+    def add_account(self, search_id, account):
+        pipe = self.client.pipeline()
+        pipe.rpush(self._accounts_key(search_id), json.dumps(account))
+        pipe.expire(self._accounts_key(search_id), self.max_age)
+        pipe.hincrby(self._key(search_id), 'version', 1)
+        pipe.execute()
+
+    def get_accounts(self, search_id, after=0):
+        accounts = self.client.lrange(self._accounts_key(search_id), after, -1)
+        return [(index, json.loads(account)) for index, account in enumerate(accounts, start=after + 1)]
+
+    def cancel(self, search_id):
+        key = self._key(search_id)
+        if not self.client.exists(key):
+            return
+        pipe = self.client.pipeline()
+        pipe.hset(key, 'cancelled', 1)
+        pipe.hincrby(key, 'version', 1)
+        pipe.execute()
+
+    def is_cancelled(self, search_id):
+        return self.client.hget(self._key(search_id), 'cancelled') is not None
+
+    def get_version(self, search_id):
+        version = self.client.hget(self._key(search_id), 'version')
+        return int(version) if version is not None else None
+
+    def wait_for_change(self, search_id, version, timeout):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.get_version(search_id) != version:
+                return
+            time.sleep(self.poll_interval)
+
+    def get(self, search_id):
+        fields = self.client.hgetall(self._key(search_id))
+        if not fields:
+            return None
+        progress = {source: {} for source in SOURCES}
+        for name, value in fields.items():
+            # Skip bookkeeping fields like username and version
+            if ':' not in name:
+                continue
+            source, field = name.split(':', 1)
+            progress.setdefault(source, {})[field] = json.loads(value)
+        return progress
+
+    def latest_for(self, username):
+        return self.client.get(f"osint:search_progress_latest:{username}")
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_progress_store():
+    """Return the configured progress store, creating it on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if Config.PROGRESS_REDIS_URL:
+                try:
+                    _store = RedisProgressStore(Config.PROGRESS_REDIS_URL,
+                                                Config.PROGRESS_TTL, Config.PROGRESS_MAX_AGE)
+                except ImportError:
+                    print("redis package not installed, keeping search progress in memory")
+            if _store is None:
+                _store = MemoryProgressStore(Config.PROGRESS_TTL, Config.PROGRESS_MAX_AGE)
+    return _store
+
+def create_progress(search_id, username):
+    """Register a new search with starting progress for every source"""
+    get_progress_store().create(search_id, username)
+
+def update_progress(search_id, source, status, message, found=None, checked=None, total=0):
+    """
+    Update the progress of one source of a search. The found/checked
+    counters are only set when given, use increment_progress() to add to them.
+    """
+    fields = {
+        'status': status,
+        'message': message
+    }
+    if found is not None:
+        fields['found'] = found
+    if checked is not None:
+        fields['total_checked'] = checked
+    if total > 0:
+        fields['total_sites'] = total
+
+    try:
+        get_progress_store().update(search_id, source, fields)
+    except Exception as e:
+        print(f"Error updating progress: {e}")
+
+def increment_progress(search_id, source, found=0, checked=0):
+    """Atomically add to the found/checked counters of one source"""
+    counters = {}
+    if found:
+        counters['found'] = found
+    if checked:
+        counters['total_checked'] = checked
+    if not counters:
+        return
+
+    try:
+        get_progress_store().increment(search_id, source, counters)
+    except Exception as e:
+        print(f"Error updating progress: {e}")
+
+def get_search_progress(search_id):
+    """Get current search progress, or None if the search is unknown or expired"""
+    try:
+        return get_progress_store().get(search_id)
+    except Exception as e:
+        print(f"Error reading progress: {e}")
+        return None
+
+def get_latest_search_id(username):
+    """Find the most recent search ID for a username"""
+    try:
+        return get_progress_store().latest_for(username)
+    except Exception as e:
+        print(f"Error reading progress: {e}")
+        return None
+
+def publish_account(search_id, account):
+    """Add a confirmed account to the search's live results log"""
+    try:
+        get_progress_store().add_account(search_id, account)
+    except Exception as e:
+        print(f"Error publishing account: {e}")
+
+def request_cancel(search_id):
+    """Flag a search as cancelled for whichever worker is running it"""
+    try:
+        get_progress_store().cancel(search_id)
+    except Exception as e:
+        print(f"Error cancelling search: {e}")
+
+def is_cancel_requested(search_id):
+    """Check whether someone asked for a search to be cancelled"""
+    try:
+        return get_progress_store().is_cancelled(search_id)
+    except Exception as e:
+        print(f"Error reading progress: {e}")
+        return False
+
+def is_search_finished(progress):
+    """Check whether every source of a search has stopped"""
+    return _is_finished(progress)
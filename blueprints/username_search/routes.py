@@ -1,14 +1,20 @@
 # blueprints/username_search/routes.py
-from flask import render_template, request, jsonify, redirect, url_for, flash, session
+from flask import render_template, request, jsonify, redirect, url_for, flash, session, Response
 from flask_login import current_user, login_required
 from blueprints.username_search import username_search_bp
-from blueprints.username_search.utils import search_username, get_search_progress
+from blueprints.username_search.utils import search_username, build_username_results, parse_usernames
+from blueprints.username_search.progress import (get_search_progress, get_latest_search_id, get_progress_store,
+                                                  create_progress, is_search_finished)
+from blueprints.username_search.http_pool import get_pool_stats
+from blueprints.username_search.site_health import get_health_stats
+from blueprints.username_search.control import cancel_search
 from datetime import datetime
 import json
-import os
-import tempfile
 import traceback
+import uuid
 from models import db, Scan
+from config import Config
+from jobs import submit_job
 
 @username_search_bp.route('/')
 def index():
@@ -22,12 +28,19 @@ def search():
     username = request.form.get('username', '')
     if not username:
         return redirect(url_for('username_search.index'))
+    # Fresh searches ignore cached verdicts and recheck every site
+    fresh = bool(request.form.get('fresh'))
     
-    # Store username in session for the progress page
+    # Give the search an ID and register it so the progress page can follow it
+    search_id = uuid.uuid4().hex
+    create_progress(search_id, username)
+    
+    # Store username and search ID in session for the progress page
     session['search_username'] = username
+    session['search_id'] = search_id
     
     # Redirect to the searching page
-    return render_template('username_search/searching.html', username=username)
+    return render_template('username_search/searching.html', username=username, search_id=search_id, fresh=fresh)
 
 @username_search_bp.route('/process_search', methods=['POST'])
 def process_search():
@@ -38,63 +51,20 @@ def process_search():
         username = request.form.get('username', '')
         if not username:
             return jsonify({'success': False, 'error': 'Username is required'})
+        search_id = request.form.get('search_id') or None
+        fresh = bool(request.form.get('fresh'))
         
         print(f"Starting search for username: {username}")
         
         # Start the search
-        search_result = search_username(username)
+        search_result = search_username(username, search_id, fresh)
         
         print(f"Search completed. Processing results...")
         
         # Combine results for the final output
-        combined_results = []
-        
-        # Process Sherlock results
-        sherlock_results = search_result.get('sherlock', [])
-        for site in sherlock_results:
-            combined_results.append(site)
-        
-        # Process WhatsMyName results
-        whatsmyname_results = search_result.get('whatsmyname', [])
-        for site in whatsmyname_results:
-            # Check if this site is already in results from Sherlock
-            if not any(r['site_name'] == site['site_name'] for r in combined_results):
-                combined_results.append(site)
-        
-        # Count categories
-        categories = {}
-        for result in combined_results:
-            category = result['category']
-            if category not in categories:
-                categories[category] = 0
-            categories[category] += 1
-        
-        # Calculate risk score based on number of accounts found
-        total_found = len(combined_results)
-        if total_found == 0:
-            risk_score = 0
-        elif total_found <= 5:
-            risk_score = 10
-        elif total_found <= 15:
-            risk_score = 25
-        elif total_found <= 30:
-            risk_score = 50
-        elif total_found <= 50:
-            risk_score = 75
-        else:
-            risk_score = 100
-        
-        # Create results object
-        scan_results = {
-            'username': username,
-            'scan_date': datetime.now(),
-            'sherlock': sherlock_results,
-            'whatsmyname': whatsmyname_results,
-            'combined_results': combined_results,
-            'categories': categories,
-            'total_found': total_found,
-            'risk_score': risk_score
-        }
+        scan_results = build_username_results(username, search_result)
+        total_found = scan_results['total_found']
+        risk_score = scan_results['risk_score']
         
         # Save results to database if user is logged in
         if current_user.is_authenticated:
@@ -130,39 +100,139 @@ def process_search():
         print(traceback.format_exc())
         return jsonify({'success': False, 'error': str(e)})
 
+@username_search_bp.route('/batch', methods=['POST'])
+def batch_search():
+    """
+    Search a list of usernames in one background job.
+    Accepts JSON {"usernames": [...], "fresh": false} or a form field with
+    one username per line. Returns the job ID and where to follow it.
+    """
+    data = request.get_json(silent=True) or request.form
+    usernames = parse_usernames(data.get('usernames', ''))
+    
+    if not usernames:
+        return jsonify({'success': False, 'error': 'At least one username is required'}), 400
+    if len(usernames) > Config.BATCH_MAX_USERNAMES:
+        return jsonify({'success': False, 'error': f'At most {Config.BATCH_MAX_USERNAMES} usernames per batch'}), 400
+    
+    try:
+        user_id = current_user.id if current_user.is_authenticated else None
+        target = ', '.join(usernames)
+        if len(target) > 256:
+            target = f"{target[:240]}... ({len(usernames)})"
+        job = submit_job('username_batch', target, {'usernames': usernames, 'fresh': bool(data.get('fresh'))}, user_id)
+    except Exception as e:
+        print(f"Error submitting batch search: {e}")
+        print(traceback.format_exc())
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'usernames': usernames,
+        'status_url': url_for('jobs.status', job_id=job.id),
+        'result_url': url_for('jobs.result', job_id=job.id),
+        'view_url': url_for('jobs.view', job_id=job.id)
+    }), 202
+
+@username_search_bp.route('/cancel/<search_id>', methods=['POST'])
+def cancel(search_id):
+    """
+    Stop a running search. It finishes with the accounts found so far.
+    """
+    if get_search_progress(search_id) is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired search'}), 404
+    
+    running_here = cancel_search(search_id)
+    return jsonify({'success': True, 'search_id': search_id, 'running_here': running_here})
+
 @username_search_bp.route('/check_progress')
 def check_progress():
     """
     Check the current progress of an ongoing search
     """
-    progress_file = request.args.get('progress_file', '')
-    username = session.get('search_username', '')
-    
-    if not progress_file:
-        # Try to find the most recent progress file for this username
-        temp_dir = tempfile.gettempdir()
-        potential_files = [f for f in os.listdir(temp_dir) if f.startswith(f"search_progress_{username}_") and f.endswith(".json")]
-        if potential_files:
-            # Sort by creation time, newest first
-            potential_files.sort(key=lambda f: os.path.getctime(os.path.join(temp_dir, f)), reverse=True)
-            progress_file = os.path.join(temp_dir, potential_files[0])
-    
-    if not progress_file or not os.path.exists(progress_file):
-        # If progress file does not exist, return a default progress message
-        return jsonify({
-            'sherlock': {'status': 'starting', 'message': 'Starting search...', 'found': 0, 'total_checked': 0},
-            'whatsmyname': {'status': 'starting', 'message': 'Starting search...', 'found': 0, 'total_checked': 0}
-        })
-    
-    # Read the progress file
-    progress = get_search_progress(progress_file)
+    search_id = request.args.get('search_id', '') or session.get('search_id', '')
+    
+    if not search_id:
+        # Fall back to the most recent search for this username
+        search_id = get_latest_search_id(session.get('search_username', ''))
+    
+    progress = get_search_progress(search_id) if search_id else None
     if progress:
         return jsonify(progress)
-    else:
-        return jsonify({
-            'sherlock': {'status': 'error', 'message': 'Error reading progress', 'found': 0, 'total_checked': 0},
-            'whatsmyname': {'status': 'error', 'message': 'Error reading progress', 'found': 0, 'total_checked': 0}
-        })
+    
+    # If the search isn't registered (yet), return a default progress message
+    return jsonify({
+        'sherlock': {'status': 'starting', 'message': 'Starting search...', 'found': 0, 'total_checked': 0},
+        'whatsmyname': {'status': 'starting', 'message': 'Starting search...', 'found': 0, 'total_checked': 0}
+    })
+
+@username_search_bp.route('/stream/<search_id>')
+def stream(search_id):
+    """
+    Stream live progress and found accounts for a search as Server-Sent Events.
+    Reconnecting clients resume after the account given in Last-Event-ID.
+    """
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0)
+    except ValueError:
+        last_event_id = 0
+    
+    return Response(_search_events(search_id, last_event_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _format_event(event, data, event_id=None):
+    """Format a single Server-Sent Event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return '\n'.join(lines) + '\n\n'
+
+def _search_events(search_id, last_event_id):
+    """Generate the event stream for a search until every source has finished"""
+    store = get_progress_store()
+    sent_version = None
+    
+    # Ask the browser to wait a bit before reconnecting
+    yield 'retry: 2000\n\n'
+    
+    while True:
+        version = store.get_version(search_id)
+        if version is None:
+            yield _format_event('error', {'error': 'Unknown or expired search'})
+            return
+        
+        # Accounts carry their position in the log as the event ID
+        for account_id, account in store.get_accounts(search_id, last_event_id):
+            yield _format_event('account', account, account_id)
+            last_event_id = account_id
+        
+        if version != sent_version:
+            progress = get_search_progress(search_id)
+            if progress is None:
+                yield _format_event('error', {'error': 'Unknown or expired search'})
+                return
+            yield _format_event('progress', progress)
+            sent_version = version
+            
+            if is_search_finished(progress):
+                yield _format_event('done', {'total_accounts': last_event_id})
+                return
+        
+        # Sleep until something changes, sending a comment to keep proxies happy
+        store.wait_for_change(search_id, version, timeout=15)
+        if store.get_version(search_id) == version:
+            yield ': keep-alive\n\n'
+
+@username_search_bp.route('/pool_stats')
+def pool_stats():
+    """
+    Report connection pool hits and misses for the site check sessions,
+    plus per-host health (adaptive timeouts and open circuits)
+    """
+    return jsonify(dict(get_pool_stats(), site_health=get_health_stats()))
 
 @username_search_bp.route('/show_results', methods=['POST'])
 def show_results():
@@ -0,0 +1,179 @@
+# blueprints/username_search/sherlock_runner.py
+"""
+Runs the sherlock command without letting it stall or hang a worker.
+
+The process runs on the engine event loop, which drains stdout and stderr
+concurrently so neither pipe can fill up and block Sherlock. Output lines
+are parsed into records as they arrive and handed to the calling thread,
+stderr is kept (up to _STDERR_LIMIT bytes) for error reporting, and the
+process is killed once its wall-clock timeout passes or the search's
+control says to stop.
+
+Several runs can go at once, which is how a search splits Sherlock's site
+list into shards that run as parallel processes on separate cores.
+"""
+import asyncio
+import concurrent.futures
+import queue
+import re
+import time
+
+from blueprints.username_search.engine import get_engine_loop
+
+# How often the calling thread checks the control while Sherlock is quiet
+_STOP_POLL_INTERVAL = 0.2
+
+# Only the tail of stderr is kept, that's where the error is
+_STDERR_LIMIT = 64 * 1024
+
+# Stdout lines longer than this are skipped
+_LINE_LIMIT = 1024 * 1024
+
+_ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+_RESULT_LINE = re.compile(r'^\[(?P<mark>[+\-*!])\]\s*(?P<site>[^:]+?):\s*(?P<detail>.*)$')
+
+def parse_sherlock_line(line):
+    """
+    Parse one line of Sherlock output into a record, or None for lines that
+    aren't site results. Records have a status of 'found', 'not_found' or
+    'error' plus the site_name, and the url for found accounts.
+    """
+    match = _RESULT_LINE.match(_ANSI_ESCAPE.sub('', line).strip())
+    if not match or match.group('mark') in '*!':
+        return None
+
+    site_name = match.group('site').strip()
+    detail = match.group('detail').strip()
+    if match.group('mark') == '+':
+        if not detail:
+            return None
+        return {'status': 'found', 'site_name': site_name, 'url': detail}
+    if detail.lower().startswith('not found'):
+        return {'status': 'not_found', 'site_name': site_name}
+    return {'status': 'error', 'site_name': site_name, 'detail': detail}
+
+class SherlockProcess:
+    """
+    One run of the sherlock command. Iterate records() (or stream_sherlock()
+    for several runs at once) to start it; when the iteration ends
+    returncode, stderr, timed_out and stopped describe how it finished.
+    """
+
+    def __init__(self, cmd, timeout=None, control=None):
+        self.cmd = list(cmd)
+        self.control = control
+        if control is not None:
+            # Killed at its own timeout or when the search runs out of time, whichever comes first
+            limits = [t for t in (timeout, control.remaining()) if t is not None]
+            timeout = min(limits) if limits else None
+        self.timeout = timeout
+        self.returncode = None
+        self.timed_out = False
+        self.stopped = False
+        self._stderr = bytearray()
+
+    @property
+    def stderr(self):
+        return self._stderr.decode('utf-8', 'replace')
+
+    def records(self):
+        """Start the process and yield result records as Sherlock prints them"""
+        return stream_sherlock([self], self.control)
+
+    async def _run(self, results):
+        process = await asyncio.create_subprocess_exec(
+            *self.cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=_LINE_LIMIT
+        )
+
+        async def read_stdout():
+            while True:
+                try:
+                    line = await process.stdout.readline()
+                except ValueError:
+                    # Line longer than the limit, the reader has dropped it
+                    continue
+                if not line:
+                    return
+                record = parse_sherlock_line(line.decode('utf-8', 'replace'))
+                if record is not None:
+                    results.put(record)
+
+        async def read_stderr():
+            while True:
+                chunk = await process.stderr.read(16 * 1024)
+                if not chunk:
+                    return
+                self._stderr.extend(chunk)
+                if len(self._stderr) > _STDERR_LIMIT:
+                    del self._stderr[:-_STDERR_LIMIT]
+
+        started = time.monotonic()
+        tasks = [asyncio.ensure_future(read_stdout()), asyncio.ensure_future(read_stderr()),
+                 asyncio.ensure_future(process.wait())]
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=self.timeout)
+            if pending:
+                self.timed_out = True
+                print(f"Sherlock killed after {time.monotonic() - started:.0f}s: {' '.join(self.cmd)}")
+            for task in done:
+                task.result()
+        finally:
+            if process.returncode is None:
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+                await process.wait()
+            self.returncode = process.returncode
+            for task in tasks:
+                task.cancel()
+
+def stream_sherlock(runs, control=None):
+    """
+    Run several SherlockProcess objects at once and yield the records of
+    all of them as they arrive. Stops and kills every run when the control
+    says to stop.
+    """
+    results = queue.Queue()
+    done = object()
+
+    async def runner(run):
+        try:
+            await run._run(results)
+        finally:
+            results.put((done, run))
+
+    loop = get_engine_loop()
+    futures = [asyncio.run_coroutine_threadsafe(runner(run), loop) for run in runs]
+    # Runs whose records have all been yielded
+    finished = set()
+    try:
+        while len(finished) < len(runs):
+            if control is not None and control.should_stop():
+                # Only runs cut short lose sites
+                for run in runs:
+                    if run not in finished:
+                        run.stopped = True
+                return
+            try:
+                item = results.get(timeout=_STOP_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if isinstance(item, tuple) and item[0] is done:
+                finished.add(item[1])
+                continue
+            yield item
+        # Surface any error from starting or reading a process
+        for future in futures:
+            future.result()
+    finally:
+        running = [future for future in futures if not future.done()]
+        if running:
+            # Kills the processes; give them a moment so returncodes are known
+            for future in running:
+                future.cancel()
+            concurrent.futures.wait(running, timeout=5)
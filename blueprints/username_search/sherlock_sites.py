@@ -0,0 +1,254 @@
+# blueprints/username_search/sherlock_sites.py
+"""
+In-process Sherlock checks.
+
+Sherlock's site data (data.json) is loaded and compiled once per process and
+its checks run as coroutines on the shared username search engine, so a search
+no longer starts a Sherlock interpreter or parses its console output. Each
+site's errorType is translated into a compiled rule:
+
+- 'message':      no account if any errorMsg appears in the page
+- 'status_code':  no account on any errorCode or a non-2xx status
+- 'response_url': no account unless the request succeeds without a redirect
+
+Like the Sherlock CLI, NSFW sites are left out and usernames that fail a
+site's regexCheck are not checked on that site.
+"""
+import asyncio
+import importlib.util
+import json
+import os
+import re
+import threading
+from urllib.parse import urlsplit
+
+import aiohttp
+import requests
+
+from config import Config
+from blueprints.username_search.engine import site_request
+from blueprints.username_search.http_pool import is_cheap_to_drain
+from blueprints.username_search.site_index import canonical_site_key
+from blueprints.username_search.site_health import SiteUnavailable
+
+# Where the installed Sherlock packages keep their site data
+_PACKAGE_DATA = (
+    ('sherlock_project', ('resources', 'data.json')),
+    ('sherlock', ('resources', 'data.json')),
+)
+
+_ERROR_TYPES = ('message', 'status_code', 'response_url')
+
+_lock = threading.Lock()
+_sites = None
+
+def get_sherlock_sites():
+    """
+    Return the compiled list of Sherlock site rules, loading them on first use.
+    Returns None if no site data is available.
+    """
+    global _sites
+    with _lock:
+        if _sites is None:
+            raw = _load_site_data()
+            if raw is not None:
+                _sites = compile_sherlock_data(raw)
+                print(f"Loaded {len(_sites)} Sherlock sites")
+        return _sites
+
+def _package_data_path():
+    """Find data.json inside an installed Sherlock package"""
+    for package, parts in _PACKAGE_DATA:
+        try:
+            spec = importlib.util.find_spec(package)
+        except (ImportError, ValueError):
+            continue
+        if spec is None or not spec.submodule_search_locations:
+            continue
+        for location in spec.submodule_search_locations:
+            path = os.path.join(location, *parts)
+            if os.path.exists(path):
+                return path
+    return None
+
+def _load_site_data():
+    """Read Sherlock's data.json from the first place that has it"""
+    for path in (Config.SHERLOCK_DATA_PATH, _package_data_path(), Config.SHERLOCK_DATA_CACHE):
+        if not path or not os.path.exists(path):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error reading Sherlock data from {path}: {e}")
+
+    if Config.SHERLOCK_DATA_PATH:
+        return None
+
+    # No local copy, download one and keep it for next time
+    try:
+        response = requests.get(Config.SHERLOCK_DATA_URL, timeout=10)
+        response.raise_for_status()
+        raw = response.json()
+    except Exception as e:
+        print(f"Error fetching Sherlock data: {e}")
+        return None
+
+    try:
+        os.makedirs(os.path.dirname(Config.SHERLOCK_DATA_CACHE), exist_ok=True)
+        tmp_path = f"{Config.SHERLOCK_DATA_CACHE}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(response.content)
+        os.replace(tmp_path, Config.SHERLOCK_DATA_CACHE)
+    except Exception as e:
+        print(f"Error caching Sherlock data: {e}")
+    return raw
+
+def _as_tuple(value):
+    if value is None:
+        return ()
+    if isinstance(value, (list, tuple)):
+        return tuple(value)
+    return (value,)
+
+def compile_sherlock_site(name, info):
+    """
+    Translate one data.json entry into a rule for the engine.
+    Returns None if the entry can't be used.
+    """
+    if not isinstance(info, dict) or info.get('isNSFW'):
+        return None
+
+    url = info.get('url')
+    error_types = tuple(t for t in _as_tuple(info.get('errorType')) if t in _ERROR_TYPES)
+    if not url or '{}' not in url or not error_types:
+        return None
+
+    probe = info.get('urlProbe') or url
+    rule = {
+        'name': name,
+        'url_parts': tuple(url.split('{}')),
+        'probe_parts': tuple(probe.split('{}')),
+        'host': urlsplit(probe).netloc.lower(),
+        'site_key': canonical_site_key(url),
+        'error_types': error_types,
+        'error_msgs': _as_tuple(info.get('errorMsg')),
+        'error_codes': tuple(int(code) for code in _as_tuple(info.get('errorCode'))),
+        'headers': info.get('headers') or None,
+        'payload': info.get('request_payload'),
+        # A redirect is what marks a missing account for response_url sites
+        'allow_redirects': 'response_url' not in error_types,
+        'regex': None,
+    }
+
+    if 'message' in error_types and not rule['error_msgs']:
+        return None
+
+    # Sherlock only needs the body for message checks, so status checks use HEAD
+    method = info.get('request_method')
+    if method is None:
+        method = 'HEAD' if error_types == ('status_code',) and info.get('request_head_only', True) else 'GET'
+    rule['method'] = method.upper()
+
+    if info.get('regexCheck'):
+        try:
+            rule['regex'] = re.compile(info['regexCheck'])
+        except re.error:
+            return None
+
+    return rule
+
+def compile_sherlock_data(raw):
+    """Compile a Sherlock data.json document into a list of site rules"""
+    sites = []
+    skipped = 0
+    for name, info in raw.items():
+        # Skip the schema reference and any other metadata keys
+        if name.startswith('$'):
+            continue
+        rule = compile_sherlock_site(name, info)
+        if rule is None:
+            skipped += 1
+            continue
+        sites.append(rule)
+
+    if skipped:
+        print(f"Skipped {skipped} Sherlock site entries")
+    return sites
+
+def _fill_payload(payload, username):
+    """Put the username into a request payload template"""
+    if payload is None:
+        return None
+    escaped = json.dumps(username)[1:-1]
+    return json.loads(json.dumps(payload).replace('{}', escaped))
+
+def sherlock_verdict(site, status_code, content=None):
+    """Decide from a response whether the account exists, following Sherlock's rules"""
+    error_types = site['error_types']
+    if 'message' in error_types:
+        if content is None or any(msg in content for msg in site['error_msgs']):
+            return False
+    if 'status_code' in error_types and status_code in site['error_codes']:
+        return False
+    if 'status_code' in error_types or 'response_url' in error_types:
+        return 200 <= status_code < 300
+    return True
+
+async def _read_text(response):
+    """Read the body up to the byte cap and decode it"""
+    chunks = []
+    received = 0
+    async for chunk in response.content.iter_chunked(Config.WMN_READ_CHUNK_BYTES):
+        chunks.append(chunk)
+        received += len(chunk)
+        if received >= Config.WMN_MAX_BODY_BYTES:
+            break
+    data = b''.join(chunks)[:Config.WMN_MAX_BODY_BYTES]
+    try:
+        return data.decode(response.charset or 'utf-8', errors='replace')
+    except LookupError:
+        return data.decode('utf-8', errors='replace')
+
+async def check_sherlock_site(session, username, site):
+    """
+    Check a single Sherlock site on the engine.
+    Returns a (site, result) tuple where result is None if no account was found
+    and False if the check itself failed.
+    """
+    if site['regex'] is not None and not site['regex'].search(username):
+        # The site can't have this username at all
+        return site, None
+
+    probe_url = username.join(site['probe_parts'])
+
+    try:
+        async with site_request(session, site['host'], site['method'], probe_url,
+                                verdict_statuses=site['error_codes'],
+                                headers=site['headers'],
+                                json=_fill_payload(site['payload'], username),
+                                allow_redirects=site['allow_redirects']) as response:
+            status_code = response.status
+            content = None
+            if 'message' in site['error_types']:
+                content = await _read_text(response)
+            elif site['method'] != 'HEAD' and is_cheap_to_drain(response.headers):
+                # Drain a small body so the connection stays in the pool
+                await response.read()
+
+    except (SiteUnavailable, aiohttp.ClientError, asyncio.TimeoutError):
+        # Skip this site if it can't be checked right now
+        return site, False
+    except Exception as e:
+        print(f"Error checking {site['name']} with Sherlock rules: {e}")
+        return site, False
+
+    if not sherlock_verdict(site, status_code, content):
+        return site, None
+
+    return site, {
+        'site_name': site['name'],
+        'url': username.join(site['url_parts']),
+        'site_key': site['site_key'],
+        'source': 'Sherlock'
+    }
@@ -0,0 +1,165 @@
+# blueprints/username_search/site_health.py
+"""
+Per-host latency and error tracking for username checks.
+
+Every check records how long the host took to answer, or that it failed.
+From the recent latencies each host gets its own timeout: a multiple of a
+high percentile, clamped between SITE_TIMEOUT_MIN and SITE_TIMEOUT_MAX, so
+fast sites fail fast and slow but healthy sites get the time they need.
+Until a host has enough samples the flat WMN_REQUEST_TIMEOUT is used.
+
+After SITE_BREAKER_FAILURES failures in a row a host's circuit opens and its
+checks are skipped for SITE_BREAKER_COOLDOWN seconds. Then one trial request
+is let through; success closes the circuit, failure opens it again.
+
+Requests to each host also go through a token bucket shared by every
+search in the process (HOST_RATE_LIMIT per second, bursts of
+HOST_RATE_BURST). Throttled responses (429, or 503 with Retry-After) pause
+the host's bucket for the Retry-After time, or back off exponentially with
+jitter, and are retried up to CHECK_MAX_RETRIES times.
+
+Statistics are kept in memory per worker process.
+"""
+import threading
+import time
+from collections import deque
+
+from config import Config
+from ratelimit import get_bucket, parse_retry_after, backoff_delay
+
+class SiteUnavailable(Exception):
+    """A site can't be checked right now: its circuit is open, it is failing or it keeps throttling us"""
+
+# Minimum samples before a host's own timeout replaces the default
+_MIN_SAMPLES = 5
+
+class _HostHealth:
+    __slots__ = ('latencies', 'timeout', 'consecutive_failures', 'open_until',
+                 'trial_running', 'successes', 'failures', 'skipped', 'throttled')
+
+    def __init__(self):
+        self.latencies = deque(maxlen=Config.SITE_LATENCY_WINDOW)
+        self.timeout = None
+        self.consecutive_failures = 0
+        self.open_until = 0
+        self.trial_running = False
+        self.successes = 0
+        self.failures = 0
+        self.skipped = 0
+        self.throttled = 0
+
+    def update_timeout(self):
+        if len(self.latencies) < _MIN_SAMPLES:
+            self.timeout = None
+            return
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * Config.SITE_TIMEOUT_PERCENTILE / 100))
+        timeout = ordered[index] * Config.SITE_TIMEOUT_MULTIPLIER
+        self.timeout = min(Config.SITE_TIMEOUT_MAX, max(Config.SITE_TIMEOUT_MIN, timeout))
+
+_lock = threading.Lock()
+_hosts = {}
+
+def _get(host):
+    health = _hosts.get(host)
+    if health is None:
+        health = _hosts[host] = _HostHealth()
+    return health
+
+def allow_request(host):
+    """Check whether a host's circuit lets a request through right now"""
+    with _lock:
+        health = _get(host)
+        if health.open_until == 0:
+            return True
+        now = time.monotonic()
+        if now < health.open_until:
+            health.skipped += 1
+            return False
+        # Cooldown is over, let a single trial request through and hold the
+        # rest back until it reports (or for as long as it could possibly take)
+        health.trial_running = True
+        health.open_until = now + Config.SITE_TIMEOUT_MAX
+        return True
+
+def get_timeout(host):
+    """Timeout in seconds for the next request to a host"""
+    with _lock:
+        health = _hosts.get(host)
+        if health is None or health.timeout is None:
+            return Config.WMN_REQUEST_TIMEOUT
+        return health.timeout
+
+def record_success(host, latency):
+    """Record a host that answered, latency is the time to the response headers"""
+    with _lock:
+        health = _get(host)
+        health.successes += 1
+        health.latencies.append(latency)
+        health.update_timeout()
+        health.consecutive_failures = 0
+        health.open_until = 0
+        health.trial_running = False
+
+def record_failure(host, latency=None):
+    """
+    Record a failed request. Pass the time waited for timeouts, so a host
+    that keeps hitting its timeout gradually gets a longer one.
+    """
+    with _lock:
+        health = _get(host)
+        health.failures += 1
+        health.consecutive_failures += 1
+        if latency is not None:
+            health.latencies.append(latency)
+            health.update_timeout()
+
+        if health.trial_running or health.consecutive_failures >= Config.SITE_BREAKER_FAILURES:
+            health.open_until = time.monotonic() + Config.SITE_BREAKER_COOLDOWN
+            health.trial_running = False
+
+def get_host_bucket(host):
+    """The rate limiter shared by every request to a host"""
+    return get_bucket(f"site:{host}", Config.HOST_RATE_LIMIT, Config.HOST_RATE_BURST)
+
+def throttle_delay(host, status_code, headers, attempt):
+    """
+    Check a response for throttling. Returns None if the host answered
+    normally, otherwise how long to wait before retrying. Raises
+    SiteUnavailable once the retries are used up or the host wants us to
+    wait longer than CHECK_RETRY_AFTER_MAX.
+    """
+    retry_after = parse_retry_after(headers.get('Retry-After'))
+    if status_code != 429 and not (status_code == 503 and retry_after is not None):
+        return None
+
+    if retry_after is not None:
+        # Hold back every search's requests to this host, not just this one
+        get_host_bucket(host).pause(retry_after)
+        delay = retry_after
+    else:
+        delay = backoff_delay(attempt, Config.CHECK_BACKOFF_BASE, Config.CHECK_BACKOFF_MAX)
+
+    if attempt >= Config.CHECK_MAX_RETRIES or delay > Config.CHECK_RETRY_AFTER_MAX:
+        with _lock:
+            _get(host).throttled += 1
+        raise SiteUnavailable(host)
+    return delay
+
+def is_server_error(status_code):
+    """Statuses that count as the host failing rather than answering"""
+    return status_code >= 500
+
+def get_health_stats():
+    """Summary of the tracked hosts, for monitoring"""
+    now = time.monotonic()
+    with _lock:
+        open_hosts = sorted(host for host, health in _hosts.items() if health.open_until > now)
+        return {
+            'hosts': len(_hosts),
+            'adaptive_timeouts': sum(1 for health in _hosts.values() if health.timeout is not None),
+            'open_circuits': open_hosts,
+            'skipped': sum(health.skipped for health in _hosts.values()),
+            'failures': sum(health.failures for health in _hosts.values()),
+            'throttled': sum(health.throttled for health in _hosts.values()),
+        }
@@ -0,0 +1,98 @@
+# blueprints/username_search/site_index.py
+"""
+Deduplication of sites across Sherlock and WhatsMyName.
+
+Every site rule gets a canonical key built from its profile URL template:
+lowercase host without 'www.', the path and query with the username
+placeholder normalized and no trailing slash. Sites with the same key are
+the same site, whatever each catalog calls them, so a search checks each one
+once and results are merged with a set lookup instead of pairwise compares.
+"""
+import re
+import threading
+from urllib.parse import urlsplit
+
+# Placeholder used in canonical keys
+_PLACEHOLDER = '{}'
+
+_NAME_CLEANUP = re.compile(r'[^0-9a-z]+')
+
+_plan_lock = threading.Lock()
+_plan_cache = {}
+
+def canonical_site_key(url_template, placeholder='{}'):
+    """Build the canonical key for a profile URL template"""
+    parts = urlsplit(url_template.replace(placeholder, _PLACEHOLDER).strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    path = parts.path.rstrip('/').lower()
+    key = f"{host}{path}"
+    if parts.query:
+        key = f"{key}?{parts.query.lower()}"
+    return key
+
+def canonical_site_name(name):
+    """Normalize a site name so spelling variants like 'Dev.to' and 'devto' match"""
+    return _NAME_CLEANUP.sub('', name.casefold())
+
+def plan_site_checks(sherlock_sites, wmn_sites):
+    """
+    Split the work between the two catalogs so each site is checked once.
+    Sherlock keeps its sites; WhatsMyName checks only the sites Sherlock
+    doesn't cover. Both lists come back sorted by key so the plan is stable.
+    The plan is cached until either catalog is replaced.
+    """
+    cache_key = (id(sherlock_sites), id(wmn_sites))
+    with _plan_lock:
+        entry = _plan_cache.get(cache_key)
+    if entry is not None:
+        return entry[0]
+
+    covered_keys = {site['site_key'] for site in sherlock_sites}
+    covered_names = {canonical_site_name(site['name']) for site in sherlock_sites}
+    remaining = [site for site in wmn_sites
+                 if site['site_key'] not in covered_keys
+                 and canonical_site_name(site['name']) not in covered_names]
+
+    plan = (
+        sorted(sherlock_sites, key=lambda site: site['site_key']),
+        sorted(remaining, key=lambda site: site['site_key']),
+    )
+    print(f"Site plan: {len(plan[0])} Sherlock sites, {len(plan[1])} WhatsMyName sites "
+          f"({len(wmn_sites) - len(remaining)} duplicates skipped)")
+
+    with _plan_lock:
+        # Old catalogs are gone once replaced, so only the latest plan is kept
+        _plan_cache.clear()
+        # Holding the lists keeps their ids from being reused
+        _plan_cache[cache_key] = (plan, sherlock_sites, wmn_sites)
+    return plan
+
+def result_site_key(result, username):
+    """Canonical key for a found account, from its rule or its URL"""
+    if result.get('site_key'):
+        return result['site_key']
+    return canonical_site_key(result.get('url', '').replace(username, _PLACEHOLDER))
+
+def merge_results(result_lists, username):
+    """
+    Merge result lists in priority order, dropping accounts already seen
+    under the same site key or site name, and sort by site name
+    """
+    seen_keys = set()
+    seen_names = set()
+    merged = []
+    for results in result_lists:
+        for result in results:
+            key = result_site_key(result, username)
+            name = canonical_site_name(result['site_name'])
+            if key in seen_keys or (name and name in seen_names):
+                continue
+            seen_keys.add(key)
+            if name:
+                seen_names.add(name)
+            merged.append(result)
+
+    merged.sort(key=lambda result: (result['site_name'].casefold(), result.get('source', '')))
+    return merged
@@ -1,272 +1,471 @@
 # blueprints/username_search/utils.py
 import subprocess
-import json
 import os
 import requests
-import tempfile
 import time
 import random
-from pathlib import Path
 import concurrent.futures
-import threading
+import functools
 import re
+import uuid
+from datetime import datetime
+from config import Config
+from blueprints.username_search.progress import create_progress, update_progress, increment_progress, publish_account
+from blueprints.username_search.http_pool import get_session, is_cheap_to_drain
+from blueprints.username_search.catalog import get_wmn_sites, build_check_url
+from blueprints.username_search.matcher import (verify_content, content_shows_account, page_shows_error,
+                                                 needs_body, StreamedBody)
+from blueprints.username_search.verify_pool import is_verify_offloaded, verify_body
+from blueprints.username_search.fingerprints import get_fingerprint
+from blueprints.username_search.verdict_cache import split_cached, store_verdicts
+from blueprints.username_search.site_index import plan_site_checks, merge_results
+from blueprints.username_search.control import start_search_control
+from blueprints.username_search.site_health import (allow_request, get_timeout, record_success,
+                                                     record_failure, is_server_error, get_host_bucket,
+                                                     throttle_delay, SiteUnavailable)
 
-def search_username(username):
+# Sherlock command progress is written to the progress store at most this often
+_SHERLOCK_PROGRESS_INTERVAL = 0.5
+
+def search_username(username, search_id=None, fresh=False):
+    """
+    Search for username across platforms using both Sherlock and WhatsMyName concurrently.
+    Set fresh to recheck every site instead of using cached verdicts.
+    """
+    # Register the search so its progress can be polled
+    search_id = search_id or uuid.uuid4().hex
+    create_progress(search_id, username)
+    
+    # Check every site once, even when both catalogs list it
+    sherlock_sites, wmn_sites = get_site_plan()
+    return _run_search(username, search_id, fresh, sherlock_sites, wmn_sites)
+
+def _run_search(username, search_id, fresh, sherlock_sites, wmn_sites):
     """
-    Search for username across platforms using both Sherlock and WhatsMyName concurrently
+    Run the Sherlock and WhatsMyName checks for a registered search within
+    its time budget. When the budget runs out or the search is cancelled the
+    results are partial and the sites that were never checked are listed.
     """
-    # Create progress tracking objects
-    progress_file = os.path.join(tempfile.gettempdir(), f"search_progress_{username}_{int(time.time())}.json")
-    
-    # Initialize progress file
-    progress = {
-        'sherlock': {
-            'status': 'starting',
-            'message': 'Starting Sherlock search...',
-            'found': 0,
-            'total_checked': 0,
-            'total_sites': 0
-        },
-        'whatsmyname': {
-            'status': 'starting',
-            'message': 'Starting WhatsMyName search...',
-            'found': 0,
-            'total_checked': 0,
-            'total_sites': 0
-        }
+    control = start_search_control(search_id)
+    try:
+        # Use ThreadPoolExecutor to run both searches in parallel
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            # Submit both search tasks
+            sherlock_future = executor.submit(search_sherlock, username, search_id, fresh, sherlock_sites, control)
+            whatsmyname_future = executor.submit(search_whatsmyname, username, search_id, fresh, wmn_sites, control)
+            
+            # Wait for both to complete and get results
+            sherlock_results = sherlock_future.result()
+            whatsmyname_results = whatsmyname_future.result()
+    finally:
+        control.close()
+    
+    skipped = control.skipped
+    
+    # Return both results and the search ID
+    return {
+        'sherlock': sherlock_results,
+        'whatsmyname': whatsmyname_results,
+        'search_id': search_id,
+        'partial': bool(skipped),
+        'cancelled': control.cancelled,
+        'skipped_sites': sorted({name for names in skipped.values() for name in names})
     }
+
+def _finish_progress(search_id, source, control, found, total_sites):
+    """Final progress update for a source, saying why it stopped"""
+    if control is not None and control.cancelled:
+        update_progress(search_id, source, 'cancelled', 
+                       f"Cancelled with {found} accounts found", found, total_sites, total_sites)
+    elif control is not None and source in control.skipped:
+        update_progress(search_id, source, 'completed', 
+                       f"Time limit reached with {found} accounts found", found, total_sites, total_sites)
+    else:
+        update_progress(search_id, source, 'completed', 
+                       f"Completed with {found} accounts found", found, total_sites, total_sites)
+
+def parse_usernames(value):
+    """
+    Turn a list or a block of text (one username per line, or separated by
+    commas or spaces) into a clean list of unique usernames, keeping order
+    """
+    if isinstance(value, str):
+        value = re.split(r'[\s,;]+', value)
     
-    with open(progress_file, 'w') as f:
-        json.dump(progress, f)
+    usernames = []
+    seen = set()
+    for username in value or []:
+        username = str(username).strip().lstrip('@')
+        if username and username not in seen:
+            seen.add(username)
+            usernames.append(username)
+    return usernames
+
+def _rotate(sites, slot, slots):
+    """Start a site list at a different point for each concurrent search"""
+    if not sites or slots <= 1:
+        return sites
+    offset = len(sites) * slot // slots
+    return sites[offset:] + sites[:offset]
+
+def search_usernames(usernames, fresh=False, on_result=None):
+    """
+    Search many usernames sharing one site plan, connection pool and engine.
+    Up to BATCH_MAX_PARALLEL_SEARCHES usernames run at once, each starting
+    its site list at a different offset so concurrent searches spread over
+    different hosts instead of queueing on the same ones.
+    on_result(username, search_result) is called from this thread as each
+    username finishes. Returns {username: search_result}.
+    """
+    sherlock_sites, wmn_sites = get_site_plan()
+    parallel = max(1, min(Config.BATCH_MAX_PARALLEL_SEARCHES, len(usernames)))
+    results = {}
     
-    # Use ThreadPoolExecutor to run both searches in parallel
-    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-        # Submit both search tasks
-        sherlock_future = executor.submit(search_sherlock, username, progress_file)
-        whatsmyname_future = executor.submit(search_whatsmyname, username, progress_file)
-        
-        # Wait for both to complete and get results
-        sherlock_results = sherlock_future.result()
-        whatsmyname_results = whatsmyname_future.result()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=parallel, thread_name_prefix='batch-search') as executor:
+        futures = {}
+        for index, username in enumerate(usernames):
+            search_id = uuid.uuid4().hex
+            create_progress(search_id, username)
+            slot = index % parallel
+            future = executor.submit(_run_search, username, search_id, fresh,
+                                     _rotate(sherlock_sites, slot, parallel),
+                                     _rotate(wmn_sites, slot, parallel))
+            futures[future] = username
+        
+        for future in concurrent.futures.as_completed(futures):
+            username = futures[future]
+            try:
+                search_result = future.result()
+            except Exception as e:
+                print(f"Error searching username {username}: {e}")
+                continue
+            results[username] = search_result
+            if on_result:
+                on_result(username, search_result)
+    
+    return results
+
+def get_site_plan():
+    """
+    Return the (sherlock_sites, wmn_sites) to check in a search, with sites
+    both catalogs share assigned to Sherlock only. Either list is None when
+    that catalog isn't available to run in process.
+    """
+    sherlock_sites = None
+    if Config.SHERLOCK_MODE == 'inprocess':
+        from blueprints.username_search.sherlock_sites import get_sherlock_sites
+        sherlock_sites = get_sherlock_sites()
+    wmn_sites = get_wmn_sites()
+    
+    if sherlock_sites and wmn_sites:
+        return plan_site_checks(sherlock_sites, wmn_sites)
+    return sherlock_sites, wmn_sites
+
+def build_username_results(username, search_result):
+    """
+    Combine the Sherlock and WhatsMyName results of a search into the
+    results object shown on the results page and stored with the scan
+    """
+    # Sort each source so the stored results don't depend on check timing
+    sherlock_results = sorted(search_result.get('sherlock', []), key=lambda r: r['site_name'].casefold())
+    whatsmyname_results = sorted(search_result.get('whatsmyname', []), key=lambda r: r['site_name'].casefold())
+    
+    # Merge by site, Sherlock results win when both found the same account
+    combined_results = merge_results([sherlock_results, whatsmyname_results], username)
+    
+    # Count accounts answered from the verdict cache
+    total_cached = sum(1 for result in combined_results if result.get('cached'))
+    
+    # Count categories
+    categories = {}
+    for result in combined_results:
+        category = result['category']
+        if category not in categories:
+            categories[category] = 0
+        categories[category] += 1
+    
+    # Calculate risk score based on number of accounts found
+    total_found = len(combined_results)
+    if total_found == 0:
+        risk_score = 0
+    elif total_found <= 5:
+        risk_score = 10
+    elif total_found <= 15:
+        risk_score = 25
+    elif total_found <= 30:
+        risk_score = 50
+    elif total_found <= 50:
+        risk_score = 75
+    else:
+        risk_score = 100
     
-    # Return both results and progress file path
+    # Create results object
     return {
+        'username': username,
+        'scan_date': datetime.now(),
         'sherlock': sherlock_results,
         'whatsmyname': whatsmyname_results,
-        'progress_file': progress_file
+        'combined_results': combined_results,
+        'categories': categories,
+        'total_found': total_found,
+        'total_cached': total_cached,
+        'risk_score': risk_score,
+        'partial': search_result.get('partial', False),
+        'cancelled': search_result.get('cancelled', False),
+        'skipped_sites': search_result.get('skipped_sites', [])
     }
 
+@functools.lru_cache(maxsize=1)
 def is_sherlock_installed():
-    """Check if Sherlock is installed and available"""
+    """Check once per process if Sherlock is installed and available"""
     try:
         result = subprocess.run(['sherlock', '--version'], capture_output=True, text=True)
         return result.returncode == 0
     except FileNotFoundError:
         return False
 
-def search_sherlock(username, progress_file):
+def search_sherlock(username, search_id, fresh=False, sites=None, control=None):
     """
-    Search for username across various platforms using Sherlock
+    Search for username across various platforms using Sherlock.
+    Pass sites to check a subset of the compiled Sherlock sites.
     """
+    if Config.SHERLOCK_MODE == 'inprocess':
+        from blueprints.username_search.sherlock_sites import get_sherlock_sites
+        if sites is None:
+            sites = get_sherlock_sites()
+        if sites:
+            return _search_sherlock_inprocess(username, sites, search_id, fresh, control)
+        print("Sherlock site data is not available, using the Sherlock command")
+    
+    return _search_sherlock_cli(username, search_id, control)
+
+def _search_sherlock_inprocess(username, sites, search_id, fresh=False, control=None):
+    """Run Sherlock's site checks on the shared event loop engine"""
+    from blueprints.username_search.engine import stream_site_checks
+    from blueprints.username_search.sherlock_sites import check_sherlock_site
+    
+    def run_checks(sites_to_check, control):
+        for site, result in stream_site_checks(username, sites_to_check, check_sherlock_site, control):
+            if result:
+                result['category'] = _get_site_category(result['site_name'])
+            yield site, result
+    
+    try:
+        update_progress(search_id, 'sherlock', 'running', 
+                       f"Checking {len(sites)} sites", 0, 0, len(sites))
+        
+        results = _collect_site_results('sherlock', username, sites, search_id, fresh, run_checks, control)
+        
+        _finish_progress(search_id, 'sherlock', control, len(results), len(sites))
+        return results
+    
+    except Exception as e:
+        import traceback
+        print(f"Error running Sherlock checks: {e}")
+        print(traceback.format_exc())
+        update_progress(search_id, 'sherlock', 'error', str(e))
+        return _get_mock_sherlock_data(username)
+
+def _collect_site_results(source, username, sites, search_id, fresh, run_checks, control=None):
+    """
+    Answer what we can from the verdict cache and check the remaining sites
+    with run_checks(sites, control), which yields (site, result) tuples as
+    checks finish. Fresh verdicts are written back to the cache in one go at
+    the end, and sites never checked before the search stopped are recorded
+    on its control.
+    """
+    hits, misses = split_cached(source, username, sites, fresh)
+    total_sites = len(sites)
+    results = []
+    new_verdicts = []
+    sites_checked = 0
+    reported = {'found': 0, 'checked': 0}
+    
+    def report(message):
+        # Progress counters only ever go up, by what changed since the last report
+        increment_progress(search_id, source, len(results) - reported['found'], sites_checked - reported['checked'])
+        reported.update(found=len(results), checked=sites_checked)
+        update_progress(search_id, source, 'running', message)
+    
+    def record(result, live):
+        nonlocal sites_checked
+        sites_checked += 1
+        if result:
+            results.append(result)
+            publish_account(search_id, result)
+        
+        # Update progress on every find and every 10 sites otherwise
+        if live and (result or sites_checked % 10 == 0):
+            report(f"Checked {sites_checked}/{total_sites} sites ({len(hits)} cached)")
+    
+    for site, result in hits:
+        record(result, live=False)
+    if hits:
+        report(f"{len(hits)} sites answered from cache, checking {len(misses)}")
+    
+    try:
+        for site, result in run_checks(misses, control):
+            new_verdicts.append((site, result))
+            record(result, live=True)
+    finally:
+        store_verdicts(source, username, new_verdicts)
+    
+    if control is not None and len(new_verdicts) < len(misses):
+        checked = {site['name'] for site, _ in new_verdicts}
+        control.add_skipped(source, [site['name'] for site in misses if site['name'] not in checked])
+    
+    return results
+
+def _search_sherlock_cli(username, search_id, control=None):
+    """
+    Search for username using the Sherlock command line tool
+    """
+    from blueprints.username_search.sherlock_runner import SherlockProcess, stream_sherlock
+    
     if not is_sherlock_installed():
         # Show clear message that Sherlock isn't installed
         print("Sherlock is not installed. Using mock data.")
-        update_progress(progress_file, 'sherlock', 'error', "Sherlock not installed")
+        update_progress(search_id, 'sherlock', 'error', "Sherlock not installed")
         return _get_mock_sherlock_data(username)
     
     try:
         # Update progress
-        update_progress(progress_file, 'sherlock', 'running', "Starting Sherlock search")
-        
-        # Create a temporary directory for output
-        temp_dir = tempfile.mkdtemp()
-        output_path = os.path.join(temp_dir, "sherlock_results")
+        update_progress(search_id, 'sherlock', 'running', "Starting Sherlock search")
         
-        # Build the command to run Sherlock - use simpler command without json output
+        # Build the command to run Sherlock. Every site is printed so progress
+        # can count checked sites, and colours would get in the way of parsing
         cmd = [
             'sherlock',
             username,
             '--timeout', '5',
-            '--print-found',
-            '--output', output_path
+            '--print-all',
+            '--no-color',
+            '--no-txt'
         ]
         
-        print(f"Running Sherlock command: {' '.join(cmd)}")
+        # With shards, each process only checks its own part of the site list
+        shards = _sherlock_shards()
+        commands = [cmd + [arg for name in shard for arg in ('--site', name)] for shard in shards] or [cmd]
+        total_sites = sum(len(shard) for shard in shards)
         
-        # Run Sherlock command with live output capture for progress updates
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1  # Line buffered
-        )
+        print(f"Running Sherlock command: {' '.join(cmd)}" + 
+              (f" in {len(shards)} shards" if len(shards) > 1 else ""))
         
-        # Monitor output for progress updates
+        # Both pipes are drained as Sherlock runs and it is killed when it
+        # outlives SHERLOCK_CLI_TIMEOUT or the search stops
+        runs = [SherlockProcess(command, Config.SHERLOCK_CLI_TIMEOUT, control) for command in commands]
         sites_checked = 0
-        sites_found = 0
         found_sites = []
+        last_update = 0
+        reported_checked = reported_found = 0
+        
+        for record in stream_sherlock(runs, control):
+            sites_checked += 1
+            if record['status'] == 'found':
+                account = {
+                    'site_name': record['site_name'],
+                    'url': record['url'],
+                    'category': _get_site_category(record['site_name']),
+                    'source': 'Sherlock'
+                }
+                found_sites.append(account)
+                publish_account(search_id, account)
+            
+            # Progress goes out at most every _SHERLOCK_PROGRESS_INTERVAL seconds
+            now = time.monotonic()
+            if now - last_update >= _SHERLOCK_PROGRESS_INTERVAL:
+                last_update = now
+                increment_progress(search_id, 'sherlock', len(found_sites) - reported_found, sites_checked - reported_checked)
+                reported_checked, reported_found = sites_checked, len(found_sites)
+                update_progress(search_id, 'sherlock', 'running', f"Checked {sites_checked} sites", total=total_sites)
+        
+        if any(run.stopped for run in runs):
+            # Killed part way through, the sites it didn't reach are unknown
+            control.add_skipped('sherlock', [])
+            _finish_progress(search_id, 'sherlock', control, len(found_sites), sites_checked)
+            return found_sites
         
-        # Read output line by line
-        for line in iter(process.stdout.readline, ''):
-            print(f"Sherlock output: {line.strip()}")
-            if "[+]" in line:  # Found a match
-                sites_found += 1
-                # Extract site name and URL from the line
-                site_info = line.strip().split("[+] ")[1] if "[+] " in line else ""
-                if site_info and ": " in site_info:
-                    site_parts = site_info.split(": ")
-                    site_name = site_parts[0].strip()
-                    site_url = site_parts[1].strip() if len(site_parts) > 1 else ""
-                    
-                    if site_name and site_url:
-                        found_sites.append({
-                            'site_name': site_name,
-                            'url': site_url,
-                            'category': _get_site_category(site_name),
-                            'source': 'Sherlock'
-                        })
-                
-                update_progress(progress_file, 'sherlock', 'running', 
-                                f"Found {sites_found} accounts", sites_found, sites_checked)
-            elif "]" in line and "[+]" not in line:  # Checked a site
-                sites_checked += 1
-                if sites_checked % 5 == 0:  # Update every 5 sites to avoid too many updates
-                    update_progress(progress_file, 'sherlock', 'running', 
-                                   f"Checked {sites_checked} sites", sites_found, sites_checked)
-        
-        # Read any error output
-        error_output = process.stderr.read()
-        if error_output:
-            print(f"Sherlock stderr: {error_output}")
-        
-        # Wait for process to complete
-        process.wait()
-        
-        if process.returncode != 0:
-            print(f"Sherlock error: {error_output}")
-            update_progress(progress_file, 'sherlock', 'error', f"Error: {error_output}")
+        failed = [run for run in runs if run.timed_out or run.returncode != 0]
+        if failed:
+            run = failed[0]
+            error = "Timed out" if run.timed_out else run.stderr.strip()[-500:] or f"Exit code {run.returncode}"
+            if len(runs) > 1:
+                error = f"{len(failed)} of {len(runs)} shards failed: {error}"
+            print(f"Sherlock error: {error}")
+            update_progress(search_id, 'sherlock', 'error', f"Error: {error}", len(found_sites), sites_checked, total_sites)
             # If we have any results despite the error, return them instead of mock data
             if found_sites:
                 return found_sites
             return _get_mock_sherlock_data(username)
         
-        # If we parsed the results from stdout, use those
-        if found_sites:
-            # Update final progress
-            update_progress(progress_file, 'sherlock', 'completed', 
-                           f"Completed with {len(found_sites)} accounts found", 
-                           len(found_sites), sites_checked)
-            return found_sites
-        
-        # As a fallback, check for the output file that Sherlock might have created
-        output_file = f"{output_path}.txt"
-        if os.path.exists(output_file):
-            # Parse the text file
-            with open(output_file, 'r') as f:
-                lines = f.readlines()
-            
-            parsed_sites = []
-            for line in lines:
-                if ": " in line:
-                    site_parts = line.strip().split(": ")
-                    site_name = site_parts[0].strip()
-                    site_url = site_parts[1].strip() if len(site_parts) > 1 else ""
-                    
-                    if site_name and site_url:
-                        parsed_sites.append({
-                            'site_name': site_name,
-                            'url': site_url,
-                            'category': _get_site_category(site_name),
-                            'source': 'Sherlock'
-                        })
-            
-            # Update final progress
-            update_progress(progress_file, 'sherlock', 'completed', 
-                           f"Completed with {len(parsed_sites)} accounts found", 
-                           len(parsed_sites), sites_checked)
-            return parsed_sites
-        
-        # If we couldn't get results from stdout or file, return mock data
-        print("No Sherlock results found, using mock data")
-        update_progress(progress_file, 'sherlock', 'completed', 
-                       "Completed with no accounts found", 0, sites_checked)
-        return []
+        update_progress(search_id, 'sherlock', 'completed', 
+                       f"Completed with {len(found_sites)} accounts found", 
+                       len(found_sites), sites_checked, total_sites)
+        return found_sites
     
     except Exception as e:
         import traceback
         print(f"Error running Sherlock: {e}")
         print(traceback.format_exc())
-        update_progress(progress_file, 'sherlock', 'error', str(e))
+        update_progress(search_id, 'sherlock', 'error', str(e))
         return _get_mock_sherlock_data(username)
-    finally:
-        # Clean up the temporary directory
-        try:
-            import shutil
-            shutil.rmtree(temp_dir, ignore_errors=True)
-        except Exception as e:
-            print(f"Error cleaning up temp dir: {e}")
 
-def search_whatsmyname(username, progress_file):
+def _sherlock_shards():
     """
-    Search for username across various platforms using WhatsMyName API
+    Split Sherlock's site names into SHERLOCK_CLI_SHARDS lists, one per
+    sherlock process. Returns [] to run a single process over every site.
     """
-    update_progress(progress_file, 'whatsmyname', 'running', "Starting WhatsMyName search")
+    shard_count = Config.SHERLOCK_CLI_SHARDS or os.cpu_count() or 1
+    if shard_count <= 1:
+        return []
+    
+    from blueprints.username_search.sherlock_sites import get_sherlock_sites
+    sites = get_sherlock_sites()
+    if not sites:
+        print("Sherlock site data is not available, running Sherlock unsharded")
+        return []
+    
+    # Deal the sites out in turn so slow and fast sites spread over shards
+    names = sorted(site['name'] for site in sites)
+    shard_count = min(shard_count, len(names))
+    return [names[index::shard_count] for index in range(shard_count)]
+
+def search_whatsmyname(username, search_id, fresh=False, sites=None, control=None):
+    """
+    Search for username across various platforms using WhatsMyName API.
+    Pass sites to check a subset of the compiled catalog.
+    """
+    update_progress(search_id, 'whatsmyname', 'running', "Starting WhatsMyName search")
     
     try:
-        # Get the WhatsMyName data file
-        wmn_data_url = "https://raw.githubusercontent.com/WebBreacher/WhatsMyName/main/wmn-data.json"
-        
-        update_progress(progress_file, 'whatsmyname', 'running', "Fetching WhatsMyName data")
-        response = requests.get(wmn_data_url, timeout=10)
-        
-        if response.status_code != 200:
-            print(f"Error fetching WhatsMyName data: {response.status_code}")
-            update_progress(progress_file, 'whatsmyname', 'error', 
-                           f"Error fetching data: HTTP {response.status_code}")
+        # Get the compiled WhatsMyName catalog (cached locally, refreshed in the background)
+        update_progress(search_id, 'whatsmyname', 'running', "Loading WhatsMyName data")
+        if sites is None:
+            sites = get_wmn_sites()
+        
+        if sites is None:
+            print("WhatsMyName data is not available")
+            update_progress(search_id, 'whatsmyname', 'error', "WhatsMyName data is not available")
             return _get_mock_whatsmyname_data(username)
         
-        wmn_data = response.json()
-        sites = wmn_data.get('sites', [])
-        
         # Update progress with total number of sites
         total_sites = len(sites)
-        update_progress(progress_file, 'whatsmyname', 'running', 
+        update_progress(search_id, 'whatsmyname', 'running', 
                        f"Checking {total_sites} sites", 0, 0, total_sites)
         
-        # Process sites in batches for better parallelism
-        results = []
-        sites_checked = 0
-        
-        # Split sites into manageable batches
-        batch_size = 10
-        site_batches = [sites[i:i+batch_size] for i in range(0, len(sites), batch_size)]
-        
-        # Process each batch in parallel
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            # Submit a batch processing task for each batch of sites
-            future_to_batch = {executor.submit(_process_wmn_batch, username, batch, progress_file, 
-                                              sites_checked + i*batch_size): batch 
-                              for i, batch in enumerate(site_batches)}
-            
-            # Collect results as they complete
-            for future in concurrent.futures.as_completed(future_to_batch):
-                try:
-                    batch_results, batch_checked = future.result()
-                    results.extend(batch_results)
-                    sites_checked += batch_checked
-                    
-                    # Update progress
-                    update_progress(progress_file, 'whatsmyname', 'running', 
-                                   f"Checked {sites_checked}/{total_sites} sites", 
-                                   len(results), sites_checked, total_sites)
-                except Exception as e:
-                    print(f"Error processing WhatsMyName batch: {e}")
+        # Check the sites with the configured engine
+        if Config.WMN_ENGINE == 'threads':
+            run_checks = functools.partial(_check_wmn_sites_threaded, username)
+        else:
+            run_checks = functools.partial(_check_wmn_sites_async, username)
+        results = _collect_site_results('whatsmyname', username, sites, search_id, fresh, run_checks, control)
         
         # Final progress update
-        update_progress(progress_file, 'whatsmyname', 'completed', 
-                       f"Completed with {len(results)} accounts found", 
-                       len(results), total_sites, total_sites)
+        _finish_progress(search_id, 'whatsmyname', control, len(results), total_sites)
+        
+        if not results and control is not None and control.should_stop():
+            # A stopped search returns what it has, even if that is nothing
+            return results
         
         if not results:
             print("No WhatsMyName results found, using mock data")
@@ -276,124 +475,166 @@ def search_whatsmyname(username, progress_file):
     
     except Exception as e:
         print(f"Error with WhatsMyName search: {e}")
-        update_progress(progress_file, 'whatsmyname', 'error', str(e))
+        update_progress(search_id, 'whatsmyname', 'error', str(e))
         return _get_mock_whatsmyname_data(username)
 
-def update_progress(progress_file, source, status, message, found=0, checked=0, total=0):
-    """Update the progress file with current status"""
+def _check_wmn_sites_async(username, sites, control=None):
+    """Check WhatsMyName sites on the shared event loop engine"""
+    from blueprints.username_search.engine import stream_site_checks
+    
+    # Results stream back as each check finishes
+    return stream_site_checks(username, sites, control=control)
+
+def _check_wmn_sites_threaded(username, sites, control=None):
+    """Check WhatsMyName sites in batches on a thread pool (fallback mode)"""
+    # Split sites into manageable batches
+    batch_size = 10
+    site_batches = [sites[i:i+batch_size] for i in range(0, len(sites), batch_size)]
+    
+    # Process each batch in parallel
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=5)
     try:
-        with open(progress_file, 'r') as f:
-            progress = json.load(f)
-        
-        progress[source]['status'] = status
-        progress[source]['message'] = message
-        progress[source]['found'] = found
-        progress[source]['total_checked'] = checked
-        
-        if total > 0:
-            progress[source]['total_sites'] = total
+        futures = [executor.submit(_process_wmn_batch, username, batch, control) for batch in site_batches]
+        
+        # Yield verdicts batch by batch as they complete
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                yield from future.result()
+            except Exception as e:
+                print(f"Error processing WhatsMyName batch: {e}")
+    finally:
+        # Drop batches that haven't started if the search stopped early
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _open_site(host, url, verdict_statuses=()):
+    """
+    Threaded counterpart of engine.site_request: sends a streamed GET through
+    the host's circuit breaker, rate limit and adaptive timeout, retrying
+    throttled responses. Returns the open response or raises SiteUnavailable.
+    """
+    if not allow_request(host):
+        # Circuit is open, the site has been failing
+        raise SiteUnavailable(host)
+    
+    bucket = get_host_bucket(host)
+    attempt = 0
+    while True:
+        bucket.acquire()
+        timeout = get_timeout(host)
+        try:
+            response = get_session().get(url, timeout=timeout, allow_redirects=True, stream=True)
+        except requests.Timeout:
+            # Timed out, which also tells us the host needs more time
+            record_failure(host, timeout)
+            raise
+        except requests.RequestException:
+            record_failure(host)
+            raise
         
-        with open(progress_file, 'w') as f:
-            json.dump(progress, f)
-    except Exception as e:
-        print(f"Error updating progress: {e}")
+        try:
+            delay = throttle_delay(host, response.status_code, response.headers, attempt)
+        except SiteUnavailable:
+            response.close()
+            raise
+        
+        if delay is None:
+            if is_server_error(response.status_code) and response.status_code not in verdict_statuses:
+                # The host is failing rather than answering
+                response.close()
+                record_failure(host)
+                raise SiteUnavailable(host)
+            record_success(host, response.elapsed.total_seconds())
+            return response
+        
+        # Throttled, wait and try again
+        response.close()
+        time.sleep(delay)
+        attempt += 1
 
-def _process_wmn_batch(username, sites_batch, progress_file, start_index):
-    """Process a batch of WhatsMyName sites"""
-    results = []
-    sites_checked = 0
+def _process_wmn_batch(username, sites_batch, control=None):
+    """
+    Process a batch of WhatsMyName sites.
+    Returns a list of (site, result) tuples, result is False for failed checks.
+    Sites left when the search stops are not checked and not returned.
+    """
+    verdicts = []
     
     for site in sites_batch:
+        if control is not None and control.should_stop():
+            break
+        result = None
         try:
-            # Skip sites missing required data
-            if not all(k in site for k in ['name', 'uri_check', 'category']):
-                sites_checked += 1
-                continue
-            
             # Format the URL with the username
-            check_url = site['uri_check'].replace('{account}', username)
+            check_url = build_check_url(site, username)
+            fingerprint = get_fingerprint(site['name'])
             
-            # Make the request
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            response = requests.get(check_url, headers=headers, timeout=5, allow_redirects=True)
-            
-            # Check if the account exists
-            found = False
-            if 'account_existence_code' in site and response.status_code == site['account_existence_code']:
-                # Verify content to reduce false positives
-                if verify_account_content(response.text, site, username):
-                    results.append({
-                        'site_name': site['name'],
-                        'url': check_url,
-                        'category': site.get('category', 'Uncategorized'),
-                        'source': 'WhatsMyName'
-                    })
-                    found = True
-            elif 'account_existence_string' in site and site['account_existence_string'] in response.text:
-                # Verify content to reduce false positives
-                if verify_account_content(response.text, site, username):
-                    results.append({
-                        'site_name': site['name'],
-                        'url': check_url,
-                        'category': site.get('category', 'Uncategorized'),
-                        'source': 'WhatsMyName'
-                    })
-                    found = True
-        
-        except requests.RequestException:
-            # Skip this site on error
-            pass
+            # Make the request, reading the body only as far as the verdict needs
+            with _open_site(site['host'], check_url, (site.get('account_missing_code'),)) as response:
+                if needs_body(site, response.status_code) and is_verify_offloaded():
+                    # Verified in a worker process, just collect the bytes here
+                    data = bytearray()
+                    for chunk in response.iter_content(chunk_size=Config.WMN_READ_CHUNK_BYTES):
+                        data += chunk
+                        if len(data) >= Config.WMN_MAX_BODY_BYTES:
+                            break
+                    if verify_body(site, response.status_code, bytes(data[:Config.WMN_MAX_BODY_BYTES]),
+                                   response.encoding, fingerprint, username):
+                        result = wmn_result(site, check_url)
+                elif needs_body(site, response.status_code):
+                    body = StreamedBody(response.encoding, Config.WMN_MAX_BODY_BYTES, fingerprint is None)
+                    for chunk in response.iter_content(chunk_size=Config.WMN_READ_CHUNK_BYTES):
+                        if body.feed(chunk):
+                            break
+                    body.finish()
+                    
+                    # Check if the account exists
+                    if not body.not_found:
+                        result = evaluate_wmn_response(site, username, check_url, response.status_code,
+                                                       body.text, body.text_lower, fingerprint)
+                elif is_cheap_to_drain(response.headers):
+                    # Status-only verdict, drain a small body to keep the connection
+                    response.content
+        
+        except (SiteUnavailable, requests.RequestException):
+            # Skip this site if it can't be checked right now
+            result = False
         except Exception as e:
             # Skip this site on any other error
             print(f"Error checking {site.get('name', 'unknown site')}: {e}")
-            pass
+            result = False
         
-        # Increment counter regardless of outcome
-        sites_checked += 1
+        verdicts.append((site, result))
+    
+    return verdicts
+
+def evaluate_wmn_response(site, username, check_url, status_code, content, content_lower=None, fingerprint=None):
+    """
+    Decide whether a WhatsMyName site response shows an existing account.
+    Returns the result entry for the site, or None if no account was found.
+    """
+    # Content is verified as well to reduce false positives
+    if not content_shows_account(site, status_code, content, content_lower, fingerprint, username):
+        return None
     
-    return results, sites_checked
+    return wmn_result(site, check_url)
+
+def wmn_result(site, check_url):
+    """The result entry for an account found on a WhatsMyName site"""
+    return {
+        'site_name': site['name'],
+        'url': check_url,
+        'site_key': site.get('site_key'),
+        'category': site.get('category', 'Uncategorized'),
+        'source': 'WhatsMyName'
+    }
 
 def verify_account_exists(url, site_name):
     """Verify that an account actually exists by checking the content of the page"""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=5, allow_redirects=True)
-        
-        # Common error indicators across different sites
-        error_patterns = [
-            r"(user not found|account not found|page not found|profile not found|404)",
-            r"(doesn't exist|does not exist|not available|no user|isn't here)",
-            r"(no profile|user doesn't exist|profile doesn't exist|account doesn't exist)",
-            r"(couldn't find|couldn't be found|cannot be found|not be found)",
-            r"(deleted|disabled|suspended|removed|inactive|deactivated)"
-        ]
-        
-        # Check for error patterns in the page content, ignoring case
-        content_lower = response.text.lower()
-        for pattern in error_patterns:
-            if re.search(pattern, content_lower):
-                return False
-        
-        # Site-specific checks
-        if "twitter.com" in url:
-            if "this account doesn't exist" in content_lower or "does not exist" in content_lower:
-                return False
-        elif "instagram.com" in url:
-            if "sorry, this page isn't available" in content_lower:
-                return False
-        elif "facebook.com" in url:
-            if "page not found" in content_lower or "isn't available" in content_lower:
-                return False
-        elif "github.com" in url:
-            if "not found" in content_lower or "404" in content_lower:
-                return False
+        response = get_session().get(url, timeout=5, allow_redirects=True)
         
         # If no error patterns found, assume account exists
-        return True
+        return not page_shows_error(url, response.text)
     
     except Exception as e:
         print(f"Error verifying account {url}: {e}")
@@ -404,36 +645,7 @@ def verify_account_content(content, site, username):
     Verify that the account content actually indicates a real account
     and not just a 'not found' page that returns 200 status
     """
-    # Common not-found indicators in page content
-    not_found_indicators = [
-        "not found", "doesn't exist", "does not exist", "no such user", 
-        "no such account", "page not found", "profile not found", "account not found",
-        "couldn't find", "couldn't be found", "cannot be found", "not be found",
-        "deleted", "disabled", "suspended", "removed", "inactive", "deactivated"
-    ]
-    
-    # Check for username presence in content for additional validation
-    username_presence = username.lower() in content.lower()
-    
-    # Check for not-found indicators
-    for indicator in not_found_indicators:
-        if indicator.lower() in content.lower():
-            return False
-    
-    # For more reliable validation, check for expected username appearance
-    if 'username_claimed_pattern' in site:
-        pattern = site['username_claimed_pattern']
-        if pattern and not re.search(pattern, content):
-            return False
-    
-    # If we have a positive match pattern defined for the site, use it
-    if 'account_existence_string' in site:
-        positive_pattern = site['account_existence_string']
-        if positive_pattern and positive_pattern not in content:
-            return False
-    
-    # If the site-specific check passes and no error indicators found, assume account exists
-    return True
+    return verify_content(content, site)
 
 def _get_site_category(site_name):
     """Map site names to categories (simplified)"""
@@ -551,12 +763,3 @@ def _get_mock_whatsmyname_data(username):
     # Randomly remove some results to simulate not finding all accounts
     random.shuffle(mock_results)
     return mock_results[:random.randint(3, len(mock_results))]
-
-def get_search_progress(progress_file):
-    """Get current search progress from the file"""
-    try:
-        with open(progress_file, 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error reading progress file: {e}")
-        return None
\ No newline at end of file
@@ -0,0 +1,133 @@
+# blueprints/username_search/verdict_cache.py
+"""
+Persistent cache of per-site username verdicts.
+
+Every completed check is stored as a (source, username, site) row saying
+whether an account was found. Found and not-found verdicts expire after
+separate TTLs, so a repeat search only rechecks the sites whose entries have
+expired. Failed checks (timeouts, connection errors) are never cached.
+
+The cache is a SQLite file shared by every worker process on the machine.
+Setting both TTLs to 0 turns it off.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+
+from config import Config
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+def _connect():
+    path = Config.USERNAME_CACHE_DB
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    with _schema_lock:
+        if path not in _schema_ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS verdicts (
+                    source TEXT NOT NULL,
+                    username TEXT NOT NULL,
+                    site TEXT NOT NULL,
+                    found INTEGER NOT NULL,
+                    result_json TEXT,
+                    checked_at REAL NOT NULL,
+                    PRIMARY KEY (source, username, site)
+                )
+            """)
+            conn.commit()
+            _schema_ready.add(path)
+    return conn
+
+def is_cache_enabled():
+    return Config.USERNAME_CACHE_FOUND_TTL > 0 or Config.USERNAME_CACHE_NOT_FOUND_TTL > 0
+
+def split_cached(source, username, sites, fresh=False):
+    """
+    Split sites into cache hits and sites that need checking.
+    Returns (hits, misses) where hits is a list of (site, result) tuples with
+    result None for a cached not-found verdict. Cached results are marked
+    with 'cached' and the time they were checked.
+    """
+    if fresh or not is_cache_enabled():
+        return [], list(sites)
+
+    try:
+        with closing(_connect()) as conn:
+            rows = conn.execute(
+                "SELECT site, found, result_json, checked_at FROM verdicts WHERE source = ? AND username = ?",
+                (source, username)
+            ).fetchall()
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error reading username cache: {e}")
+        return [], list(sites)
+
+    now = time.time()
+    cached = {}
+    for site_name, found, result_json, checked_at in rows:
+        ttl = Config.USERNAME_CACHE_FOUND_TTL if found else Config.USERNAME_CACHE_NOT_FOUND_TTL
+        if now - checked_at < ttl:
+            cached[site_name] = (found, result_json, checked_at)
+
+    hits = []
+    misses = []
+    for site in sites:
+        entry = cached.get(site['name'])
+        if entry is None:
+            misses.append(site)
+            continue
+        found, result_json, checked_at = entry
+        result = None
+        if found:
+            result = json.loads(result_json)
+            result['cached'] = True
+            result['checked_at'] = datetime.fromtimestamp(checked_at).isoformat(timespec='seconds')
+        hits.append((site, result))
+    return hits, misses
+
+def store_verdicts(source, username, verdicts):
+    """
+    Save fresh (site, result) verdicts in one transaction.
+    A result of False marks a failed check and is skipped.
+    """
+    if not is_cache_enabled():
+        return
+
+    now = time.time()
+    rows = []
+    for site, result in verdicts:
+        if result is False:
+            continue
+        result_json = json.dumps(result) if result else None
+        rows.append((source, username, site['name'], 1 if result else 0, result_json, now))
+
+    if not rows:
+        return
+
+    try:
+        with closing(_connect()) as conn:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?)", rows)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error writing username cache: {e}")
+
+def purge_expired():
+    """Delete expired verdicts, returns how many were removed"""
+    now = time.time()
+    try:
+        with closing(_connect()) as conn:
+            with conn:
+                cursor = conn.execute(
+                    "DELETE FROM verdicts WHERE (found = 1 AND checked_at < ?) OR (found = 0 AND checked_at < ?)",
+                    (now - Config.USERNAME_CACHE_FOUND_TTL, now - Config.USERNAME_CACHE_NOT_FOUND_TTL)
+                )
+                return cursor.rowcount
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error purging username cache: {e}")
+        return 0
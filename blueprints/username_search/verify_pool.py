@@ -0,0 +1,101 @@
+# blueprints/username_search/verify_pool.py
+"""
+Response body verification in a pool of worker processes.
+
+With VERIFY_MODE 'process', WhatsMyName response bodies are read as raw
+bytes and decoded, lowercased and scanned in worker processes, so that CPU
+work runs on other cores instead of competing for the GIL with the threads
+and event loop doing the network I/O. Bodies of VERIFY_SHM_MIN_BYTES or more
+are handed over in a shared memory block rather than pickled through the
+pool's pipe; the worker decodes straight out of the block.
+"""
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+from multiprocessing import shared_memory
+
+from config import Config
+from blueprints.username_search.matcher import content_shows_account
+
+# The only parts of a site rule a worker needs
+_RULE_KEYS = ('account_existence_code', 'account_existence_string', 'username_claimed_pattern')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def is_verify_offloaded():
+    return Config.VERIFY_MODE == 'process'
+
+def get_verify_pool():
+    """Return the process pool, starting it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = Config.VERIFY_WORKERS or os.cpu_count() or 1
+            # Spawned workers don't inherit locks held by our threads at fork time
+            _pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                                                           mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+def _decode(data, encoding):
+    try:
+        return str(data, encoding or 'utf-8', 'replace')
+    except LookupError:
+        return str(data, 'utf-8', 'replace')
+
+def _attach(name):
+    try:
+        # Python 3.13+: the creating process owns the block's cleanup
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+def _verify_in_worker(rule, status_code, payload, encoding, fingerprint, username):
+    """Runs in a worker: decode a body and check it against a site rule"""
+    if isinstance(payload, tuple):
+        name, size = payload
+        block = _attach(name)
+        view = block.buf[:size]
+        try:
+            content = _decode(view, encoding)
+        finally:
+            view.release()
+            block.close()
+    else:
+        content = _decode(payload, encoding)
+    return content_shows_account(rule, status_code, content, None, fingerprint, username)
+
+def _submit(site, status_code, data, encoding, fingerprint, username):
+    """Queue a body for verification, returns the future and any shared block to release"""
+    rule = {key: site[key] for key in _RULE_KEYS if site.get(key) is not None}
+    block = None
+    payload = data
+    if data and len(data) >= Config.VERIFY_SHM_MIN_BYTES:
+        block = shared_memory.SharedMemory(create=True, size=len(data))
+        block.buf[:len(data)] = data
+        payload = (block.name, len(data))
+    return get_verify_pool().submit(_verify_in_worker, rule, status_code, payload, encoding,
+                                    fingerprint, username), block
+
+def _release(block):
+    if block is not None:
+        block.close()
+        block.unlink()
+
+def verify_body(site, status_code, data, encoding, fingerprint=None, username=None):
+    """Check a raw response body in the pool, returns True if it shows an account"""
+    future, block = _submit(site, status_code, data, encoding, fingerprint, username)
+    try:
+        return future.result()
+    finally:
+        _release(block)
+
+async def verify_body_async(site, status_code, data, encoding, fingerprint=None, username=None):
+    """verify_body for the engine loop, waits without blocking other checks"""
+    future, block = _submit(site, status_code, data, encoding, fingerprint, username)
+    try:
+        return await asyncio.wrap_future(future)
+    finally:
+        _release(block)
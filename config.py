@@ -22,4 +22,139 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')
-    
\ No newline at end of file
+
+    # Username search engine configuration
+    # WMN_ENGINE selects how WhatsMyName sites are checked: 'async' runs every
+    # check on a shared event loop, 'threads' keeps the old batched thread pool
+    WMN_ENGINE = os.environ.get('WMN_ENGINE') or 'async'
+    WMN_MAX_CONCURRENCY = int(os.environ.get('WMN_MAX_CONCURRENCY') or 200)
+    WMN_PER_HOST_CONCURRENCY = int(os.environ.get('WMN_PER_HOST_CONCURRENCY') or 4)
+    WMN_REQUEST_TIMEOUT = float(os.environ.get('WMN_REQUEST_TIMEOUT') or 5)
+    # Response bodies are streamed and never read past this many bytes
+    WMN_MAX_BODY_BYTES = int(os.environ.get('WMN_MAX_BODY_BYTES') or 512 * 1024)
+    WMN_READ_CHUNK_BYTES = int(os.environ.get('WMN_READ_CHUNK_BYTES') or 16 * 1024)
+    # Where response bodies are verified. 'inline' checks them in the thread or
+    # event loop that fetched them, 'process' hands them to VERIFY_WORKERS worker
+    # processes (0 for one per CPU core). Bodies of VERIFY_SHM_MIN_BYTES or more
+    # are passed to the workers through shared memory.
+    VERIFY_MODE = os.environ.get('VERIFY_MODE') or 'inline'
+    VERIFY_WORKERS = int(os.environ.get('VERIFY_WORKERS') or 0)
+    VERIFY_SHM_MIN_BYTES = int(os.environ.get('VERIFY_SHM_MIN_BYTES') or 64 * 1024)
+    
+    # Pooled keep-alive HTTP sessions for site checks
+    HTTP_POOL_HOSTS = int(os.environ.get('HTTP_POOL_HOSTS') or 100)
+    HTTP_POOL_SIZE_PER_HOST = int(os.environ.get('HTTP_POOL_SIZE_PER_HOST') or 10)
+    HTTP_KEEPALIVE_TIMEOUT = float(os.environ.get('HTTP_KEEPALIVE_TIMEOUT') or 30)
+    
+    # WhatsMyName site catalog, cached on disk and revalidated in the background.
+    # Point WMN_CATALOG_PINNED at a wmn-data.json file to run offline from it.
+    WMN_CATALOG_URL = os.environ.get('WMN_CATALOG_URL') or 'https://raw.githubusercontent.com/WebBreacher/WhatsMyName/main/wmn-data.json'
+    WMN_CATALOG_PATH = os.environ.get('WMN_CATALOG_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'wmn-data.json')
+    WMN_CATALOG_PINNED = os.environ.get('WMN_CATALOG_PINNED')
+    WMN_CATALOG_TTL = int(os.environ.get('WMN_CATALOG_TTL') or 24 * 60 * 60)
+    
+    # Per-host adaptive timeouts and circuit breaker for site checks.
+    # Timeouts are SITE_TIMEOUT_MULTIPLIER x the SITE_TIMEOUT_PERCENTILE latency
+    # of the last SITE_LATENCY_WINDOW requests, within SITE_TIMEOUT_MIN/MAX.
+    SITE_LATENCY_WINDOW = int(os.environ.get('SITE_LATENCY_WINDOW') or 50)
+    SITE_TIMEOUT_PERCENTILE = float(os.environ.get('SITE_TIMEOUT_PERCENTILE') or 95)
+    SITE_TIMEOUT_MULTIPLIER = float(os.environ.get('SITE_TIMEOUT_MULTIPLIER') or 2.0)
+    SITE_TIMEOUT_MIN = float(os.environ.get('SITE_TIMEOUT_MIN') or 1.0)
+    SITE_TIMEOUT_MAX = float(os.environ.get('SITE_TIMEOUT_MAX') or 15.0)
+    SITE_BREAKER_FAILURES = int(os.environ.get('SITE_BREAKER_FAILURES') or 5)
+    SITE_BREAKER_COOLDOWN = int(os.environ.get('SITE_BREAKER_COOLDOWN') or 300)
+    
+    # Per-host rate limit for site checks, shared by every search in a process.
+    # Throttled responses are retried with Retry-After or jittered backoff.
+    HOST_RATE_LIMIT = float(os.environ.get('HOST_RATE_LIMIT') or 5)
+    HOST_RATE_BURST = int(os.environ.get('HOST_RATE_BURST') or 10)
+    CHECK_MAX_RETRIES = int(os.environ.get('CHECK_MAX_RETRIES') or 2)
+    CHECK_BACKOFF_BASE = float(os.environ.get('CHECK_BACKOFF_BASE') or 0.5)
+    CHECK_BACKOFF_MAX = float(os.environ.get('CHECK_BACKOFF_MAX') or 8)
+    CHECK_RETRY_AFTER_MAX = float(os.environ.get('CHECK_RETRY_AFTER_MAX') or 30)
+    
+    # Overall time budget in seconds for one username search (0 for none).
+    # When it runs out the search stops and returns the accounts found so far.
+    USERNAME_SEARCH_DEADLINE = int(os.environ.get('USERNAME_SEARCH_DEADLINE') or 120)
+    
+    # Batch username searches share one engine; this many usernames run at once
+    BATCH_MAX_PARALLEL_SEARCHES = int(os.environ.get('BATCH_MAX_PARALLEL_SEARCHES') or 4)
+    BATCH_MAX_USERNAMES = int(os.environ.get('BATCH_MAX_USERNAMES') or 200)
+    
+    # Sherlock checks. SHERLOCK_MODE 'inprocess' loads Sherlock's site data once
+    # and runs the checks on the shared engine, 'cli' spawns the sherlock command.
+    # The site data comes from SHERLOCK_DATA_PATH, the installed sherlock
+    # package, or a copy downloaded from SHERLOCK_DATA_URL.
+    SHERLOCK_MODE = os.environ.get('SHERLOCK_MODE') or 'inprocess'
+    SHERLOCK_DATA_PATH = os.environ.get('SHERLOCK_DATA_PATH')
+    SHERLOCK_DATA_URL = os.environ.get('SHERLOCK_DATA_URL') or 'https://raw.githubusercontent.com/sherlock-project/sherlock/master/sherlock_project/resources/data.json'
+    SHERLOCK_DATA_CACHE = os.environ.get('SHERLOCK_DATA_CACHE') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sherlock-data.json')
+    
+    # The sherlock command (SHERLOCK_MODE 'cli') is killed after this many seconds.
+    # SHERLOCK_CLI_SHARDS splits its site list over that many parallel processes
+    # (0 for one per CPU core, 1 to run a single process).
+    SHERLOCK_CLI_TIMEOUT = int(os.environ.get('SHERLOCK_CLI_TIMEOUT') or 300)
+    SHERLOCK_CLI_SHARDS = int(os.environ.get('SHERLOCK_CLI_SHARDS') or 1)
+    
+    # Learned not-found page fingerprints, built by `python tasks.py calibrate`
+    # from FINGERPRINT_PROBES random usernames per site. Pages whose simhash is
+    # within FINGERPRINT_MAX_DISTANCE bits of the calibrated one are not found.
+    FINGERPRINT_PROBES = int(os.environ.get('FINGERPRINT_PROBES') or 2)
+    FINGERPRINT_MAX_DISTANCE = int(os.environ.get('FINGERPRINT_MAX_DISTANCE') or 3)
+    
+    # Per-site username verdict cache. Found and not-found verdicts expire
+    # separately; set both TTLs to 0 to always check every site.
+    USERNAME_CACHE_DB = os.environ.get('USERNAME_CACHE_DB') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'username-cache.db')
+    USERNAME_CACHE_FOUND_TTL = int(os.environ.get('USERNAME_CACHE_FOUND_TTL') or 7 * 24 * 60 * 60)
+    USERNAME_CACHE_NOT_FOUND_TTL = int(os.environ.get('USERNAME_CACHE_NOT_FOUND_TTL') or 24 * 60 * 60)
+    
+    # Search progress registry. Finished searches are kept for PROGRESS_TTL
+    # seconds; set PROGRESS_REDIS_URL to share progress between processes.
+    PROGRESS_REDIS_URL = os.environ.get('PROGRESS_REDIS_URL')
+    PROGRESS_TTL = int(os.environ.get('PROGRESS_TTL') or 600)
+    PROGRESS_MAX_AGE = int(os.environ.get('PROGRESS_MAX_AGE') or 60 * 60)
+    
+    # XposedOrNot breach API client. Calls share one pooled session and a
+    # process-wide rate limit of XON_RATE_LIMIT per second (bursts of
+    # XON_RATE_BURST); throttled or failed calls are retried XON_MAX_RETRIES times.
+    XON_API_URL = os.environ.get('XON_API_URL') or 'https://api.xposedornot.com/v1'
+    XON_RATE_LIMIT = float(os.environ.get('XON_RATE_LIMIT') or 2)
+    XON_RATE_BURST = int(os.environ.get('XON_RATE_BURST') or 2)
+    XON_POOL_SIZE = int(os.environ.get('XON_POOL_SIZE') or 10)
+    XON_CONNECT_TIMEOUT = float(os.environ.get('XON_CONNECT_TIMEOUT') or 5)
+    XON_READ_TIMEOUT = float(os.environ.get('XON_READ_TIMEOUT') or 15)
+    XON_MAX_RETRIES = int(os.environ.get('XON_MAX_RETRIES') or 3)
+    XON_BACKOFF_BASE = float(os.environ.get('XON_BACKOFF_BASE') or 1)
+    XON_BACKOFF_MAX = float(os.environ.get('XON_BACKOFF_MAX') or 10)
+    XON_RETRY_AFTER_MAX = float(os.environ.get('XON_RETRY_AFTER_MAX') or 30)
+    # The check-email and breach-analytics calls for an address run at the same
+    # time and both have to finish within this many seconds
+    XON_CHECK_DEADLINE = float(os.environ.get('XON_CHECK_DEADLINE') or 20)
+    
+    # Local copy of XposedOrNot's breach catalog, refreshed by
+    # `python tasks.py refresh_breach_catalog` (or in the background once it is
+    # older than BREACH_CATALOG_TTL). Breach details are looked up in it
+    # instead of calling breach-analytics for every address.
+    BREACH_CATALOG_PATH = os.environ.get('BREACH_CATALOG_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'xon-breaches.json')
+    BREACH_CATALOG_TTL = int(os.environ.get('BREACH_CATALOG_TTL') or 24 * 60 * 60)
+    
+    # Breach providers checked for every email address, comma separated. They
+    # run at the same time and each gets BREACH_PROVIDER_TIMEOUT seconds.
+    BREACH_PROVIDERS = os.environ.get('BREACH_PROVIDERS') or 'xposedornot'
+    BREACH_PROVIDER_TIMEOUT = float(os.environ.get('BREACH_PROVIDER_TIMEOUT') or 25)
+    BREACH_PROVIDER_WORKERS = int(os.environ.get('BREACH_PROVIDER_WORKERS') or 16)
+    
+    # Bulk email breach checks. BREACH_BULK_PARALLEL addresses are checked at
+    # once and their scans are saved BREACH_BULK_COMMIT_SIZE per transaction.
+    BREACH_BULK_MAX_EMAILS = int(os.environ.get('BREACH_BULK_MAX_EMAILS') or 5000)
+    BREACH_BULK_PARALLEL = int(os.environ.get('BREACH_BULK_PARALLEL') or 4)
+    BREACH_BULK_COMMIT_SIZE = int(os.environ.get('BREACH_BULK_COMMIT_SIZE') or 50)
+    
+    # Background scan jobs. 'thread' runs them on a pool inside the web process
+    # and is meant for development, deployments should use 'external', which
+    # leaves them for `python tasks.py run_job_worker` processes.
+    JOB_BACKEND = os.environ.get('JOB_BACKEND') or 'thread'
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS') or 4)
+    # A worker renews the lease on a running job every JOB_LEASE / 3 seconds.
+    # Jobs whose lease runs out, because their worker died, are run again.
+    JOB_LEASE = int(os.environ.get('JOB_LEASE') or 120)
@@ -0,0 +1,334 @@
+# jobs.py
+"""
+Background jobs for scans.
+
+Scans are submitted as jobs and run outside the request that asked for them,
+so a long username sweep or a slow external API never ties up a web worker.
+Each job is a row in the jobs table and, for logged in users, is mirrored by
+a Scan row that moves from 'in_progress' to 'completed' or 'failed'.
+
+JOB_BACKEND selects where jobs run:
+- 'thread':   a worker pool inside the web process (default, no extra setup,
+              for development only)
+- 'external': separate worker processes started with
+              `python tasks.py run_job_worker`, which claim jobs from the
+              database. Use this for deployments.
+
+A worker renews the lease (heartbeat_at) on the job it is running. When a
+worker dies its jobs' leases run out after JOB_LEASE seconds and they are
+claimed and run again, by external workers as they poll and, in thread
+mode, by a recovery thread the web process starts when it serves requests.
+"""
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import update, or_
+
+from config import Config
+from models import db, Job, Scan
+
+_executor = None
+_executor_lock = threading.Lock()
+_queued = set()          # Jobs handed to this process's pool and not yet finished
+_recovery_started = False
+
+def _run_username(job, params):
+    from blueprints.username_search.utils import search_username, build_username_results
+    results = build_username_results(job.target, search_username(job.target, params.get('search_id'), bool(params.get('fresh'))))
+    return results, results['total_found']
+
+def _run_username_batch(job, params):
+    results = run_username_batch(params.get('usernames', []), job.user_id, bool(params.get('fresh')))
+    return results, results['total_found']
+
+def _run_email(job, params):
+    from blueprints.data_breach.utils import build_breach_results
+    results = build_breach_results(job.target)
+    return results, results['total_breaches']
+
+def _run_ai_analysis(job, params):
+    from blueprints.ai_analysis.utils import build_ai_analysis_results
+    results = build_ai_analysis_results(params.get('analysis_type'), job.target)
+    return results, len(results['insights'])
+
+# Job types are named after the scan type they produce.
+# Runners return (results, findings).
+JOB_TYPES = {
+    'username': _run_username,
+    'username_batch': _run_username_batch,
+    'email': _run_email,
+    'ai_analysis': _run_ai_analysis,
+}
+
+# Job types that save one scan per target themselves
+# instead of a single scan for the whole job
+_MULTI_SCAN_TYPES = ('username_batch',)
+
+def submit_job(job_type, target, params=None, user_id=None):
+    """
+    Create a job and hand it to the configured backend.
+    Returns the new Job, which is already committed.
+    """
+    if job_type not in JOB_TYPES:
+        raise ValueError(f"Unknown job type: {job_type}")
+
+    job = Job(
+        id=uuid.uuid4().hex,
+        job_type=job_type,
+        target=target,
+        params_json=json.dumps(params or {}),
+        user_id=user_id,
+        status='in_progress'
+    )
+
+    # Logged in users see the scan in their history while it runs
+    if user_id is not None and job_type not in _MULTI_SCAN_TYPES:
+        scan = Scan(
+            user_id=user_id,
+            scan_type=job_type,
+            target=target,
+            scan_date=datetime.now(),
+            status='in_progress'
+        )
+        db.session.add(scan)
+        db.session.flush()
+        job.scan_id = scan.id
+
+    db.session.add(job)
+    db.session.commit()
+
+    if Config.JOB_BACKEND == 'thread':
+        _enqueue(current_app._get_current_object(), job.id)
+
+    return job
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=Config.JOB_WORKERS, thread_name_prefix='job-worker')
+    return _executor
+
+def _worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+def _enqueue(app, job_id):
+    """Hand a job to this process's pool unless it is already there"""
+    with _executor_lock:
+        if job_id in _queued:
+            return
+        _queued.add(job_id)
+    _get_executor().submit(_run_in_app_context, app, job_id)
+
+def _run_in_app_context(app, job_id):
+    try:
+        with app.app_context():
+            if claim_job(job_id, _worker_name()):
+                run_job(job_id)
+    finally:
+        with _executor_lock:
+            _queued.discard(job_id)
+
+def start_job_recovery(app):
+    """
+    In thread mode, start a thread that hands jobs nobody is running (never
+    started, or left behind by a dead process) to this process's pool, now
+    and then every JOB_LEASE / 2 seconds. Only the first call starts it.
+    """
+    global _recovery_started
+    with _executor_lock:
+        if _recovery_started:
+            return
+        _recovery_started = True
+    threading.Thread(target=_recover_jobs, args=(app,), name='job-recovery', daemon=True).start()
+
+def _recover_jobs(app):
+    while True:
+        try:
+            with app.app_context():
+                for job_id in claimable_job_ids():
+                    _enqueue(app, job_id)
+        except Exception as e:
+            print(f"Error recovering jobs: {e}")
+        time.sleep(Config.JOB_LEASE / 2)
+
+def _claimable():
+    """Filter for jobs that are waiting for a worker or whose worker died"""
+    expired = datetime.utcnow() - timedelta(seconds=Config.JOB_LEASE)
+    return (Job.status == 'in_progress',
+            or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < expired))
+
+def claimable_job_ids():
+    """IDs of the jobs a worker could claim, oldest first"""
+    return [job_id for job_id, in db.session.query(Job.id).filter(*_claimable()).order_by(Job.created_at)]
+
+def claim_job(job_id, worker):
+    """
+    Atomically mark a job as started by this worker and take its lease.
+    A job whose lease has run out can be claimed again. Returns False if
+    another worker got to it first.
+    """
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, *_claimable())
+        .values(started_at=now, heartbeat_at=now, worker=worker)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+def claim_next_job(worker):
+    """Claim the oldest job nobody is running, returns its ID or None"""
+    while True:
+        job = Job.query.filter(*_claimable()).order_by(Job.created_at).first()
+        if job is None:
+            return None
+        previous_worker = job.worker
+        if claim_job(job.id, worker):
+            if previous_worker is not None:
+                print(f"Job {job.id} was left behind by {previous_worker}, running it again")
+            return job.id
+        # Lost the race for this one, try the next
+
+def _keep_alive(app, job_id, worker, stop):
+    """Renew a running job's lease until stop is set"""
+    while not stop.wait(Config.JOB_LEASE / 3):
+        try:
+            with app.app_context():
+                db.session.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.worker == worker)
+                    .values(heartbeat_at=datetime.utcnow())
+                )
+                db.session.commit()
+        except Exception as e:
+            print(f"Error renewing the lease on job {job_id}: {e}")
+
+def run_job(job_id):
+    """Run a claimed job and store its results on the job and its scan"""
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return
+
+    stop = threading.Event()
+    threading.Thread(target=_keep_alive, args=(current_app._get_current_object(), job.id, job.worker, stop),
+                     name=f"job-lease-{job.id}", daemon=True).start()
+    try:
+        _run_claimed_job(job)
+    finally:
+        stop.set()
+
+def _run_claimed_job(job):
+    try:
+        params = json.loads(job.params_json or '{}')
+        results, findings = JOB_TYPES[job.job_type](job, params)
+        results_json = json.dumps(results, default=str)
+
+        job.status = 'completed'
+        job.results_json = results_json
+        if job.scan is not None:
+            job.scan.status = 'completed'
+            job.scan.findings = findings
+            job.scan.results_json = results_json
+            job.scan.risk_score = results.get('risk_score', 0)
+
+    except Exception as e:
+        print(f"Error running {job.job_type} job {job.id}: {e}")
+        print(traceback.format_exc())
+        db.session.rollback()
+        job.status = 'failed'
+        job.error = str(e)
+        if job.scan is not None:
+            job.scan.status = 'failed'
+
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+def run_username_batch(usernames, user_id=None, fresh=False, on_saved=None):
+    """
+    Search a list of usernames together and save a Scan per username as
+    each one finishes. Scans are only saved when user_id is given.
+    on_saved(summary) is called with each username's summary entry.
+    Must be called inside an app context. Returns the batch results.
+    """
+    from blueprints.username_search.utils import search_usernames, build_username_results
+    
+    # Every username shows up in the history straight away
+    scans = {}
+    if user_id is not None:
+        for username in usernames:
+            scans[username] = Scan(
+                user_id=user_id,
+                scan_type='username',
+                target=username,
+                scan_date=datetime.now(),
+                status='in_progress'
+            )
+            db.session.add(scans[username])
+        db.session.commit()
+    
+    summaries = {}
+    
+    def save(username, search_result):
+        results = build_username_results(username, search_result)
+        scan = scans.get(username)
+        if scan is not None:
+            scan.status = 'completed'
+            scan.findings = results['total_found']
+            scan.results_json = json.dumps(results, default=str)
+            scan.risk_score = results['risk_score']
+            db.session.commit()
+        
+        summaries[username] = {
+            'username': username,
+            'total_found': results['total_found'],
+            'risk_score': results['risk_score'],
+            'scan_id': scan.id if scan is not None else None,
+            'combined_results': results['combined_results']
+        }
+        if on_saved:
+            on_saved(summaries[username])
+    
+    search_usernames(usernames, fresh, on_result=save)
+    
+    # Usernames whose search crashed
+    for username, scan in scans.items():
+        if username not in summaries:
+            scan.status = 'failed'
+    db.session.commit()
+    
+    entries = [summaries[username] for username in usernames if username in summaries]
+    return {
+        'usernames': entries,
+        'failed': [username for username in usernames if username not in summaries],
+        'total_usernames': len(usernames),
+        'total_found': sum(entry['total_found'] for entry in entries),
+        'risk_score': max((entry['risk_score'] for entry in entries), default=0),
+        'scan_date': datetime.now()
+    }
+
+def run_worker(poll_interval=1.0):
+    """
+    Run jobs from the database until interrupted.
+    Must be called inside an app context.
+    """
+    worker = _worker_name()
+    print(f"Job worker {worker} started")
+    while True:
+        job_id = claim_next_job(worker)
+        if job_id is None:
+            # Don't hold a transaction open while idle
+            db.session.remove()
+            time.sleep(poll_interval)
+            continue
+
+        print(f"Running job {job_id}")
+        run_job(job_id)
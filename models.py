@@ -48,4 +48,27 @@ class Scan(db.Model):
     risk_score = db.Column(db.Integer, default=0)
     
     def __repr__(self):
-        return f'<Scan {self.scan_type}:{self.target}>'
\ No newline at end of file
+        return f'<Scan {self.scan_type}:{self.target}>'
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)  # Random hex ID handed to the client
+    job_type = db.Column(db.String(32), nullable=False)  # 'username', 'username_batch', 'email', 'ai_analysis'
+    target = db.Column(db.String(256), nullable=False)
+    params_json = db.Column(db.Text, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    scan_id = db.Column(db.Integer, db.ForeignKey('scans.id'), nullable=True)
+    status = db.Column(db.String(32), default='in_progress')  # Same values as Scan.status
+    worker = db.Column(db.String(128), nullable=True)  # Set when a worker claims the job
+    error = db.Column(db.Text, nullable=True)
+    results_json = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # Renewed by the worker while the job runs
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    scan = db.relationship('Scan')
+    
+    def __repr__(self):
+        return f'<Job {self.job_type}:{self.target} {self.status}>'
@@ -0,0 +1,93 @@
+# ratelimit.py
+"""
+Rate limiting helpers shared by everything that calls external sites.
+
+TokenBucket allows `rate` requests per second with bursts of up to
+`capacity`, and can be paused when a server asks us to back off with
+Retry-After. Buckets are shared per name (usually a host) by every thread
+and event loop in the process through get_bucket().
+"""
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+class TokenBucket:
+    """Thread-safe token bucket, usable from threads and coroutines"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        """
+        Take a token and return how many seconds to wait before using it.
+        With max_wait, returns None without taking a token if the wait
+        would be longer than that.
+        """
+        if self.rate <= 0:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens can go negative, which queues callers up fairly
+            tokens = self._tokens - 1
+            wait = max(-tokens / self.rate if tokens < 0 else 0, self._paused_until - now)
+            if max_wait is not None and wait > max_wait:
+                return None
+            self._tokens = tokens
+            return wait
+
+    def pause(self, seconds):
+        """Hold every caller back for the given number of seconds"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def acquire(self):
+        """Block the calling thread until a request may be sent"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait on the event loop until a request may be sent"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def get_bucket(name, rate, capacity):
+    """Return the process-wide bucket for a name, creating it on first use"""
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None:
+            bucket = _buckets[name] = TokenBucket(rate, capacity)
+        return bucket
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delay or HTTP date), or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def backoff_delay(attempt, base, cap):
+    """Exponential backoff with full jitter for the given retry attempt (0 based)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
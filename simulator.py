@@ -0,0 +1,246 @@
+# simulator.py
+"""
+Offline site simulator for load-testing username searches.
+
+Serves a synthetic set of profile sites from local ports, each port acting
+as a separate host, and writes matching WhatsMyName and Sherlock catalogs so
+the search engine can be pointed at it with WMN_CATALOG_PINNED and
+SHERLOCK_DATA_PATH. No traffic leaves the machine.
+
+Every site gets a profile that sets its latency distribution (log-normal
+around a median), status codes, body size, error rate and how often it
+answers 429. Whether an account exists is derived from a hash of the site
+and username, so results are the same on every run.
+
+Run it on its own with:
+    python simulator.py [--sites 300] [--ports 8900-8909] [--out data/simulator]
+                        [--profiles profiles.json] [--host-rate 0] [--seed 0]
+or start it from a script with start_simulator(); benchmark.py does that.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import threading
+import time
+import zlib
+
+from aiohttp import web
+
+# Profiles are picked by weight. latency is the median response time in
+# seconds and sigma the spread of the log-normal distribution around it.
+# error_rate answers 5xx, throttle_rate answers 429 (with Retry-After
+# when retry_after is set), found_percent is the share of usernames that
+# exist on the site.
+PROFILES = {
+    'fast': {'weight': 50, 'latency': 0.05, 'sigma': 0.5, 'body_bytes': 4 * 1024,
+             'error_rate': 0.01, 'throttle_rate': 0, 'retry_after': None, 'found_percent': 10},
+    'slow': {'weight': 20, 'latency': 0.8, 'sigma': 0.7, 'body_bytes': 16 * 1024,
+             'error_rate': 0.02, 'throttle_rate': 0, 'retry_after': None, 'found_percent': 10},
+    'heavy': {'weight': 10, 'latency': 0.2, 'sigma': 0.5, 'body_bytes': 256 * 1024,
+              'error_rate': 0.01, 'throttle_rate': 0, 'retry_after': None, 'found_percent': 10},
+    'flaky': {'weight': 10, 'latency': 0.3, 'sigma': 1.0, 'body_bytes': 8 * 1024,
+              'error_rate': 0.25, 'throttle_rate': 0, 'retry_after': None, 'found_percent': 10},
+    'throttled': {'weight': 8, 'latency': 0.1, 'sigma': 0.5, 'body_bytes': 4 * 1024,
+                  'error_rate': 0, 'throttle_rate': 0.3, 'retry_after': 1, 'found_percent': 10},
+    'dead': {'weight': 2, 'latency': 30, 'sigma': 0.1, 'body_bytes': 1024,
+             'error_rate': 0, 'throttle_rate': 0, 'retry_after': None, 'found_percent': 0},
+}
+
+# Every third site is listed in the Sherlock catalog too, so the site plan
+# splits the work between both engines like it does with the real catalogs
+SHERLOCK_EVERY = 3
+
+_FOUND_TEXT = 'Profile of'
+_MISSING_TEXT = 'User not found'
+
+def build_sites(count, ports, profiles=None, seed=0):
+    """Assign each of count synthetic sites a profile and a port"""
+    profiles = profiles or PROFILES
+    rng = random.Random(seed)
+    names = sorted(profiles)
+    weights = [profiles[name].get('weight', 1) for name in names]
+
+    sites = {}
+    for index in range(count):
+        profile = rng.choices(names, weights)[0]
+        name = f"site{index:04d}"
+        sites[name] = dict(profiles[profile], name=name, profile=profile, port=ports[index % len(ports)])
+    return sites
+
+def account_exists(site, username):
+    """Whether the username has an account on a simulated site"""
+    return zlib.crc32(f"{site['name']}:{username}".encode()) % 100 < site['found_percent']
+
+def build_catalogs(sites, host='127.0.0.1'):
+    """Return (wmn_data, sherlock_data) catalogs pointing at the simulated sites"""
+    wmn_sites = []
+    sherlock_data = {}
+    for index, site in enumerate(sorted(sites.values(), key=lambda s: s['name'])):
+        base = f"http://{host}:{site['port']}/u/{site['name']}/"
+        wmn_sites.append({
+            'name': site['name'],
+            'uri_check': base + '{account}',
+            'e_code': 200,
+            'e_string': _FOUND_TEXT,
+            'm_code': 404,
+            'm_string': _MISSING_TEXT,
+            'cat': site['profile'],
+        })
+        if index % SHERLOCK_EVERY == 0:
+            sherlock_data[site['name']] = {
+                'url': base + '{}',
+                'urlMain': f"http://{host}:{site['port']}/",
+                'errorType': 'status_code',
+                'username_claimed': 'simulated',
+            }
+    return {'sites': wmn_sites}, sherlock_data
+
+def write_catalogs(sites, out_dir, host='127.0.0.1'):
+    """Write wmn-data.json and sherlock-data.json, returns their paths"""
+    os.makedirs(out_dir, exist_ok=True)
+    wmn_data, sherlock_data = build_catalogs(sites, host)
+    wmn_path = os.path.join(out_dir, 'wmn-data.json')
+    sherlock_path = os.path.join(out_dir, 'sherlock-data.json')
+    with open(wmn_path, 'w') as f:
+        json.dump(wmn_data, f)
+    with open(sherlock_path, 'w') as f:
+        json.dump(sherlock_data, f)
+    return wmn_path, sherlock_path
+
+def _padded_body(text, size):
+    body = f"<html><body><p>{text}</p>"
+    return body + ' ' * max(0, size - len(body) - 14) + '</body></html>'
+
+class Simulator:
+    """aiohttp app serving the simulated sites on one or more ports"""
+
+    def __init__(self, sites, ports, host='127.0.0.1', host_rate=0, seed=0):
+        self.sites = sites
+        self.ports = ports
+        self.host = host
+        # Requests per second each port accepts before answering 429, 0 for no limit
+        self.host_rate = host_rate
+        self.rng = random.Random(seed)
+        self.stats = {'requests': 0, 'found': 0, 'missing': 0, 'errors': 0, 'throttled': 0}
+        self._windows = {}
+        self._runner = None
+
+    def _over_host_rate(self, port):
+        if not self.host_rate:
+            return False
+        second = int(time.monotonic())
+        window, count = self._windows.get(port, (second, 0))
+        if window != second:
+            window, count = second, 0
+        self._windows[port] = (window, count + 1)
+        return count >= self.host_rate
+
+    async def handle(self, request):
+        self.stats['requests'] += 1
+        site = self.sites.get(request.match_info['site'])
+        if site is None:
+            return web.Response(status=404, text=_padded_body(_MISSING_TEXT, 0))
+
+        if self._over_host_rate(request.url.port) or self.rng.random() < site['throttle_rate']:
+            self.stats['throttled'] += 1
+            headers = {'Retry-After': str(site['retry_after'])} if site.get('retry_after') is not None else None
+            return web.Response(status=429, headers=headers, text='Too many requests')
+
+        latency = self.rng.lognormvariate(math.log(site['latency']), site['sigma'])
+        await asyncio.sleep(min(latency, 60))
+
+        if self.rng.random() < site['error_rate']:
+            self.stats['errors'] += 1
+            return web.Response(status=self.rng.choice((500, 502, 503)), text='Server error')
+
+        username = request.match_info['username']
+        if account_exists(site, username):
+            self.stats['found'] += 1
+            return web.Response(text=_padded_body(f"{_FOUND_TEXT} {username}", site['body_bytes']),
+                                content_type='text/html')
+        self.stats['missing'] += 1
+        return web.Response(status=404, text=_padded_body(_MISSING_TEXT, site['body_bytes']),
+                            content_type='text/html')
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/u/{site}/{username}', self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        for port in self.ports:
+            await web.TCPSite(self._runner, self.host, port, backlog=1024).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+def parse_ports(value):
+    """Parse '8900-8909' or '8900,8901' into a list of ports"""
+    ports = []
+    for part in str(value).split(','):
+        if '-' in part:
+            first, last = part.split('-', 1)
+            ports.extend(range(int(first), int(last) + 1))
+        elif part.strip():
+            ports.append(int(part))
+    return ports
+
+def load_profiles(path):
+    """Read profiles from a JSON file, missing fields default to the 'fast' profile"""
+    if not path:
+        return PROFILES
+    with open(path) as f:
+        raw = json.load(f)
+    return {name: dict(PROFILES['fast'], **profile) for name, profile in raw.items()}
+
+def start_simulator(sites, ports, host='127.0.0.1', host_rate=0, seed=0):
+    """Run a Simulator on its own event loop thread and return it once it is listening"""
+    simulator = Simulator(sites, ports, host, host_rate, seed)
+    ready = threading.Event()
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(simulator.start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, name='site-simulator', daemon=True).start()
+    ready.wait()
+    return simulator
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve simulated profile sites for offline load tests')
+    parser.add_argument('--sites', type=int, default=300)
+    parser.add_argument('--ports', default='8900-8909')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--out', default=os.path.join('data', 'simulator'))
+    parser.add_argument('--profiles', help='JSON file with site profiles')
+    parser.add_argument('--host-rate', type=int, default=0, help='requests per second per port before 429')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    ports = parse_ports(args.ports)
+    sites = build_sites(args.sites, ports, load_profiles(args.profiles), args.seed)
+    wmn_path, sherlock_path = write_catalogs(sites, args.out, args.host)
+
+    print(f"Simulating {len(sites)} sites on {args.host} ports {args.ports}")
+    print(f"  WMN_CATALOG_PINNED={wmn_path}")
+    print(f"  SHERLOCK_DATA_PATH={sherlock_path}")
+
+    simulator = Simulator(sites, ports, args.host, args.host_rate, args.seed)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(simulator.start())
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(simulator.stop())
+        print(f"Served: {simulator.stats}")
+
+if __name__ == '__main__':
+    main()
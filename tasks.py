@@ -5,11 +5,13 @@ These tasks can be run with a scheduler like Celery or APScheduler,
 or manually through a cron job that runs this script.
 """
 
+import json
 import os
 import sys
 from datetime import datetime, timedelta
 from app import create_app
-from models import db, User, Scan
+from models import db, User, Scan, Job
+from blueprints.username_search.verdict_cache import purge_expired
 
 def clean_old_scans(days=30):
     """
@@ -25,6 +27,11 @@ def clean_old_scans(days=30):
         old_scans = Scan.query.filter(Scan.scan_date < cutoff_date).all()
         count = len(old_scans)
         
+        # Jobs are only needed until their results have been viewed
+        old_jobs = Job.query.filter(Job.created_at < cutoff_date).all()
+        for job in old_jobs:
+            db.session.delete(job)
+        
         # Delete old scans
         for scan in old_scans:
             db.session.delete(scan)
@@ -32,6 +39,10 @@ def clean_old_scans(days=30):
         db.session.commit()
         
         print(f"Cleaned {count} scans older than {days} days.")
+        
+        # Expired username verdicts are never read again
+        purged = purge_expired()
+        print(f"Purged {purged} expired username verdicts.")
 
 def send_inactive_user_reminders(days=60):
     """
@@ -74,6 +85,114 @@ def generate_user_reports():
         
         print(f"Processed reports for {len(users)} users.")
 
+def run_job_worker(poll_interval=1.0):
+    """
+    Run background scan jobs submitted by the web app.
+    Start as many of these as needed when JOB_BACKEND is 'external'.
+    """
+    from jobs import run_worker
+    
+    app = create_app()
+    
+    with app.app_context():
+        run_worker(poll_interval)
+
+def batch_username_search(path, user_id=None, fresh=False):
+    """
+    Search every username listed in a file (one per line, '-' for stdin)
+    and save a scan per username for the given user as each one finishes.
+    """
+    from jobs import run_username_batch
+    from blueprints.username_search.utils import parse_usernames
+    
+    if path == '-':
+        usernames = parse_usernames(sys.stdin.read())
+    else:
+        with open(path, 'r') as f:
+            usernames = parse_usernames(f.read())
+    
+    app = create_app()
+    
+    with app.app_context():
+        if user_id is not None and db.session.get(User, user_id) is None:
+            print(f"No user with ID {user_id}")
+            return
+        
+        print(f"Searching {len(usernames)} usernames...")
+        
+        def report(summary):
+            print(f"{summary['username']}: {summary['total_found']} accounts found")
+        
+        results = run_username_batch(usernames, user_id, fresh, on_saved=report)
+        
+        print(f"Found {results['total_found']} accounts for {len(results['usernames'])} usernames.")
+        if results['failed']:
+            print(f"Failed: {', '.join(results['failed'])}")
+
+def bulk_email_check(path, user_id=None, as_csv=False):
+    """
+    Check every email address listed in a file (CSV or one per line, '-'
+    for stdin) for breaches, printing each result as NDJSON or CSV and
+    saving a scan per address for the given user.
+    """
+    from blueprints.data_breach.utils import parse_emails, check_emails_bulk, format_bulk_csv_row, BULK_CSV_FIELDS
+    
+    if path == '-':
+        emails = parse_emails(sys.stdin.read())
+    else:
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            emails = parse_emails(f.read())
+    
+    app = create_app()
+    
+    with app.app_context():
+        if user_id is not None and db.session.get(User, user_id) is None:
+            print(f"No user with ID {user_id}", file=sys.stderr)
+            return
+        
+        print(f"Checking {len(emails)} email addresses...", file=sys.stderr)
+        if as_csv:
+            sys.stdout.write(format_bulk_csv_row({field: field for field in BULK_CSV_FIELDS}))
+        breached = 0
+        for summary in check_emails_bulk(emails, user_id):
+            breached += 1 if summary['total_breaches'] else 0
+            sys.stdout.write(format_bulk_csv_row(summary) if as_csv else json.dumps(summary) + '\n')
+            sys.stdout.flush()
+        print(f"{breached} of {len(emails)} addresses found in breaches.", file=sys.stderr)
+
+def refresh_breach_catalog():
+    """
+    Download XposedOrNot's breach catalog, which email checks use for
+    breach details instead of a breach-analytics call per address.
+    """
+    from blueprints.data_breach.breach_catalog import refresh_catalog
+    
+    count = refresh_catalog()
+    if count is None:
+        print("Breach catalog could not be refreshed.")
+    else:
+        print(f"Breach catalog refreshed: {count} breaches.")
+
+def calibrate(site_names=None):
+    """
+    Learn each WhatsMyName site's not-found page so searches can recognise it
+    by fingerprint. Pass site names to calibrate only those sites.
+    """
+    from blueprints.username_search.catalog import get_wmn_sites
+    from blueprints.username_search.fingerprints import calibrate_sites
+    
+    sites = get_wmn_sites()
+    if not sites:
+        print("WhatsMyName data is not available")
+        return
+    if site_names:
+        wanted = {name.casefold() for name in site_names}
+        sites = [site for site in sites if site['name'].casefold() in wanted]
+    
+    print(f"Calibrating {len(sites)} sites...")
+    stats = calibrate_sites(sites)
+    print(f"Fingerprinted {stats['calibrated']} sites, {stats['skipped']} skipped, {stats['failed']} failed.")
+
 if __name__ == "__main__":
     # This allows running individual tasks from the command line
     # Example: python tasks.py clean_old_scans 90
@@ -91,10 +210,37 @@ if __name__ == "__main__":
         elif task_name == "generate_user_reports":
             generate_user_reports()
         
+        elif task_name == "run_job_worker":
+            poll_interval = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+            run_job_worker(poll_interval)
+        
+        elif task_name == "batch_username_search" and len(sys.argv) > 2:
+            # Example: python tasks.py batch_username_search handles.txt 1 --fresh
+            args = [arg for arg in sys.argv[2:] if arg != '--fresh']
+            user_id = int(args[1]) if len(args) > 1 else None
+            batch_username_search(args[0], user_id, '--fresh' in sys.argv)
+        
+        elif task_name == "bulk_email_check" and len(sys.argv) > 2:
+            # Example: python tasks.py bulk_email_check staff.csv 1 --csv > results.csv
+            args = [arg for arg in sys.argv[2:] if arg != '--csv']
+            user_id = int(args[1]) if len(args) > 1 else None
+            bulk_email_check(args[0], user_id, '--csv' in sys.argv)
+        
+        elif task_name == "refresh_breach_catalog":
+            refresh_breach_catalog()
+        
+        elif task_name == "calibrate":
+            calibrate(sys.argv[2:])
+        
         else:
             print(f"Unknown task: {task_name}")
     else:
         print("Available tasks:")
         print("  clean_old_scans [days]")
         print("  send_inactive_user_reminders [days]")
-        print("  generate_user_reports")
\ No newline at end of file
+        print("  generate_user_reports")
+        print("  run_job_worker [poll_interval]")
+        print("  batch_username_search <file|-> [user_id] [--fresh]")
+        print("  bulk_email_check <file|-> [user_id] [--csv]")
+        print("  calibrate [site ...]")
+        print("  refresh_breach_catalog")
\ No newline at end of file
@@ -0,0 +1,27 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Settings are read when config is first imported, so they go in first
+_tmp = tempfile.mkdtemp(prefix='osint-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ['BREACH_CATALOG_PATH'] = os.path.join(_tmp, 'xon-breaches.json')
+os.environ.pop('USE_MOCK_DATA', None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def app():
+    """The app with a fresh, empty database"""
+    from app import create_app
+    from models import db
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield app
+        db.session.remove()
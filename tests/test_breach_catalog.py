@@ -0,0 +1,11 @@
+# tests/test_breach_catalog.py
+from blueprints.data_breach.breach_catalog import compile_catalog
+
+def test_compile_catalog_indexes_breaches_by_key():
+    raw = {'exposedBreaches': [{'breachID': 'Adobe'}, {'breachID': 'Linked-In'}, {'domain': 'no-id.example'},
+                               'not a breach']}
+    assert compile_catalog(raw) == {'adobe': {'breachID': 'Adobe'}, 'linkedin': {'breachID': 'Linked-In'}}
+
+def test_compile_catalog_rejects_damaged_documents():
+    for raw in (None, [], 'oops', {}, {'exposedBreaches': None}, {'exposedBreaches': {'breachID': 'Adobe'}}):
+        assert compile_catalog(raw) == {}
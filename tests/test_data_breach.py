@@ -0,0 +1,90 @@
+# tests/test_data_breach.py
+from concurrent.futures import Future
+
+import pytest
+
+from blueprints.data_breach import utils
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self._body = body
+        self.text = str(body)
+
+    def json(self):
+        if isinstance(self._body, Exception):
+            raise self._body
+        return self._body
+
+def _run_now(fn, *args, **kwargs):
+    future = Future()
+    try:
+        future.set_result(fn(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+@pytest.fixture
+def xon(monkeypatch):
+    """Answer XposedOrNot calls with the responses a test sets"""
+    responses = {'check': FakeResponse(404, {'Error': 'Not found'}), 'analytics': FakeResponse(500, {}),
+                 'catalog': None}
+    monkeypatch.setattr(utils, 'submit', _run_now)
+    monkeypatch.setattr(utils, 'check_email', lambda email, deadline=None: responses['check'])
+    monkeypatch.setattr(utils, 'breach_analytics', lambda email, deadline=None: responses['analytics'])
+    monkeypatch.setattr(utils, 'get_breach_catalog', lambda: responses['catalog'])
+    return responses
+
+def test_not_found_is_clean(xon):
+    assert utils.check_xposedornot('a@example.com') == {'found': False, 'total_breaches': 0, 'breaches': []}
+
+def test_not_found_body_is_clean(xon):
+    xon['check'] = FakeResponse(200, {'Error': 'Not found'})
+    assert utils.check_xposedornot('a@example.com')['found'] is False
+
+@pytest.mark.parametrize('status_code', [400, 500, 502])
+def test_error_status_is_a_failed_check(xon, status_code):
+    xon['check'] = FakeResponse(status_code, {'Error': 'Server error'})
+    assert utils.check_xposedornot('a@example.com') is None
+
+def test_unavailable_api_is_a_failed_check(xon, monkeypatch):
+    def unavailable(email, deadline=None):
+        raise utils.XposedOrNotUnavailable('check-email: throttled')
+    monkeypatch.setattr(utils, 'check_email', unavailable)
+    assert utils.check_xposedornot('a@example.com') is None
+
+@pytest.mark.parametrize('analytics', [FakeResponse(500, {}), FakeResponse(200, ValueError('bad JSON'))])
+def test_analytics_failure_falls_back_to_breach_names(xon, analytics):
+    xon['check'] = FakeResponse(200, {'breaches': [['Adobe', 'LinkedIn']]})
+    xon['analytics'] = analytics
+    result = utils.check_xposedornot('a@example.com')
+    assert result['found'] is True
+    assert [breach['source'] for breach in result['breaches']] == ['Adobe', 'LinkedIn']
+
+def test_catalog_results_have_a_risk_score(xon):
+    xon['check'] = FakeResponse(200, {'breaches': [['Adobe']]})
+    xon['catalog'] = {'adobe': {'breachID': 'Adobe', 'breachedDate': '2013-10-04T00:00:00+00:00',
+                                'exposedData': ['Email addresses', 'Passwords'], 'passwordRisk': 'easytocrack',
+                                'exposedRecords': 152445165}}
+    result = utils.check_xposedornot('a@example.com')
+    assert result['breaches'][0]['breach_date'] == '2013-10-04'
+    assert result['risk_score'] == 40
+
+def test_bulk_marks_failed_checks(app, monkeypatch):
+    results = {'clean@example.com': {'found': False, 'total_breaches': 0, 'breaches': []},
+               'error@example.com': None}
+    monkeypatch.setattr(utils, 'check_xposedornot', lambda email: results[email])
+
+    summaries = {summary['email']: summary for summary in utils.check_emails_bulk(list(results))}
+    assert summaries['clean@example.com']['status'] == 'completed'
+    assert summaries['error@example.com']['status'] == 'failed'
+    assert summaries['error@example.com']['failed_sources'] == ['XposedOrNot']
+
+def test_parse_emails():
+    text = "name,email\nAda,Ada@Example.com\nbob@example.com; ada@example.com\nnot-an-address"
+    assert utils.parse_emails(text) == ['ada@example.com', 'bob@example.com']
+
+def test_format_bulk_csv_row():
+    summary = {'email': 'a@example.com', 'status': 'completed', 'total_breaches': 2, 'risk_score': 50,
+               'breaches': ['Adobe', 'LinkedIn'], 'failed_sources': []}
+    assert utils.format_bulk_csv_row(summary) == "a@example.com,completed,2,50,Adobe;LinkedIn,\r\n"
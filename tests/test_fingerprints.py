@@ -0,0 +1,58 @@
+# tests/test_fingerprints.py
+from blueprints.username_search.fingerprints import (simhash, page_fingerprint, build_fingerprint,
+                                                     matches_fingerprint)
+from blueprints.username_search.matcher import content_shows_account
+
+NOT_FOUND_PAGE = ("<html><head><title>Example</title></head><body><nav>home explore search login signup</nav>"
+                  "<h1>Sorry, {name} isn't here</h1><p>The link you followed may be broken or the page may "
+                  "have been removed. Go back to the home page and try another search.</p>"
+                  "<footer>about help press api jobs privacy terms</footer></body></html>")
+
+PROFILE_PAGE = ("<html><head><title>{name} on Example</title></head><body><nav>home explore search</nav>"
+                "<h1>{name}</h1><p>Posts 120 followers 4800 following 310. Photographer, deleted my old "
+                "account last year and started again here.</p><ul><li>paris</li><li>street</li>"
+                "<li>film</li></ul></body></html>")
+
+def _distance(a, b):
+    return bin(a ^ b).count('1')
+
+def _fingerprint():
+    probes = [page_fingerprint(404, NOT_FOUND_PAGE.format(name=name).lower(), name)
+              for name in ('zqprobeone', 'zqprobetwo', 'zqprobethree')]
+    return build_fingerprint(probes)
+
+def test_simhash():
+    assert simhash('') == 0
+    text = NOT_FOUND_PAGE.format(name='alice').lower()
+    assert simhash(text) == simhash(text)
+    assert _distance(simhash(text), simhash(text + ' extra')) < _distance(simhash(text), simhash(
+        PROFILE_PAGE.format(name='alice').lower()))
+
+def test_build_fingerprint():
+    fingerprint = _fingerprint()
+    # The username is masked out, so every probe looks the same
+    assert fingerprint['status'] == 404
+    assert fingerprint['spread'] == 0
+
+def test_build_fingerprint_rejects_disagreeing_probes():
+    assert build_fingerprint([(404, 100, 0), (200, 100, 0)]) is None
+    assert build_fingerprint([(404, 100, 0), (404, 100, (1 << 64) - 1)]) is None
+
+def test_matches_fingerprint():
+    fingerprint = _fingerprint()
+    assert matches_fingerprint(fingerprint, 404, NOT_FOUND_PAGE.format(name='alice').lower(), 'alice')
+    assert not matches_fingerprint(fingerprint, 200, NOT_FOUND_PAGE.format(name='alice').lower(), 'alice')
+    assert not matches_fingerprint(fingerprint, 404, PROFILE_PAGE.format(name='alice').lower(), 'alice')
+    assert not matches_fingerprint(fingerprint, 404, NOT_FOUND_PAGE.format(name='alice').lower() * 3, 'alice')
+
+def test_content_shows_account_uses_the_fingerprint():
+    site = {'account_existence_code': 200}
+    profile = PROFILE_PAGE.format(name='alice')
+    # Without a fingerprint, "deleted" on a real profile reads as not found
+    assert not content_shows_account(site, 200, profile)
+    assert content_shows_account(site, 200, profile, fingerprint=_fingerprint(), username='alice')
+
+def test_content_shows_account_rejects_the_not_found_page():
+    site = {'account_existence_code': 404}
+    page = NOT_FOUND_PAGE.format(name='alice')
+    assert not content_shows_account(site, 404, page, fingerprint=_fingerprint(), username='alice')
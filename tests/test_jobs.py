@@ -0,0 +1,75 @@
+# tests/test_jobs.py
+import threading
+from datetime import datetime, timedelta
+
+import jobs
+from config import Config
+from models import db, Job
+
+def _add_job(job_id, **fields):
+    fields.setdefault('status', 'in_progress')
+    job = Job(id=job_id, job_type='email', target='a@example.com', **fields)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def test_claim_job_only_once(app):
+    _add_job('a')
+    assert jobs.claim_job('a', 'worker-1')
+    assert not jobs.claim_job('a', 'worker-2')
+
+    job = db.session.get(Job, 'a')
+    db.session.refresh(job)
+    assert job.worker == 'worker-1'
+    assert job.started_at is not None and job.heartbeat_at is not None
+
+def test_finished_jobs_are_not_claimed(app):
+    _add_job('a', status='completed')
+    assert not jobs.claim_job('a', 'worker-1')
+    assert jobs.claim_next_job('worker-1') is None
+
+def test_claim_next_job_takes_oldest_first(app):
+    now = datetime.utcnow()
+    _add_job('new', created_at=now)
+    _add_job('old', created_at=now - timedelta(minutes=1))
+    assert jobs.claim_next_job('worker-1') == 'old'
+    assert jobs.claim_next_job('worker-1') == 'new'
+    assert jobs.claim_next_job('worker-1') is None
+
+def test_expired_lease_is_claimed_again(app):
+    now = datetime.utcnow()
+    _add_job('dead', started_at=now, worker='worker-1',
+             heartbeat_at=now - timedelta(seconds=Config.JOB_LEASE + 1))
+    _add_job('alive', started_at=now, worker='worker-2', heartbeat_at=now)
+
+    assert jobs.claimable_job_ids() == ['dead']
+    assert jobs.claim_next_job('worker-3') == 'dead'
+    assert not jobs.claim_job('alive', 'worker-3')
+    assert jobs.claim_next_job('worker-3') is None
+
+def test_only_one_of_many_racing_workers_claims_a_job(app):
+    _add_job('a')
+    claimed = []
+
+    def claim(worker):
+        with app.app_context():
+            if jobs.claim_job('a', worker):
+                claimed.append(worker)
+
+    threads = [threading.Thread(target=claim, args=(f"worker-{n}",)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(claimed) == 1
+
+def test_run_job_stores_results(app, monkeypatch):
+    monkeypatch.setitem(jobs.JOB_TYPES, 'email', lambda job, params: ({'risk_score': 25}, 1))
+    _add_job('a')
+    assert jobs.claim_job('a', 'worker-1')
+    jobs.run_job('a')
+
+    job = db.session.get(Job, 'a')
+    assert job.status == 'completed'
+    assert job.results_json == '{"risk_score": 25}'
+    assert job.finished_at is not None
@@ -0,0 +1,47 @@
+# tests/test_ratelimit.py
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from ratelimit import TokenBucket, parse_retry_after, backoff_delay
+
+@pytest.mark.parametrize('value', [None, '', 'soon', '-5'])
+def test_parse_retry_after_ignores_bad_values(value):
+    assert parse_retry_after(value) is None
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after(' 5 ') == 5.0
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 28 <= parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+def test_bucket_allows_a_burst_then_queues():
+    bucket = TokenBucket(rate=1, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(1, abs=0.05)
+    assert bucket.reserve() == pytest.approx(2, abs=0.05)
+
+def test_reserve_past_max_wait_takes_no_token():
+    bucket = TokenBucket(rate=1, capacity=1)
+    assert bucket.reserve() == 0
+    assert bucket.reserve(max_wait=0.5) is None
+    # The refused call left no debt behind
+    assert bucket.reserve(max_wait=2) == pytest.approx(1, abs=0.05)
+
+def test_pause_holds_every_caller_back():
+    bucket = TokenBucket(rate=10, capacity=10)
+    bucket.pause(5)
+    assert bucket.reserve() == pytest.approx(5, abs=0.05)
+    assert bucket.reserve(max_wait=1) is None
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(rate=0, capacity=1)
+    assert [bucket.reserve() for _ in range(5)] == [0] * 5
+
+def test_backoff_delay_is_capped():
+    for attempt in range(10):
+        assert 0 <= backoff_delay(attempt, 1, 10) <= min(10, 2 ** attempt)